@@ -0,0 +1,12 @@
+{% macro first_integer(column) %}
+{#- First run of digits in a string column, cast to NUMERIC - dispatched per adapter -#}
+    {{ return(adapter.dispatch('first_integer')(column)) }}
+{% endmacro %}
+
+{% macro default__first_integer(column) -%}
+    REGEXP_SUBSTR({{ column }}, '\\d+')::NUMERIC
+{%- endmacro %}
+
+{% macro duckdb__first_integer(column) -%}
+    NULLIF(REGEXP_EXTRACT({{ column }}, '\d+'), '')::NUMERIC
+{%- endmacro %}
@@ -0,0 +1,14 @@
+{% macro scraped_at_high_water_mark(column='scraped_at', this_column='scraped_at') %}
+{#-
+    Incremental filter on scrape time.
+    On incremental runs keeps rows scraped at or after the newest this_column already
+    in {{ this }}; the boundary is inclusive so rows sharing the last timestamp are
+    never skipped (re-merging them is a no-op). Renders nothing on full refreshes.
+-#}
+{%- if is_incremental() %}
+where (
+    {{ column }} >= (select max({{ this_column }}) from {{ this }})
+    or (select max({{ this_column }}) from {{ this }}) is null
+)
+{%- endif -%}
+{% endmacro %}
@@ -0,0 +1,62 @@
+{{
+  config(
+    materialized = 'incremental',
+    incremental_strategy = 'delete+insert',
+    unique_key = ['company_id', 'review_date']
+    )
+}}
+
+{#
+    Daily review counts per company and reviewer country with the sentiment split.
+    Incremental the same way as agg_reviews_company_daily: changed company/days
+    are recomputed in full.
+#}
+
+with changed_days as (
+    select distinct
+        company_id,
+        cast(reviewed_at as date) as review_date
+    from {{ ref('fct_reviews') }}
+    {{ scraped_at_high_water_mark(this_column='last_scraped_at') }}
+),
+
+reviews as (
+    select
+        fct_reviews.*,
+        cast(fct_reviews.reviewed_at as date) as review_date
+    from {{ ref('fct_reviews') }} as fct_reviews
+    {% if is_incremental() %}
+    inner join changed_days
+        on fct_reviews.company_id = changed_days.company_id
+        and cast(fct_reviews.reviewed_at as date) = changed_days.review_date
+    {% endif %}
+),
+
+final as (
+    select
+        -- Grain
+        company_id,
+        review_date,
+        coalesce(reviewer_country, 'Unknown') as reviewer_country,
+
+        -- Denormalized for convenience
+        max(company_name) as company_name,
+
+        -- Counts
+        count(*) as review_count,
+        sum(case when review_sentiment = 'Positive' then 1 else 0 end) as positive_count,
+        sum(case when review_sentiment = 'Neutral' then 1 else 0 end) as neutral_count,
+        sum(case when review_sentiment = 'Negative' then 1 else 0 end) as negative_count,
+        sum(case when has_company_reply then 1 else 0 end) as reply_count,
+
+        -- Sum for weighted averages
+        sum(review_rating) as rating_sum,
+
+        -- Metadata
+        max(scraped_at) as last_scraped_at
+
+    from reviews
+    group by company_id, review_date, coalesce(reviewer_country, 'Unknown')
+)
+
+select * from final
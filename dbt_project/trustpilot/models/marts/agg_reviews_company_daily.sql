@@ -0,0 +1,64 @@
+{{
+  config(
+    materialized = 'incremental',
+    incremental_strategy = 'delete+insert',
+    unique_key = ['company_id', 'review_date']
+    )
+}}
+
+{#
+    Daily review counts per company and sentiment for the sentiment dashboard.
+    Incremental: every company/day touched by newly merged fct_reviews rows is
+    recomputed in full and replaces its old rows, so re-scraped reviews whose
+    rating (and so sentiment) changed are never counted twice.
+    Sums rather than averages are stored so any roll-up over days stays exact.
+#}
+
+with changed_days as (
+    select distinct
+        company_id,
+        cast(reviewed_at as date) as review_date
+    from {{ ref('fct_reviews') }}
+    {{ scraped_at_high_water_mark(this_column='last_scraped_at') }}
+),
+
+reviews as (
+    select
+        fct_reviews.*,
+        cast(fct_reviews.reviewed_at as date) as review_date
+    from {{ ref('fct_reviews') }} as fct_reviews
+    {% if is_incremental() %}
+    inner join changed_days
+        on fct_reviews.company_id = changed_days.company_id
+        and cast(fct_reviews.reviewed_at as date) = changed_days.review_date
+    {% endif %}
+),
+
+final as (
+    select
+        -- Grain
+        company_id,
+        review_date,
+        review_sentiment,
+
+        -- Denormalized for convenience
+        max(company_name) as company_name,
+
+        -- Counts
+        count(*) as review_count,
+        sum(case when is_verified then 1 else 0 end) as verified_count,
+        sum(case when has_company_reply then 1 else 0 end) as reply_count,
+
+        -- Sums for weighted averages
+        sum(review_rating) as rating_sum,
+        sum(review_length) as review_length_sum,
+        sum(topic_count) as topic_count_sum,
+
+        -- Metadata
+        max(scraped_at) as last_scraped_at
+
+    from reviews
+    group by company_id, review_date, review_sentiment
+)
+
+select * from final
@@ -0,0 +1,80 @@
+{{
+  config(
+    materialized = 'incremental',
+    incremental_strategy = 'delete+insert',
+    unique_key = ['company_id', 'review_date']
+    )
+}}
+
+{#
+    Daily topic mentions per company, unpivoted from the mentions_<topic> flags
+    (one row per company, day and mentioned topic) instead of splitting topic_tags.
+    Incremental the same way as agg_reviews_company_daily: changed company/days
+    are recomputed in full.
+#}
+
+with changed_days as (
+    select distinct
+        company_id,
+        cast(reviewed_at as date) as review_date
+    from {{ ref('fct_reviews') }}
+    {{ scraped_at_high_water_mark(this_column='last_scraped_at') }}
+),
+
+reviews as (
+    select
+        fct_reviews.*,
+        cast(fct_reviews.reviewed_at as date) as review_date
+    from {{ ref('fct_reviews') }} as fct_reviews
+    {% if is_incremental() %}
+    inner join changed_days
+        on fct_reviews.company_id = changed_days.company_id
+        and cast(fct_reviews.reviewed_at as date) = changed_days.review_date
+    {% endif %}
+),
+
+topic_mentions as (
+    {% for topic in var('topics') %}
+    select
+        company_id,
+        company_name,
+        review_date,
+        '{{ topic }}' as topic,
+        review_sentiment,
+        review_rating,
+        has_company_reply,
+        scraped_at
+    from reviews
+    where mentions_{{ topic }}
+    {% if not loop.last %}union all{% endif %}
+    {% endfor %}
+),
+
+final as (
+    select
+        -- Grain
+        company_id,
+        review_date,
+        topic,
+
+        -- Denormalized for convenience
+        max(company_name) as company_name,
+
+        -- Counts
+        count(*) as mention_count,
+        sum(case when review_sentiment = 'Positive' then 1 else 0 end) as positive_count,
+        sum(case when review_sentiment = 'Neutral' then 1 else 0 end) as neutral_count,
+        sum(case when review_sentiment = 'Negative' then 1 else 0 end) as negative_count,
+        sum(case when has_company_reply then 1 else 0 end) as reply_count,
+
+        -- Sum for weighted averages
+        sum(review_rating) as rating_sum,
+
+        -- Metadata
+        max(scraped_at) as last_scraped_at
+
+    from topic_mentions
+    group by company_id, review_date, topic
+)
+
+select * from final
@@ -1,10 +1,20 @@
+{{
+  config(
+    materialized = 'incremental',
+    unique_key = 'review_id',
+    on_schema_change = 'append_new_columns'
+    )
+}}
+
 {#
     Fact table for Trustpilot reviews.
-    
+    Incremental: picks up staged reviews scraped since the last run and merges them
+    on review_id, so re-scraped reviews replace their earlier version.
 #}
 
 with reviews as (
     select * from {{ ref('stg_reviews') }}
+    {{ scraped_at_high_water_mark() }}
 ),
 
 countries as (
@@ -50,7 +60,8 @@ final as (
         
         -- Dates
         reviewed_at,
-        datediff(day, reviewed_at, current_date) as review_age_days,
+        -- Relative to the scrape, not today, so stored rows stay correct between incremental runs
+        {{ dbt.datediff('cast(reviewed_at as date)', 'cast(reviews.scraped_at as date)', 'day') }} as review_age_days,
         
         -- Flags
         is_verified,
@@ -58,10 +69,12 @@ final as (
         
         -- Topics
         topic_tags,
-        case 
-            when topic_tags = 'general' or topic_tags is null then 0
-            else array_size(split(topic_tags, ', '))
-        end as topic_count,
+        {%- for topic in var('topics') %}
+        mentions_{{ topic }},
+        {%- endfor %}
+        {% for topic in var('topics') -%}
+        case when mentions_{{ topic }} then 1 else 0 end{{ ' + ' if not loop.last }}
+        {%- endfor %} as topic_count,
         
         -- Metadata
         reviews.scraped_at
@@ -27,11 +27,11 @@ SELECT
     CASE
         WHEN response_time = 'Unknown' THEN NULL
         WHEN response_time ILIKE '%week%' THEN 
-            REGEXP_SUBSTR(response_time, '\\d+')::NUMERIC * 168  
+            {{ first_integer('response_time') }} * 168
         WHEN response_time ILIKE '%day%' THEN 
-            REGEXP_SUBSTR(response_time, '\\d+')::NUMERIC * 24
+            {{ first_integer('response_time') }} * 24
         WHEN response_time ILIKE '%hour%' THEN 
-            REGEXP_SUBSTR(response_time, '\\d+')::NUMERIC
+            {{ first_integer('response_time') }}
         ELSE NULL
     END AS response_time_hours
 
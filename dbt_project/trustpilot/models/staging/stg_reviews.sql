@@ -1,23 +1,45 @@
+{{
+  config(
+    materialized = 'incremental',
+    unique_key = 'review_id',
+    on_schema_change = 'append_new_columns'
+    )
+}}
+
+{#
+    Incremental: only raw rows scraped since the last run are read, deduplicated
+    and merged on review_id (merge on Snowflake, delete+insert on DuckDB).
+    A re-scraped review arrives with a later scraped_at, so the latest scrape wins.
+#}
 
 with clean_reviews_one as (
     select * 
     from {{ source('trustpilot', 'reviews') }}
+    {{ scraped_at_high_water_mark() }}
+),
+
+keyed_reviews as (
+    select
+        -- Primary key
+        {{ dbt_utils.generate_surrogate_key(['TRIM(company_name)', 'reviewer_name', 'review_date', 'review_title', 'review_text']) }} as review_id,
+        *
+    from clean_reviews_one
 ),
 
 clean_reviews_without_duplicates as (
     select 
         *,
         row_number() over (
-            partition by company_name, reviewer_name, review_date, review_title, review_text
+            partition by review_id
             order by scraped_at desc
         ) as row_num
-    from clean_reviews_one
+    from keyed_reviews
 ),
 
 final_cleaned as (
     select
         -- Primary key
-        {{ dbt_utils.generate_surrogate_key(['TRIM(company_name)', 'reviewer_name', 'review_date', 'review_title', 'review_text']) }} as review_id,
+        review_id,
         
         -- Foreign key
         {{ dbt_utils.generate_surrogate_key(['TRIM(company_name)']) }} as company_id,
@@ -45,7 +67,7 @@ final_cleaned as (
         review_length,
         
         -- Date
-        review_date as reviewed_at,
+        cast(review_date as {{ dbt.type_timestamp() }}) as reviewed_at,
         
         -- Flags
         verified_review as is_verified,
@@ -53,14 +75,17 @@ final_cleaned as (
         
         -- Topics
         trim(lower(topic_tags)) as topic_tags,
+        {%- for topic in var('topics') %}
+        coalesce(mentions_{{ topic }}, false) as mentions_{{ topic }},
+        {%- endfor %}
         
         -- Metadata
         scraped_at
 
     from clean_reviews_without_duplicates
-    where row_num = 1  -- Keep only first occurrence
+    where row_num = 1  -- Latest scrape of each review
       and company_name is not null
       and review_date is not null
 )
 
-select * from final_cleaned
\ No newline at end of file
+select * from final_cleaned
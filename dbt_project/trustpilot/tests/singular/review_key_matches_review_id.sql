@@ -0,0 +1,20 @@
+{# 
+    Test: 
+    The scraper hashes each review at extraction time (seen_reviews.review_key) to
+    drop reviews it has already collected. That key must equal the review_id
+    surrogate key built in stg_reviews, or scraper-side dedupe and the warehouse
+    would disagree about which reviews are the same.
+    Result: Returns raw rows whose review_key differs from review_id.
+#}
+
+with keyed as (
+    select
+        review_key,
+        {{ dbt_utils.generate_surrogate_key(['TRIM(company_name)', 'reviewer_name', 'review_date', 'review_title', 'review_text']) }} as review_id
+    from {{ source('trustpilot', 'reviews') }}
+)
+
+select *
+from keyed
+where review_key is not null
+  and review_key != review_id
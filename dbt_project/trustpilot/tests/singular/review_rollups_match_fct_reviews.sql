@@ -0,0 +1,41 @@
+{#
+    Data validation: Confirms the incremental rollups still add up to fct_reviews
+    - agg_reviews_company_daily and agg_reviewer_country_daily hold every review once
+    - agg_topic_mentions_daily holds one mention per true mentions_<topic> flag
+    Result: Returns the rollups whose totals drifted from fct_reviews.
+#}
+
+with fct_totals as (
+    select
+        count(*) as review_count,
+        coalesce(sum(topic_count), 0) as mention_count
+    from {{ ref('fct_reviews') }}
+),
+
+rollup_totals as (
+    select
+        'agg_reviews_company_daily' as rollup,
+        (select coalesce(sum(review_count), 0) from {{ ref('agg_reviews_company_daily') }}) as total,
+        review_count as expected_total
+    from fct_totals
+    
+    union all
+    
+    select
+        'agg_reviewer_country_daily',
+        (select coalesce(sum(review_count), 0) from {{ ref('agg_reviewer_country_daily') }}),
+        review_count
+    from fct_totals
+    
+    union all
+    
+    select
+        'agg_topic_mentions_daily',
+        (select coalesce(sum(mention_count), 0) from {{ ref('agg_topic_mentions_daily') }}),
+        mention_count
+    from fct_totals
+)
+
+select *
+from rollup_totals
+where total != expected_total
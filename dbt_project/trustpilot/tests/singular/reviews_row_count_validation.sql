@@ -1,10 +1,17 @@
 {#
     Data validation: Confirms that Raw rows - Duplicate rows = Staged rows
+    (raw rows stg_reviews drops for a missing company_name or review_date are left out)
 
 #}
 
-with raw_count as (
-    select count(*) as rc from {{ source('trustpilot', 'reviews') }}
+with raw_reviews as (
+    select * from {{ source('trustpilot', 'reviews') }}
+    where company_name is not null
+      and review_date is not null
+),
+
+raw_count as (
+    select count(*) as rc from raw_reviews
 ),
 
 staged_count as (
@@ -15,10 +22,10 @@ duplicate_rows as (
     select count(*) as dr
     from (
         select row_number() over (
-            partition by company_name, reviewer_name, review_date, review_title, review_text
+            partition by trim(company_name), reviewer_name, review_date, review_title, review_text
             order by scraped_at desc
         ) as row_num
-        from {{ source('trustpilot', 'reviews') }}
+        from raw_reviews
     )
     where row_num > 1
 )
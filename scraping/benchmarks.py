@@ -0,0 +1,889 @@
+"""
+Scraper benchmarks
+Run from the scraping/ directory:
+
+    python benchmarks.py fetch --companies 5 --latency 0.2
+    python benchmarks.py discover --categories 12 --latency 0.2
+    python benchmarks.py faults --error-rate 0.05 --throttle-rate 0.02 --max-concurrent 6
+    python benchmarks.py parse --repeat 50
+    python benchmarks.py profile --repeat 200
+    python benchmarks.py regress --repeat 20
+    python benchmarks.py topics --rows 1000000
+    python benchmarks.py normalize --rows 1000000
+    python benchmarks.py dataset --rows 500000 --companies 50
+    python benchmarks.py stream --companies 2,8,32
+    python benchmarks.py paging --pages 50 --since 2025-11-30
+    python benchmarks.py incremental --pages 10 --first 30
+    python benchmarks.py pipeline --workers 0,2,4
+    python benchmarks.py pipeline --workers 0,1,2 --companies 2 --latency 0.05
+    python benchmarks.py seen --keys 20000000
+    python benchmarks.py shard --workers 4 --kill 1
+
+
+Project: Trustpilot Analytics Pipeline
+"""
+
+import argparse
+import csv
+import glob
+import json
+import multiprocessing
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+import pandas as pd
+import pyarrow.parquet as pq
+
+from company_discovery import CATEGORY_PARSERS
+from parse_pipeline import InlineParser
+from profile_parser import PROFILE_PARSERS
+from review_batch import batch_records, normalize_dates, normalize_review_batch, review_batch_columns, star_ratings
+from review_dataset import partition_files, read_reviews
+from review_parsers import REVIEW_PARSERS
+from review_sinks import open_review_sink
+from scrape_coordinator import WorkQueue, _worker_process, merge, plan
+from seen_reviews import SeenReviews, review_key
+from stub_server import COUNTRIES, StubTrustpilotServer, TEXTS, TITLES
+from topic_tagger import DEFAULT_TOPICS_FILE, VECTORIZE_MIN_ROWS, TopicTagger
+from trustpilot_scraper import TrustpilotApplianceScraper
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+
+def load_fixtures(pattern):
+    """Saved HTML pages from fixtures/, keyed by file name"""
+    pages = {}
+    for path in sorted(glob.glob(os.path.join(FIXTURES_DIR, pattern))):
+        with open(path, encoding='utf-8') as f:
+            pages[os.path.basename(path)] = f.read()
+    return pages
+
+
+def bench_fetch(args):
+    """Full scrape against the stub server for each in-flight setting"""
+    print(f"{'in_flight':>10} {'requests':>9} {'seconds':>8} {'pages/sec':>10} {'reviews':>8}")
+    for in_flight in args.in_flight:
+        with StubTrustpilotServer(companies=args.companies, pages_per_company=args.pages,
+                                  latency=args.latency) as server:
+            scraper = TrustpilotApplianceScraper(
+                max_in_flight=in_flight,
+                requests_per_second=args.rate,
+                burst=in_flight,
+                base_url=server.base_url
+            )
+            start = time.perf_counter()
+            companies = scraper.get_appliance_companies(min_reviews=0)
+            reviews = []
+            for result in scraper.fetcher.map(
+                lambda c: scraper.scrape_company_reviews(c['company_url'], c['company_name'],
+                                                         target_reviews=args.pages * 20),
+                companies
+            ):
+                reviews.extend(result)
+            elapsed = time.perf_counter() - start
+            print(f"{in_flight:>10} {server.request_count:>9} {elapsed:>8.2f} "
+                  f"{server.request_count / elapsed:>10.1f} {len(reviews):>8}")
+
+
+def bench_faults(args):
+    """
+    Full scrape against a fault-injecting stub for each retry setting.
+    Reviews short of the expected total are pages lost to faults that were not retried away.
+    """
+    expected = args.companies * args.pages * 20
+    print(f"{'retries':>8} {'requests':>9} {'seconds':>8} {'pages/sec':>10} {'reviews':>8} {'expected':>9} "
+          f"{'retried':>8} {'opens':>6} {'limit':>6}")
+    for retries in args.retries:
+        with StubTrustpilotServer(companies=args.companies, pages_per_company=args.pages, latency=args.latency,
+                                  error_rate=args.error_rate, throttle_rate=args.throttle_rate,
+                                  drop_rate=args.drop_rate, retry_after=args.retry_after,
+                                  max_concurrent=args.max_concurrent, seed=args.seed) as server:
+            scraper = TrustpilotApplianceScraper(max_in_flight=args.in_flight, requests_per_second=args.rate,
+                                                 burst=args.in_flight, base_url=server.base_url,
+                                                 max_retries=retries)
+            scraper.fetcher.retry_policy.backoff = args.backoff
+            scraper.fetcher.guard_settings['reset_timeout'] = args.reset_timeout
+            start = time.perf_counter()
+            companies = scraper.get_appliance_companies(min_reviews=0)
+            reviews = sum(len(result) for result in scraper.fetcher.map(
+                lambda c: scraper.scrape_company_reviews(c['company_url'], c['company_name'],
+                                                         target_reviews=args.pages * 20),
+                companies
+            ))
+            elapsed = time.perf_counter() - start
+            retried = sum(scraper.metrics.retries.values())
+            opens = sum(scraper.metrics.circuit_opens.values())
+            limit = max((guard.concurrency.limit for guard in scraper.fetcher.guards.values()), default=0)
+            print(f"{retries:>8} {server.request_count:>9} {elapsed:>8.2f} {server.request_count / elapsed:>10.1f} "
+                  f"{reviews:>8} {expected:>9} {retried:>8} {opens:>6} {limit:>6.1f}")
+
+
+def bench_discover(args):
+    """Multi-category discovery against the stub server for each in-flight setting"""
+    categories = [f"stub_category_{i}" for i in range(args.categories)]
+    print(f"{'in_flight':>10} {'requests':>9} {'seconds':>8} {'companies':>10} {'first after':>12}")
+    for in_flight in args.in_flight:
+        with StubTrustpilotServer(companies=args.companies, latency=args.latency) as server:
+            scraper = TrustpilotApplianceScraper(max_in_flight=in_flight, requests_per_second=args.rate,
+                                                 burst=in_flight, base_url=server.base_url)
+            start = time.perf_counter()
+            first = None
+            found = 0
+            for _ in scraper.discover_companies(min_reviews=args.min_reviews, categories=categories):
+                first = first or time.perf_counter() - start
+                found += 1
+            elapsed = time.perf_counter() - start
+            print(f"{in_flight:>10} {server.request_count:>9} {elapsed:>8.2f} {found:>10} {first or 0:>11.2f}s")
+
+
+def bench_parse(args):
+    """Review card extraction pages/sec per parser backend over saved fixtures"""
+    pages = load_fixtures('review_page*.html')
+    if not pages:
+        print(f"No review_page*.html fixtures in {FIXTURES_DIR}")
+        return
+    
+    baseline = {name: REVIEW_PARSERS['bs4'](html) for name, html in pages.items()}
+    print(f"{'backend':>8} {'pages':>6} {'seconds':>8} {'pages/sec':>10} {'identical':>10}")
+    for backend, parse in REVIEW_PARSERS.items():
+        try:
+            identical = all(parse(html) == baseline[name] for name, html in pages.items())
+        except ImportError as e:
+            print(f"{backend:>8} skipped: {e}")
+            continue
+        start = time.perf_counter()
+        for _ in range(args.repeat):
+            for html in pages.values():
+                parse(html)
+        elapsed = time.perf_counter() - start
+        total = args.repeat * len(pages)
+        print(f"{backend:>8} {total:>6} {elapsed:>8.2f} {total / elapsed:>10.1f} {str(identical):>10}")
+
+
+def bench_profile(args):
+    """Profile extraction pages/sec per backend, checked field by field against golden output"""
+    pages = load_fixtures('profile_page*.html')
+    with open(os.path.join(FIXTURES_DIR, 'profile_pages.golden.json'), encoding='utf-8') as f:
+        golden = json.load(f)
+    pages = {name: html for name, html in pages.items() if name in golden}
+    if not pages:
+        print(f"No profile_page*.html fixtures with golden output in {FIXTURES_DIR}")
+        return
+
+    print(f"{'backend':>8} {'pages':>6} {'seconds':>8} {'pages/sec':>10}  mismatched fields")
+    for backend, extract in PROFILE_PARSERS.items():
+        try:
+            mismatched = sorted({
+                f"{name}:{field}"
+                for name, html in pages.items()
+                for field, value in extract(html, golden[name]['company_name']).items()
+                if value != golden[name]['profile'].get(field)
+            })
+        except ImportError as e:
+            print(f"{backend:>8} skipped: {e}")
+            continue
+        start = time.perf_counter()
+        for _ in range(args.repeat):
+            for name, html in pages.items():
+                extract(html, golden[name]['company_name'])
+        elapsed = time.perf_counter() - start
+        total = args.repeat * len(pages)
+        print(f"{backend:>8} {total:>6} {elapsed:>8.2f} {total / elapsed:>10.1f}  {', '.join(mismatched) or '-'}")
+
+
+# Page kind -> (fixture pattern, golden file, golden entry key holding the expected output)
+CORPUS = {
+    'category': ('category_page*.html', 'category_pages.golden.json', 'cards'),
+    'profile': ('profile_page*.html', 'profile_pages.golden.json', 'profile'),
+    'reviews': ('review_page*.html', 'review_pages.golden.json', 'records'),
+}
+BASELINE_FILE = os.path.join(FIXTURES_DIR, 'parser_baseline.json')
+
+# Registered backends per page kind - regress checks every one of them by default
+BACKENDS = {
+    'category': CATEGORY_PARSERS,
+    'profile': PROFILE_PARSERS,
+    'reviews': REVIEW_PARSERS,
+}
+
+# Golden differences accepted for a backend: (kind, backend) -> {"fixture:field path", ...}.
+# Anything listed here must be a deliberate, documented difference; an entry that no
+# longer differs is reported as stale so the list cannot rot.
+EXPECTED_DIFFS = {}
+
+
+def page_stage(kind, backend):
+    """
+    The per-page work the scraper does for a page kind, as fn(html, golden entry) -> output:
+    category card parsing (discovery), InlineParser.parse_profile (scrape_company_profile)
+    and InlineParser.parse_reviews (scrape_company_reviews - cards, normalization, tagging, keys)
+    """
+    if kind == 'category':
+        parse_cards = CATEGORY_PARSERS[backend]
+        return lambda html, entry: parse_cards(html)
+    parser = InlineParser(REVIEW_PARSERS[backend], TopicTagger.from_config(), PROFILE_PARSERS[backend])
+    if kind == 'profile':
+        return lambda html, entry: parser.parse_profile(html.encode('utf-8'), 'utf-8', entry['company_name'])[0]
+
+    def parse_reviews(html, entry):
+        records, _ = parser.parse_reviews(html.encode('utf-8'), 'utf-8', entry['company_name'], entry['page'])
+        return [{k: v for k, v in record.items() if k != 'scraped_at'} for record in records]
+    return parse_reviews
+
+
+def golden_diff(expected, actual):
+    """Field paths where actual differs from expected (rows by index for lists of records)"""
+    if isinstance(expected, list) and isinstance(actual, list):
+        diffs = [f"[{i}].{path}" for i, (e, a) in enumerate(zip(expected, actual)) for path in golden_diff(e, a)]
+        if len(expected) != len(actual):
+            diffs.append(f"len {len(expected)} != {len(actual)}")
+        return diffs
+    if isinstance(expected, dict) and isinstance(actual, dict):
+        return sorted(key for key in expected.keys() | actual.keys() if expected.get(key) != actual.get(key))
+    return [] if expected == actual else ['value']
+
+
+def bench_regress(args):
+    """
+    Offline regression suite over the recorded fixture corpus, per page kind and backend:
+    - golden: every extracted field compared with fixtures/*.golden.json, for every registered
+      backend unless --backends narrows it; accepted differences are listed in EXPECTED_DIFFS
+    - pages/sec over --repeat passes, and traced peak KB allocated per page
+    - both compared with a saved local baseline (--save-baseline writes it)
+    Exits with status 1 on any golden mismatch, or on a slowdown / allocation growth past --tolerance.
+    After an intended extraction change, --update-golden rewrites the golden outputs from the lxml
+    backend; a new fixture needs a golden entry with its company_name (and page for review pages) first.
+    """
+    baseline = {}
+    if os.path.exists(args.baseline) and not args.save_baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)
+    results = {}
+    failures = []
+    print(f"{'kind':>9} {'backend':>8} {'pages':>6} {'pages/sec':>10} {'vs base':>8} {'peak KB':>8} {'vs base':>8}  golden")
+    for kind, (pattern, golden_name, key) in CORPUS.items():
+        golden_path = os.path.join(FIXTURES_DIR, golden_name)
+        golden = {}
+        if os.path.exists(golden_path):
+            with open(golden_path, encoding='utf-8') as f:
+                golden = json.load(f)
+        pages = {name: html for name, html in load_fixtures(pattern).items() if name in golden}
+        if not pages:
+            print(f"{kind:>9} no {pattern} fixtures with golden output in {FIXTURES_DIR}")
+            continue
+
+        if args.update_golden:
+            stage = page_stage(kind, 'lxml')
+            for name, html in pages.items():
+                golden[name][key] = stage(html, golden[name])
+            with open(golden_path, 'w', encoding='utf-8') as f:
+                json.dump(golden, f, indent=2, ensure_ascii=False)
+                f.write('\n')
+
+        for backend in args.backends or list(BACKENDS[kind]):
+            if backend not in BACKENDS[kind]:
+                print(f"{kind:>9} {backend:>8} skipped: not a registered {kind} backend")
+                continue
+            try:
+                stage = page_stage(kind, backend)
+                outputs = {name: stage(html, golden[name]) for name, html in pages.items()}
+            except ImportError as e:
+                print(f"{kind:>9} {backend:>8} skipped: {e}")
+                continue
+
+            differences = {f"{name}:{path}" for name, output in outputs.items()
+                           for path in golden_diff(golden[name].get(key), output)}
+            accepted = EXPECTED_DIFFS.get((kind, backend), set())
+            mismatched = sorted(differences - accepted)
+            stale = sorted(accepted - differences)
+
+            # Allocations: traced peak per page, on a separate pass so tracing does not skew timing
+            peaks = []
+            tracemalloc.start()
+            for name, html in pages.items():
+                tracemalloc.reset_peak()
+                before = tracemalloc.get_traced_memory()[0]
+                stage(html, golden[name])
+                peaks.append(tracemalloc.get_traced_memory()[1] - before)
+            tracemalloc.stop()
+            peak_kb = max(peaks) / 1024
+
+            start = time.perf_counter()
+            for _ in range(args.repeat):
+                for name, html in pages.items():
+                    stage(html, golden[name])
+            elapsed = time.perf_counter() - start
+            total = args.repeat * len(pages)
+            rate = total / elapsed
+
+            results.setdefault(kind, {})[backend] = {'pages_per_sec': round(rate, 1), 'peak_kb': round(peak_kb, 1)}
+            base = baseline.get(kind, {}).get(backend)
+            speed = rate / base['pages_per_sec'] if base else None
+            memory = peak_kb / base['peak_kb'] if base else None
+            if mismatched:
+                failures.append(f"{kind}/{backend} golden: {', '.join(mismatched)}")
+            if stale:
+                failures.append(f"{kind}/{backend} expected differences no longer differ: {', '.join(stale)}")
+            if speed is not None and speed < 1 - args.tolerance:
+                failures.append(f"{kind}/{backend} slower: {rate:.1f} vs {base['pages_per_sec']} pages/sec")
+            if memory is not None and memory > 1 + args.tolerance:
+                failures.append(f"{kind}/{backend} allocates more: {peak_kb:.1f} vs {base['peak_kb']} KB peak")
+            print(f"{kind:>9} {backend:>8} {total:>6} {rate:>10.1f} {f'{speed:.2f}x' if speed else '-':>8} "
+                  f"{peak_kb:>8.1f} {f'{memory:.2f}x' if memory else '-':>8}  "
+                  f"{f'{len(mismatched)} mismatched' if mismatched else 'ok'}"
+                  f"{f' ({len(accepted & differences)} accepted)' if accepted & differences else ''}")
+
+    if args.save_baseline:
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+        print(f"Baseline saved to {args.baseline}")
+    if failures:
+        print("Regressions:")
+        for failure in failures:
+            print(f"  {failure}")
+        raise SystemExit(1)
+    print("No regressions")
+
+
+def synthetic_reviews(rows, seed=42):
+    """(titles, texts) built from stub review sentences plus filler words"""
+    rng = random.Random(seed)
+    filler = ['the', 'and', 'my', 'new', 'fridge', 'washer', 'was', 'very', 'they', 'again', 'week', 'install']
+    titles, texts = [], []
+    for _ in range(rows):
+        titles.append(rng.choice(TITLES))
+        words = rng.choices(filler, k=rng.randint(5, 40))
+        words.insert(rng.randint(0, len(words)), rng.choice(TEXTS))
+        texts.append(' '.join(words))
+    return titles, texts
+
+
+def tag_keyword_loops(topics, title, text):
+    """Reference implementation - the original per-keyword substring loops"""
+    combined = f"{title} {text}".lower()
+    detected = []
+    flags = {}
+    for topic, keywords in topics.items():
+        has_topic = any(kw in combined for kw in keywords)
+        flags[f'mentions_{topic}'] = has_topic
+        if has_topic:
+            detected.append(topic)
+    return ', '.join(detected) if detected else 'general', flags
+
+
+def bench_topics(args):
+    """Keyword loops vs precompiled tagger (per review and batch) on synthetic reviews"""
+    with open(DEFAULT_TOPICS_FILE, encoding='utf-8') as f:
+        topics = json.load(f)
+    tagger = TopicTagger(topics)
+    titles, texts = synthetic_reviews(args.rows)
+    print(f"{'method':>14} {'rows':>9} {'seconds':>8} {'rows/sec':>11}")
+
+    def report(method, fn):
+        start = time.perf_counter()
+        result = fn()
+        elapsed = time.perf_counter() - start
+        print(f"{method:>14} {args.rows:>9} {elapsed:>8.2f} {args.rows / elapsed:>11.0f}")
+        return result
+
+    expected = report('keyword loops', lambda: [tag_keyword_loops(topics, t, x) for t, x in zip(titles, texts)])
+    single = report('tagger.tag', lambda: [tagger.tag(t, x) for t, x in zip(titles, texts)])
+    batch = report('tag_batch', lambda: tagger.tag_batch(titles, texts))
+
+    batch_rows = zip(batch['topic_tags'], batch[tagger.flag_names].to_dict('records'))
+    identical = single == expected and all(got == want for got, want in zip(batch_rows, expected))
+    print(f"Identical output: {identical}")
+
+    # Config edge cases the old loops handled literally: keywords with capitals never match
+    # the lowercased text, an empty keyword matches everything
+    edge_topics = {
+        **topics,
+        'delivery': topics['delivery'] + ['FedEx', 'Delivered'],
+        'capitals_only': ['Fridge', 'Washer'],
+        'everything': ['', 'never-in-text'],
+    }
+    edge_tagger = TopicTagger(edge_topics)
+    sample = min(args.rows, 2 * VECTORIZE_MIN_ROWS)
+    edge_expected = [tag_keyword_loops(edge_topics, t, x) for t, x in zip(titles[:sample], texts[:sample])]
+    edge_single = [edge_tagger.tag(t, x) for t, x in zip(titles[:sample], texts[:sample])]
+    edge_ok = edge_single == edge_expected
+    for rows in (VECTORIZE_MIN_ROWS - 1, sample):  # per-review scan and column-wise path
+        frame = edge_tagger.tag_batch(titles[:rows], texts[:rows])
+        edge_rows = zip(frame['topic_tags'], frame[edge_tagger.flag_names].to_dict('records'))
+        edge_ok &= all(got == want for got, want in zip(edge_rows, edge_expected[:rows]))
+    print(f"Identical output on config edge cases: {edge_ok}")
+
+
+def synthetic_cards(rows, seed=42):
+    """Raw review card fields as the parsers extract them, around synthetic_reviews text"""
+    rng = random.Random(seed)
+    titles, texts = synthetic_reviews(rows, seed)
+    cards = []
+    for i, (title, text) in enumerate(zip(titles, texts)):
+        cards.append({
+            'reviewer_name': f"Reviewer {i}",
+            'reviewer_location': rng.choice(COUNTRIES),
+            'rating': f"Rated {rng.randint(1, 5)} out of 5 stars" if rng.random() > 0.01 else 'No rating',
+            'review_date': f"2024-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}T{i % 24:02d}:{i % 60:02d}:00.000Z"
+                           if rng.random() > 0.01 else 'Unknown',
+            'review_title': title,
+            'review_text': text,
+            'verified_review': rng.random() < 0.6,
+            'has_company_reply': rng.random() < 0.3,
+        })
+    return cards
+
+
+def build_records_per_row(cards, company_name, page, tagger):
+    """Reference implementation - the original record-at-a-time builder, plus star_rating and date normalization"""
+    records = []
+    for card in cards:
+        topic_tags, topic_flags = tagger.tag(card['review_title'], card['review_text'])
+        record = {
+            'review_key': None,
+            'company_name': company_name,
+            'reviewer_name': card['reviewer_name'],
+            'reviewer_location': card['reviewer_location'],
+            'rating': card['rating'],
+            'star_rating': star_ratings([card['rating']])[0],
+            'review_date': normalize_dates([card['review_date']])[0],
+            'review_title': card['review_title'],
+            'review_text': card['review_text'],
+            'review_length': len(card['review_text']),
+            'verified_review': card['verified_review'],
+            'has_company_reply': card['has_company_reply'],
+            'topic_tags': topic_tags,
+            **topic_flags,
+            'page_number': page,
+            'scraped_at': datetime.now().isoformat()
+        }
+        record['review_key'] = review_key(record)
+        records.append(record)
+    return records
+
+
+def bench_normalize(args):
+    """
+    Record-at-a-time vs batch normalization of extracted cards.
+    Cards are processed in chunks of --chunk rows (a large company's worth by default)
+    so the per-record results never have to be held all at once.
+    """
+    tagger = TopicTagger.from_config()
+    cards = synthetic_cards(args.rows)
+    methods = {
+        'per record': lambda chunk: build_records_per_row(chunk, 'Acme Appliances', 1, tagger),
+        'batch records': lambda chunk: batch_records(review_batch_columns(chunk, 'Acme Appliances', 1, tagger)),
+        'batch frame': lambda chunk: normalize_review_batch(chunk, 'Acme Appliances', 1, tagger),
+    }
+    elapsed = dict.fromkeys(methods, 0.0)
+    identical = True
+    for i in range(0, args.rows, args.chunk):
+        chunk = cards[i:i + args.chunk]
+        results = {}
+        for method, fn in methods.items():
+            start = time.perf_counter()
+            results[method] = fn(chunk)
+            elapsed[method] += time.perf_counter() - start
+        expected = [{k: v for k, v in r.items() if k != 'scraped_at'} for r in results['per record']]
+        for got in (results['batch records'], batch_records(results['batch frame'])):
+            identical &= expected == [{k: v for k, v in r.items() if k != 'scraped_at'} for r in got]
+
+    print(f"{'method':>14} {'rows':>9} {'seconds':>8} {'rows/sec':>11}")
+    for method, seconds in elapsed.items():
+        print(f"{method:>14} {args.rows:>9} {seconds:>8.2f} {args.rows / seconds:>11.0f}")
+    print(f"Identical output: {identical}")
+
+
+def bench_dataset(args):
+    """
+    Storage size and one-company, one-month read cost of a single CSV, a single
+    Parquet file and the partitioned dataset holding the same reviews.
+    'read MB' is the size of the files a read has to open.
+    """
+    tagger = TopicTagger.from_config()
+    cards = synthetic_cards(args.rows)
+    per_company = -(-args.rows // args.companies)
+    companies = [f"Appliance Store {i}" for i in range(args.companies)]
+    company, since, until = companies[0], '2024-12-01', '2025-01-01'
+
+    def size(paths):
+        return sum(os.path.getsize(path) for path in paths) / 1e6
+
+    with tempfile.TemporaryDirectory() as tmp:
+        outputs = {}
+        for output_format in ('csv', 'parquet', 'dataset'):
+            sink = open_review_sink(output_format, os.path.join(tmp, f"reviews_{output_format}"), tagger.flag_names)
+            for i, name in enumerate(companies):
+                chunk = cards[i * per_company:(i + 1) * per_company]
+                for offset in range(0, len(chunk), 20):
+                    sink.write(batch_records(review_batch_columns(chunk[offset:offset + 20], name,
+                                                                  offset // 20 + 1, tagger)))
+            outputs[output_format] = sink.close()
+
+        dataset_files = glob.glob(os.path.join(outputs['dataset'], '**', '*.parquet'), recursive=True)
+        reads = {
+            'csv': (lambda: _filter_frame(pd.read_csv(outputs['csv']), company, since, until), [outputs['csv']]),
+            'parquet': (lambda: pq.read_table(outputs['parquet'], filters=[('company_name', '=', company),
+                                                                          ('review_date', '>=', since),
+                                                                          ('review_date', '<', until)]),
+                        [outputs['parquet']]),
+            'dataset': (lambda: read_reviews(outputs['dataset'], companies=[company], since=since, until=until),
+                        partition_files(outputs['dataset'], [company], since, until)),
+        }
+        stored = {'csv': [outputs['csv']], 'parquet': [outputs['parquet']], 'dataset': dataset_files}
+        print(f"{'format':>8} {'files':>6} {'stored MB':>10} {'read MB':>8} {'read ms':>8} {'rows':>6}")
+        for output_format, (read, opened) in reads.items():
+            start = time.perf_counter()
+            rows = len(read())
+            elapsed = time.perf_counter() - start
+            print(f"{output_format:>8} {len(stored[output_format]):>6} {size(stored[output_format]):>10.2f} "
+                  f"{size(opened):>8.3f} {elapsed * 1000:>8.1f} {rows:>6}")
+
+
+def _filter_frame(frame, company, since, until):
+    return frame[(frame['company_name'] == company) & (frame['review_date'] >= since) & (frame['review_date'] < until)]
+
+
+def bench_paging(args):
+    """
+    Targeted refresh: pages downloaded by iter_reviews with filters in the URLs and
+    early termination, against paging everything and filtering afterwards.
+    Both must return the same reviews.
+    """
+    queries = {
+        'since': {'since': args.since},
+        'stars': {'stars': {1}},
+        'verified 5* since': {'since': args.since, 'stars': {5}, 'verified_only': True},
+    }
+    with StubTrustpilotServer(companies=1, pages_per_company=args.pages, latency=args.latency) as server:
+        scraper = TrustpilotApplianceScraper(requests_per_second=1000, burst=8, base_url=server.base_url)
+        company_url = f"{server.base_url}/review/{server.companies[0][1]}"
+        name = server.companies[0][0]
+
+        def fetch(**filters):
+            requests_before = server.request_count
+            start = time.perf_counter()
+            records = list(scraper.iter_reviews(company_url, name, **filters))
+            return records, server.request_count - requests_before, time.perf_counter() - start
+
+        everything, all_pages, all_seconds = fetch()
+        print(f"{'query':>18} {'reviews':>8} {'full pages':>11} {'pages':>6} {'full s':>7} {'s':>6} {'match':>6}")
+        for label, filters in queries.items():
+            since, stars = filters.get('since'), filters.get('stars')
+            expected = {r['review_key'] for r in everything
+                        if (not since or r['review_date'] > since) and (not stars or r['star_rating'] in stars)
+                        and (not filters.get('verified_only') or r['verified_review'])}
+            records, pages, seconds = fetch(**filters)
+            match = expected == {r['review_key'] for r in records} and len(records) == len(expected)
+            print(f"{label:>18} {len(records):>8} {all_pages:>11} {pages:>6} {all_seconds:>7.2f} {seconds:>6.2f} "
+                  f"{str(match):>6}")
+        scraper.close()
+
+
+def bench_incremental(args):
+    """
+    Incremental runs against one checkpoint store: the first is cut short by a small
+    reviews_per_company, the later ones must pick up every review it did not reach
+    (exactly once), and the last must find nothing new.
+    """
+    with tempfile.TemporaryDirectory() as tmp, \
+            StubTrustpilotServer(companies=1, pages_per_company=args.pages) as server:
+        company_url = f"{server.base_url}/review/{server.companies[0][1]}"
+        keys = []
+        print(f"{'run':>4} {'target':>7} {'reviews':>8} {'pages':>6} {'high-water mark':>25} {'collected range':>51}")
+        for run, target in enumerate([args.first, args.pages * 20, args.pages * 20], 1):
+            scraper = TrustpilotApplianceScraper(requests_per_second=1000, burst=8, base_url=server.base_url,
+                                                 checkpoint_path=os.path.join(tmp, 'checkpoint.db'))
+            requests_before = server.request_count
+            _, reviews_file = scraper.run_full_scrape(min_reviews=0, reviews_per_company=target, incremental=True)
+            rows = []
+            if reviews_file:
+                with open(reviews_file, newline='', encoding='utf-8') as f:
+                    rows = [row['review_key'] for row in csv.DictReader(f)]
+            keys.extend(rows)
+            mark = scraper.checkpoint.high_water_mark(company_url)
+            collected = scraper.checkpoint.collected_range(company_url)
+            scraper.close()
+            print(f"{run:>4} {target:>7} {len(rows):>8} {server.request_count - requests_before:>6} "
+                  f"{str(mark):>25} {str(collected):>51}")
+            time.sleep(1)  # output files are named by the second
+
+    expected = args.pages * 20
+    print(f"reviews={len(keys)} unique={len(set(keys))} expected={expected} "
+          f"{'OK' if len(keys) == len(set(keys)) == expected and not rows else 'MISMATCH'}")
+
+
+def bench_stream(args):
+    """
+    Peak traced memory of a full streaming run as the number of companies grows.
+    Defaults to the lxml backend: bs4 trees are cyclic garbage whose collection lag
+    would otherwise dominate the measurement.
+    """
+    print(f"{'companies':>10} {'reviews':>8} {'seconds':>8} {'peak MB':>8}")
+    for count in args.companies:
+        with StubTrustpilotServer(companies=count, pages_per_company=args.pages) as server:
+            scraper = TrustpilotApplianceScraper(max_in_flight=4, requests_per_second=1000,
+                                                 burst=4, base_url=server.base_url, parser=args.parser)
+            tracemalloc.start()
+            start = time.perf_counter()
+            _, reviews_file = scraper.run_full_scrape(min_reviews=0, reviews_per_company=args.pages * 20,
+                                                      output_format=args.format)
+            elapsed = time.perf_counter() - start
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            with open(reviews_file, 'rb') as f:
+                rows = sum(1 for _ in f) - 1 if args.format == 'csv' else '-'
+            print(f"{count:>10} {rows:>8} {elapsed:>8.2f} {peak / 1e6:>8.1f}")
+
+
+def bench_pipeline(args):
+    """
+    Scrape with different parse stage sizes.
+    By default the first pass records the stub's pages into a temporary HTTP cache and
+    the timed passes replay from it, so only fetch-from-cache + parse cost is measured.
+    With --latency the timed passes fetch from the stub instead: with a pool, each
+    company's next page is fetched while the current one parses, so the gain shows
+    when there are fewer companies than fetch threads (--companies 2).
+    """
+    with tempfile.TemporaryDirectory() as cache_dir, \
+            StubTrustpilotServer(companies=args.companies, pages_per_company=args.pages,
+                                 latency=args.latency) as server:
+        if not args.latency:
+            recorder = TrustpilotApplianceScraper(requests_per_second=1000, burst=8,
+                                                  base_url=server.base_url, cache_dir=cache_dir)
+            recorder.run_full_scrape(min_reviews=0, reviews_per_company=args.pages * 20)
+            recorder.close()
+
+        print(f"{'workers':>8} {'requests':>9} {'seconds':>8} {'pages/sec':>10}")
+        for workers in args.workers:
+            if args.latency:
+                scraper = TrustpilotApplianceScraper(max_in_flight=args.in_flight, base_url=server.base_url,
+                                                     requests_per_second=1000, burst=args.in_flight,
+                                                     parser=args.parser, parse_workers=workers)
+            else:
+                scraper = TrustpilotApplianceScraper(max_in_flight=args.in_flight, base_url=server.base_url,
+                                                     cache_dir=cache_dir, replay=True,
+                                                     parser=args.parser, parse_workers=workers)
+            requests_before = server.request_count
+            start = time.perf_counter()
+            scraper.run_full_scrape(min_reviews=0, reviews_per_company=args.pages * 20)
+            elapsed = time.perf_counter() - start
+            pages = server.request_count - requests_before if args.latency else scraper.fetcher.cache.hits
+            scraper.close()
+            print(f"{workers:>8} {pages:>9} {elapsed:>8.2f} {pages / elapsed:>10.1f}")
+
+
+def bench_seen(args):
+    """
+    Seen-review set at scale: fill it with random review keys, then time page-sized
+    lookups of unseen keys (the common case, screened by the bloom filter) and of
+    seen keys (confirmed against the on-disk index).
+    """
+    rng = random.Random(42)
+
+    def keys(n):
+        return [{'review_key': f"{rng.getrandbits(128):032x}"} for _ in range(n)]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        seen = SeenReviews(os.path.join(tmp, 'seen.db'), capacity=args.capacity or args.keys)
+        start = time.perf_counter()
+        stored = []
+        for offset in range(0, args.keys, args.chunk):
+            batch = keys(min(args.chunk, args.keys - offset))
+            seen.mark(batch)
+            seen.commit()
+            stored.extend(rng.sample(batch, min(len(batch), args.lookups * len(batch) // args.keys)))
+        fill = time.perf_counter() - start
+
+        probes = {'unseen': keys(args.lookups), 'seen': stored[:args.lookups]}
+        print(f"keys={seen.count:,} fill={fill:.1f}s ({seen.count / fill:,.0f} keys/sec) "
+              f"bloom={seen.bloom.bits.nbytes / 1e6:.1f} MB index={os.path.getsize(seen.path) / 1e6:.1f} MB")
+        print(f"{'lookup':>8} {'keys':>8} {'seconds':>8} {'us/key':>8} {'kept':>8}")
+        for label, records in probes.items():
+            start = time.perf_counter()
+            kept = sum(len(seen.filter_new(records[i:i + 20])) for i in range(0, len(records), 20))
+            elapsed = time.perf_counter() - start
+            print(f"{label:>8} {len(records):>8} {elapsed:>8.2f} {elapsed / len(records) * 1e6:>8.1f} {kept:>8}")
+        seen.close()
+
+
+def bench_shard(args):
+    """
+    Sharded scrape with local worker processes against the stub server.
+    --kill workers are terminated in the middle of a unit; their leases expire and
+    the units are scraped again by the survivors. The merged dataset must hold
+    every stub review exactly once.
+    """
+    with tempfile.TemporaryDirectory() as tmp, \
+            StubTrustpilotServer(companies=args.companies, pages_per_company=args.pages,
+                                 latency=args.latency) as server:
+        queue_path = os.path.join(tmp, 'work_queue.db')
+        queue = WorkQueue(queue_path)
+        planner = TrustpilotApplianceScraper(base_url=server.base_url, requests_per_second=1000, burst=8)
+        units = plan(queue, planner, min_reviews=0, reviews_per_company=args.pages * 20,
+                     pages_per_unit=args.pages_per_unit)
+        planner.close()
+
+        context = multiprocessing.get_context('spawn')
+        options = {'base_url': server.base_url, 'requests_per_second': args.rate, 'burst': 1}
+        workers = [context.Process(target=_worker_process,
+                                   args=(queue_path, os.path.join(tmp, 'shards'), f"w{i}", args.lease_seconds,
+                                         'WARNING', options))
+                   for i in range(args.workers)]
+        start = time.perf_counter()
+        for worker in workers:
+            worker.start()
+
+        # Kill each victim as soon as it holds a lease, leaving a half-written shard behind
+        victims = {f"w{i}": workers[i] for i in range(min(args.kill, args.workers))}
+        while victims and time.perf_counter() - start < 60:
+            held = {row[0] for row in queue.conn.execute("select worker from work_units where status = 'leased'")}
+            for worker_id in held & set(victims):
+                victims.pop(worker_id).terminate()
+            time.sleep(0.05)
+        for worker in workers:
+            worker.join()
+        elapsed = time.perf_counter() - start
+
+        counts = queue.counts()
+        retried = queue.conn.execute("select count(*) from work_units where attempts > 1").fetchone()[0]
+        _, reviews_file = merge(queue, tmp, output_format='csv')
+        keys = []
+        if reviews_file:
+            with open(reviews_file, newline='', encoding='utf-8') as f:
+                keys = [row['review_key'] for row in csv.DictReader(f)]
+        queue.close()
+
+    expected = args.companies * args.pages * 20
+    print(f"units={units} workers={args.workers} killed={min(args.kill, args.workers)} retried={retried} "
+          f"status={counts} seconds={elapsed:.2f} pages/sec={args.companies * args.pages / elapsed:.1f}")
+    print(f"reviews={len(keys)} unique={len(set(keys))} expected={expected} "
+          f"{'OK' if len(keys) == len(set(keys)) == expected else 'MISMATCH'}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    shard = sub.add_parser('shard', help='sharded scrape with local worker processes and a work queue')
+    shard.add_argument('--companies', type=int, default=4)
+    shard.add_argument('--pages', type=int, default=10, help='review pages per company')
+    shard.add_argument('--pages-per-unit', type=int, default=3)
+    shard.add_argument('--workers', type=int, default=4)
+    shard.add_argument('--kill', type=int, default=1, help='workers terminated mid-unit')
+    shard.add_argument('--lease-seconds', type=float, default=3.0)
+    shard.add_argument('--latency', type=float, default=0.1, help='simulated seconds per request')
+    shard.add_argument('--rate', type=float, default=20.0, help='requests/sec per host and worker')
+    shard.set_defaults(func=bench_shard)
+
+    faults = sub.add_parser('faults', help='retry, circuit breaker and adaptive concurrency against a faulty stub')
+    faults.add_argument('--companies', type=int, default=5)
+    faults.add_argument('--pages', type=int, default=10, help='review pages per company')
+    faults.add_argument('--latency', type=float, default=0.05, help='simulated seconds per request')
+    faults.add_argument('--rate', type=float, default=200.0, help='requests/sec per host')
+    faults.add_argument('--in-flight', type=int, default=8)
+    faults.add_argument('--retries', type=lambda s: [int(x) for x in s.split(',')], default=[0, 4])
+    faults.add_argument('--error-rate', type=float, default=0.05, help='fraction of requests answered 503')
+    faults.add_argument('--throttle-rate', type=float, default=0.02, help='fraction answered 429 + Retry-After')
+    faults.add_argument('--drop-rate', type=float, default=0.01, help='fraction of connections dropped')
+    faults.add_argument('--retry-after', type=int, default=1)
+    faults.add_argument('--max-concurrent', type=int, default=6, help='in-flight requests before the stub 429s')
+    faults.add_argument('--backoff', type=float, default=0.1, help='base backoff seconds')
+    faults.add_argument('--reset-timeout', type=float, default=2.0, help='circuit breaker open seconds')
+    faults.add_argument('--seed', type=int, default=0)
+    faults.set_defaults(func=bench_faults)
+
+    fetch = sub.add_parser('fetch', help='fetch engine throughput against the local stub server')
+    fetch.add_argument('--companies', type=int, default=5)
+    fetch.add_argument('--pages', type=int, default=5, help='review pages per company')
+    fetch.add_argument('--latency', type=float, default=0.2, help='simulated seconds per request')
+    fetch.add_argument('--rate', type=float, default=50.0, help='requests/sec per host')
+    fetch.add_argument('--in-flight', type=lambda s: [int(x) for x in s.split(',')], default=[1, 4, 8])
+    fetch.set_defaults(func=bench_fetch)
+
+    discover = sub.add_parser('discover', help='paginated multi-category discovery against the local stub server')
+    discover.add_argument('--categories', type=int, default=12)
+    discover.add_argument('--companies', type=int, default=100, help='companies listed per category')
+    discover.add_argument('--min-reviews', type=int, default=500)
+    discover.add_argument('--latency', type=float, default=0.2, help='simulated seconds per request')
+    discover.add_argument('--rate', type=float, default=50.0, help='requests/sec per host')
+    discover.add_argument('--in-flight', type=lambda s: [int(x) for x in s.split(',')], default=[1, 4, 8])
+    discover.set_defaults(func=bench_discover)
+
+    parse = sub.add_parser('parse', help='review card parser backends over saved HTML fixtures')
+    parse.add_argument('--repeat', type=int, default=50)
+    parse.set_defaults(func=bench_parse)
+
+    profile = sub.add_parser('profile', help='profile extraction backends against golden output')
+    profile.add_argument('--repeat', type=int, default=200)
+    profile.set_defaults(func=bench_profile)
+
+    regress = sub.add_parser('regress', help='golden output, pages/sec and allocations over the fixture corpus')
+    regress.add_argument('--repeat', type=int, default=20)
+    regress.add_argument('--backends', type=lambda s: s.split(','),
+                         help='comma-separated parser backends (default: every registered backend)')
+    regress.add_argument('--baseline', default=BASELINE_FILE, help='local pages/sec and peak KB baseline')
+    regress.add_argument('--save-baseline', action='store_true', help='record this run as the baseline')
+    regress.add_argument('--tolerance', type=float, default=0.25, help='allowed slowdown / allocation growth')
+    regress.add_argument('--update-golden', action='store_true', help='rewrite golden outputs from lxml')
+    regress.set_defaults(func=bench_regress)
+
+    topics = sub.add_parser('topics', help='topic tagger microbenchmark on synthetic reviews')
+    topics.add_argument('--rows', type=int, default=1000000)
+    topics.set_defaults(func=bench_topics)
+
+    normalize = sub.add_parser('normalize', help='per-record vs batch review normalization on synthetic cards')
+    normalize.add_argument('--rows', type=int, default=1000000)
+    normalize.add_argument('--chunk', type=int, default=100000, help='cards per batch')
+    normalize.set_defaults(func=bench_normalize)
+
+    dataset = sub.add_parser('dataset', help='partitioned dataset vs single-file output: size and pruned reads')
+    dataset.add_argument('--rows', type=int, default=500000)
+    dataset.add_argument('--companies', type=int, default=50)
+    dataset.set_defaults(func=bench_dataset)
+
+    paging = sub.add_parser('paging', help='filtered, early-terminating review paging vs paging everything')
+    paging.add_argument('--pages', type=int, default=50, help='review pages of the stub company')
+    paging.add_argument('--latency', type=float, default=0.05, help='simulated seconds per request')
+    paging.add_argument('--since', default='2025-11-30', help='ISO date - reviews after it')
+    paging.set_defaults(func=bench_paging)
+
+    incremental = sub.add_parser('incremental', help='incremental runs after one cut short by reviews_per_company')
+    incremental.add_argument('--pages', type=int, default=10, help='review pages of the stub company (<= 21)')
+    incremental.add_argument('--first', type=int, default=30, help='reviews_per_company of the first run')
+    incremental.set_defaults(func=bench_incremental)
+
+    stream = sub.add_parser('stream', help='peak memory of streaming runs of increasing size')
+    stream.add_argument('--companies', type=lambda s: [int(x) for x in s.split(',')], default=[2, 8, 32])
+    stream.add_argument('--pages', type=int, default=10, help='review pages per company')
+    stream.add_argument('--format', choices=['csv', 'parquet'], default='csv')
+    stream.add_argument('--parser', choices=list(REVIEW_PARSERS), default='lxml')
+    stream.set_defaults(func=bench_stream)
+
+    pipeline = sub.add_parser('pipeline', help='process-pool parse stage over replayed (cached) pages')
+    pipeline.add_argument('--workers', type=lambda s: [int(x) for x in s.split(',')], default=[0, 2, 4])
+    pipeline.add_argument('--companies', type=int, default=8)
+    pipeline.add_argument('--pages', type=int, default=10, help='review pages per company')
+    pipeline.add_argument('--in-flight', type=int, default=8, help='fetch threads')
+    pipeline.add_argument('--parser', choices=list(REVIEW_PARSERS), default='bs4')
+    pipeline.add_argument('--latency', type=float, default=0.0,
+                          help='fetch from the stub with this many seconds per request instead of replaying')
+    pipeline.set_defaults(func=bench_pipeline)
+
+    seen = sub.add_parser('seen', help='seen-review bloom filter + index lookups at scale')
+    seen.add_argument('--keys', type=int, default=2000000, help='keys stored before timing lookups')
+    seen.add_argument('--capacity', type=int, default=0, help='bloom filter capacity (default: --keys)')
+    seen.add_argument('--chunk', type=int, default=1000000, help='keys per commit while filling')
+    seen.add_argument('--lookups', type=int, default=100000)
+    seen.set_defaults(func=bench_seen)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+"""
+Persistent checkpoint store for resumable / incremental scraping
+SQLite file recording, per company:
+- progress of the current run (last page fetched, records so far, done flag)
+- the high-water mark, kept across runs: every review dated at or before it has been
+  collected. A run stopped by its review target leaves the mark where it was and
+  records the (oldest, newest) review_date range it did collect instead
+
+
+Project: Trustpilot Analytics Pipeline
+"""
+
+import json
+import sqlite3
+import threading
+from datetime import datetime
+
+SCHEMA = """
+create table if not exists company_state (
+    company_url text primary key,
+    company_name text,
+    high_water_mark text,
+    collected_from text,
+    collected_to text,
+    updated_at text
+);
+create table if not exists run_progress (
+    company_url text primary key,
+    last_page integer not null default 0,
+    done integer not null default 0,
+    profile_json text
+);
+create table if not exists run_pages (
+    company_url text not null,
+    page_number integer not null,
+    records_json text not null,
+    primary key (company_url, page_number)
+);
+"""
+
+
+class CheckpointStore:
+    """
+    Thread-safe wrapper around one SQLite connection.
+    Each page is committed together with its records, so a crash loses at most
+    the page in flight. finish_run() clears run progress once the datasets are
+    saved; high-water marks survive for the next incremental run.
+    """
+
+    def __init__(self, path="Trustpilot_data/checkpoint.db"):
+        self.path = path
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.executescript(SCHEMA)
+        # Stores created before collected ranges existed
+        columns = {row[1] for row in self.conn.execute("pragma table_info(company_state)")}
+        for column in ('collected_from', 'collected_to'):
+            if column not in columns:
+                self.conn.execute(f"alter table company_state add column {column} text")
+        self.conn.commit()
+
+    def _one(self, sql, params):
+        with self.lock:
+            return self.conn.execute(sql, params).fetchone()
+
+    def high_water_mark(self, company_url):
+        """Newest review_date stored for a company, or None"""
+        row = self._one("select high_water_mark from company_state where company_url = ?", (company_url,))
+        return row[0] if row else None
+
+    def collected_range(self, company_url):
+        """(oldest, newest) review_date range collected above the high-water mark by a capped run, or None"""
+        row = self._one("select collected_from, collected_to from company_state where company_url = ?",
+                        (company_url,))
+        return (row[0], row[1]) if row and row[0] else None
+
+    def last_page(self, company_url):
+        row = self._one("select last_page from run_progress where company_url = ?", (company_url,))
+        return row[0] if row else 0
+
+    def is_done(self, company_url):
+        row = self._one("select done from run_progress where company_url = ?", (company_url,))
+        return bool(row and row[0])
+
+    def load_profile(self, company_url):
+        row = self._one("select profile_json from run_progress where company_url = ?", (company_url,))
+        return json.loads(row[0]) if row and row[0] else None
+
+    def save_profile(self, company_url, profile):
+        with self.lock, self.conn:
+            self.conn.execute(
+                "insert into run_progress (company_url, profile_json) values (?, ?) "
+                "on conflict(company_url) do update set profile_json = excluded.profile_json",
+                (company_url, json.dumps(profile))
+            )
+
+    def save_page(self, company_url, page, records):
+        """Store one page of review records and advance last_page in a single transaction"""
+        with self.lock, self.conn:
+            self.conn.execute(
+                "insert or replace into run_pages (company_url, page_number, records_json) values (?, ?, ?)",
+                (company_url, page, json.dumps(records))
+            )
+            self.conn.execute(
+                "insert into run_progress (company_url, last_page) values (?, ?) "
+                "on conflict(company_url) do update set last_page = max(last_page, excluded.last_page)",
+                (company_url, page)
+            )
+
+    def load_reviews(self, company_url):
+        """All review records stored for a company in the current run, in page order"""
+        with self.lock:
+            rows = self.conn.execute(
+                "select records_json from run_pages where company_url = ? order by page_number",
+                (company_url,)
+            ).fetchall()
+        return [record for (records_json,) in rows for record in json.loads(records_json)]
+
+    def mark_done(self, company_url, company_name, newest_review_date=None, collected=None):
+        """
+        Flag a company complete.
+        Without `collected` the run reached the old mark (or the last page): the mark is
+        raised to newest_review_date and any collected range dropped. With `collected`
+        the run was stopped by its review target: the mark stays and the range is stored.
+        """
+        if collected:
+            newest_review_date = None
+        collected_from, collected_to = collected or (None, None)
+        with self.lock, self.conn:
+            self.conn.execute(
+                "insert into run_progress (company_url, done) values (?, 1) "
+                "on conflict(company_url) do update set done = 1",
+                (company_url,)
+            )
+            self.conn.execute(
+                "insert into company_state "
+                "(company_url, company_name, high_water_mark, collected_from, collected_to, updated_at) "
+                "values (?, ?, ?, ?, ?, ?) "
+                "on conflict(company_url) do update set "
+                "company_name = excluded.company_name, "
+                "high_water_mark = case "
+                "    when company_state.high_water_mark is null then excluded.high_water_mark "
+                "    when excluded.high_water_mark is null then company_state.high_water_mark "
+                "    else max(company_state.high_water_mark, excluded.high_water_mark) end, "
+                "collected_from = excluded.collected_from, "
+                "collected_to = excluded.collected_to, "
+                "updated_at = excluded.updated_at",
+                (company_url, company_name, newest_review_date, collected_from, collected_to,
+                 datetime.now().isoformat())
+            )
+
+    def finish_run(self):
+        """Drop per-run progress after the datasets have been written"""
+        with self.lock, self.conn:
+            self.conn.execute("delete from run_pages")
+            self.conn.execute("delete from run_progress")
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
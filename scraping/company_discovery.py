@@ -0,0 +1,290 @@
+"""
+Company discovery across Trustpilot categories
+- listing pages of every category are fetched concurrently through the shared
+  FetchEngine, so they draw on the same per-host rate limit as the rest of the scrape
+- each category is paged in order; listings are sorted by reviews_count, so paging
+  stops as soon as a page's smallest review count falls below min_reviews
+- companies are deduplicated by canonical /review/<domain> URL and yielded as soon
+  as their page is parsed, letting profile/review scraping start right away
+
+
+Project: Trustpilot Analytics Pipeline
+"""
+
+import logging
+import re
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from urllib.parse import urlsplit
+
+from bs4 import BeautifulSoup
+
+from review_parsers import _first, _stripped_text
+
+try:
+    from lxml import etree, html as lxml_html
+except ImportError:  # lxml is optional, bs4 backend still works
+    etree = lxml_html = None
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CATEGORIES = ['appliance_store']
+
+# Page format is "4.216,726 reviews" where 4.2 is rating and 16,726 is review count
+_REVIEW_COUNT = re.compile(r'\d\.\d([\d,]+)\s*reviews')
+_REVIEW_COUNT_SPAN = re.compile(r'\d\.\d([\d,]+)')
+
+
+def canonical_company_url(base_url, href):
+    """
+    base_url + /review/<domain>, without query, fragment, trailing slash or case differences.
+    None when href is not a company review link (no /review/<domain> path, or another site).
+    """
+    parts = urlsplit(href)
+    host = parts.netloc.lower()
+    trustpilot = host == 'trustpilot.com' or host.endswith('.trustpilot.com')
+    if host and host != urlsplit(base_url).netloc.lower() and not trustpilot:
+        return None
+    path = parts.path.rstrip('/')
+    start = path.find('/review/')
+    if start < 0:
+        return None
+    domain = path[start + len('/review/'):].split('/')[0].lower()
+    return f"{base_url}/review/{domain}" if domain else None
+
+
+def _review_count(text, pattern):
+    match = pattern.search(text)
+    return int(match.group(1).replace(',', '')) if match else 0
+
+
+def parse_category_cards_bs4(page_html):
+    """Original extraction path - one select_one per field"""
+    soup = BeautifulSoup(page_html, 'html.parser')
+    cards = []
+    for card in soup.select('div.styles_card__WMwue'):
+        try:
+            main_div = card.select_one('div.styles_businessUnitMain__wRgqU')
+            if not main_div:
+                continue
+
+            name_el = main_div.select_one('p[class*="heading-s"]')
+            company_name = name_el.get_text(strip=True) if name_el else None
+            if not company_name:
+                continue
+
+            domain_el = main_div.select_one('p[class*="websiteUrlDisplayed"]')
+
+            rating = None
+            rating_div = card.select_one('div.styles_rating__lOWGj')
+            if rating_div:
+                rating_span = rating_div.select_one('span')
+                rating = rating_span.get_text(strip=True) if rating_span else None
+
+            # Review count - skip the rating prefix
+            review_count = 0
+            rating_text_el = main_div.select_one('p[class*="ratingText"]')
+            if rating_text_el:
+                review_count = _review_count(rating_text_el.get_text(strip=True), _REVIEW_COUNT)
+            else:
+                for span in card.select('span'):
+                    if 'reviews' in span.get_text().lower():
+                        review_count = _review_count(span.get_text(), _REVIEW_COUNT_SPAN)
+                        break
+
+            link = card.select_one('a[href*="/review/"]')
+            if not link:
+                continue
+
+            loc_div = card.select_one('div.styles_businessLocation__PIJjr')
+
+            cards.append({
+                'company_name': company_name,
+                'domain': domain_el.get_text(strip=True) if domain_el else None,
+                'rating': rating,
+                'review_count': review_count,
+                'location': loc_div.get_text(strip=True) if loc_div else 'Unknown',
+                'href': link['href']
+            })
+        except Exception:
+            continue
+    return cards
+
+
+def _has_class(name):
+    return f'contains(concat(" ", normalize-space(@class), " "), " {name} ")'
+
+
+if etree is not None:
+    # Compiled once at import - same selectors as the bs4 path
+    _CARDS = etree.XPath(f'//div[{_has_class("styles_card__WMwue")}]')
+    _MAIN = etree.XPath(f'(.//div[{_has_class("styles_businessUnitMain__wRgqU")}])[1]')
+    _NAME = etree.XPath('(.//p[contains(@class, "heading-s")])[1]')
+    _DOMAIN = etree.XPath('(.//p[contains(@class, "websiteUrlDisplayed")])[1]')
+    _RATING_DIV = etree.XPath(f'(.//div[{_has_class("styles_rating__lOWGj")}])[1]')
+    _FIRST_SPAN = etree.XPath('(.//span)[1]')
+    _RATING_TEXT = etree.XPath('(.//p[contains(@class, "ratingText")])[1]')
+    _SPANS = etree.XPath('.//span')
+    _LINK = etree.XPath('(.//a[contains(@href, "/review/")])[1]')
+    _LOCATION = etree.XPath(f'(.//div[{_has_class("styles_businessLocation__PIJjr")}])[1]')
+
+
+def parse_category_cards_lxml(page_html):
+    """Fast path - precompiled XPath over an lxml tree"""
+    if etree is None:
+        raise ImportError("lxml is required for the 'lxml' parser backend")
+    if not page_html.strip():
+        return []
+    root = lxml_html.document_fromstring(page_html)
+    cards = []
+    for card in _CARDS(root):
+        try:
+            main_div = _first(_MAIN, card)
+            if main_div is None:
+                continue
+
+            name_el = _first(_NAME, main_div)
+            company_name = _stripped_text(name_el) if name_el is not None else None
+            if not company_name:
+                continue
+
+            domain_el = _first(_DOMAIN, main_div)
+
+            rating = None
+            rating_div = _first(_RATING_DIV, card)
+            if rating_div is not None:
+                rating_span = _first(_FIRST_SPAN, rating_div)
+                rating = _stripped_text(rating_span) if rating_span is not None else None
+
+            review_count = 0
+            rating_text_el = _first(_RATING_TEXT, main_div)
+            if rating_text_el is not None:
+                review_count = _review_count(_stripped_text(rating_text_el), _REVIEW_COUNT)
+            else:
+                for span in _SPANS(card):
+                    text = span.text_content()
+                    if 'reviews' in text.lower():
+                        review_count = _review_count(text, _REVIEW_COUNT_SPAN)
+                        break
+
+            link = _first(_LINK, card)
+            if link is None:
+                continue
+
+            loc_div = _first(_LOCATION, card)
+
+            cards.append({
+                'company_name': company_name,
+                'domain': _stripped_text(domain_el) if domain_el is not None else None,
+                'rating': rating,
+                'review_count': review_count,
+                'location': _stripped_text(loc_div) if loc_div is not None else 'Unknown',
+                'href': link.get('href')
+            })
+        except Exception:
+            continue
+    return cards
+
+
+CATEGORY_PARSERS = {
+    'bs4': parse_category_cards_bs4,
+    'lxml': parse_category_cards_lxml,
+}
+
+
+def get_category_parser(name):
+    """Look up a category card parser backend by name"""
+    if name not in CATEGORY_PARSERS:
+        raise ValueError(f"Unknown parser backend '{name}' - choose from {', '.join(CATEGORY_PARSERS)}")
+    if name == 'lxml' and etree is None:
+        raise ImportError("lxml is required for the 'lxml' parser backend")
+    return CATEGORY_PARSERS[name]
+
+
+class CompanyDiscovery:
+    """
+    fetcher: FetchEngine used for every listing page
+    parse_cards: category card parser backend
+    max_pages: hard cap on pages followed per category
+    metrics: optional ScraperMetrics for category parse time and errors
+    """
+
+    def __init__(self, fetcher, base_url, parse_cards, max_pages=50, metrics=None):
+        self.fetcher = fetcher
+        self.metrics = metrics
+        self.base_url = base_url
+        self.parse_cards = parse_cards
+        self.max_pages = max_pages
+
+    def category_url(self, category, page):
+        url = f"{self.base_url}/categories/{category}?sort=reviews_count"
+        return url if page == 1 else f"{url}&page={page}"
+
+    def _fetch_page(self, category, page):
+        """(category, page, cards) - an unreachable page ends that category"""
+        url = self.category_url(category, page)
+        try:
+            response = self.fetcher.get(url, timeout=15)
+            response.raise_for_status()
+            start = time.perf_counter()
+            cards = self.parse_cards(response.text)
+            if self.metrics is not None:
+                self.metrics.record_parse('category', time.perf_counter() - start)
+        except Exception as e:
+            if self.metrics is not None:
+                self.metrics.record_error('discovery', e)
+            logger.warning("category page failed", extra={'category': category, 'page': page, 'error': repr(e)})
+            cards = []
+        logger.debug("category page scanned", extra={'category': category, 'page': page, 'cards': len(cards)})
+        return category, page, cards
+
+    def discover(self, categories=None, min_reviews=1000):
+        """
+        Yield companies with min_reviews+ reviews across categories, each once.
+        Pages of different categories are in flight together; page N+1 of a category
+        is only requested once page N showed it can still hold qualifying companies.
+        """
+        categories = list(dict.fromkeys(categories or DEFAULT_CATEGORIES))
+        seen = set()
+        workers = max(1, min(self.fetcher.max_in_flight, len(categories)))
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            pending = {pool.submit(self._fetch_page, category, 1) for category in categories}
+            try:
+                while pending:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        category, page, cards = future.result()
+
+                        # Sorted by reviews_count - an empty page or one dipping below the threshold is the last.
+                        # Cards without a parsed count (0, e.g. sponsored) say nothing about the order.
+                        counts = [c['review_count'] for c in cards if c['review_count'] > 0]
+                        if cards and (not counts or min(counts) >= min_reviews) and page < self.max_pages:
+                            pending.add(pool.submit(self._fetch_page, category, page + 1))
+
+                        for card in cards:
+                            if card['review_count'] < min_reviews:
+                                continue
+                            company_url = canonical_company_url(self.base_url, card['href'])
+                            if company_url is None:
+                                logger.warning("card without a company review link skipped",
+                                               extra={'company': card['company_name'], 'href': card['href'],
+                                                      'category': category})
+                                continue
+                            if company_url in seen:
+                                continue
+                            seen.add(company_url)
+                            logger.info("company found", extra={'company': card['company_name'],
+                                                                'listed_reviews': card['review_count'],
+                                                                'category': category})
+                            yield {
+                                'company_name': card['company_name'],
+                                'domain': card['domain'],
+                                'rating': card['rating'],
+                                'review_count': card['review_count'],
+                                'location': card['location'],
+                                'company_url': company_url
+                            }
+            finally:
+                # Consumer stopped early - drop pages not yet started
+                for future in pending:
+                    future.cancel()
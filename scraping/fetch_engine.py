@@ -0,0 +1,350 @@
+"""
+Concurrent fetch engine for the Trustpilot scraper
+Keeps several page requests in flight and paces them with a per-host token bucket.
+Every network GET goes through a resilient transport:
+- RetryPolicy: exponential backoff with full jitter on 429/5xx, timeouts and
+  connection errors, never sooner than the server's Retry-After
+- CircuitBreaker: per host, pauses all traffic after repeated failures (or for a
+  Retry-After) and lets a single probe through before resuming
+- AdaptiveConcurrency: per host AIMD limit on requests in flight - grows while
+  responses are fast and clean, shrinks when latency or errors rise
+
+
+Project: Trustpilot Analytics Pipeline
+"""
+
+import logging
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlsplit
+
+import requests
+
+logger = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    """Thread-safe token bucket - refills at `rate` tokens/sec up to `capacity`"""
+
+    def __init__(self, rate, capacity=1):
+        self.rate = float(rate)
+        self.capacity = float(capacity)
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """Take one token, sleeping until it is available. Returns seconds waited."""
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            # Reserve the token up front so waiting callers queue in arrival order
+            self.tokens -= 1
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0.0
+
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+
+class HostRateLimiter:
+    """One token bucket per host, created lazily on first request"""
+
+    def __init__(self, rate=1.0, capacity=2, overrides=None):
+        self.rate = rate
+        self.capacity = capacity
+        self.overrides = overrides or {}  # host -> (rate, capacity)
+        self.buckets = {}
+        self.lock = threading.Lock()
+
+    def bucket_for(self, url):
+        host = urlsplit(url).netloc
+        with self.lock:
+            if host not in self.buckets:
+                rate, capacity = self.overrides.get(host, (self.rate, self.capacity))
+                self.buckets[host] = TokenBucket(rate, capacity)
+            return self.buckets[host]
+
+    def wait(self, url):
+        return self.bucket_for(url).acquire()
+
+
+def retry_after_seconds(response):
+    """Seconds asked for by a Retry-After header (delta or HTTP date), or None"""
+    value = response.headers.get('Retry-After') if response is not None else None
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return max(0.0, (when - datetime.now(timezone.utc)).total_seconds())
+
+
+class RetryPolicy:
+    """
+    Which failures are retried and how long to back off.
+    max_attempts: total tries per request (1 disables retries)
+    backoff / max_backoff: full-jitter exponential backoff - attempt n waits
+    uniformly between 0 and min(max_backoff, backoff * 2**n) seconds
+    max_retry_after: cap on a server-requested Retry-After wait
+    """
+
+    RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+    RETRY_ERRORS = (requests.ConnectionError, requests.Timeout)
+
+    def __init__(self, max_attempts=5, backoff=0.5, max_backoff=30.0, max_retry_after=300.0):
+        self.max_attempts = max(1, int(max_attempts))
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.max_retry_after = max_retry_after
+
+    def should_retry(self, response=None, error=None):
+        if error is not None:
+            return isinstance(error, self.RETRY_ERRORS)
+        return response.status_code in self.RETRY_STATUSES
+
+    def delay(self, attempt, retry_after=None):
+        """Seconds to wait before retry number attempt + 1 (attempt counts from 0)"""
+        wait = random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+        if retry_after is not None:
+            wait = max(wait, min(retry_after, self.max_retry_after))
+        return wait
+
+
+class CircuitBreaker:
+    """
+    Per-host breaker shared by all fetch threads.
+    closed -> open after failure_threshold consecutive failures; open blocks every
+    caller for reset_timeout seconds, then half-open lets one probe through - its
+    success closes the breaker, its failure re-opens it. A Retry-After pauses the
+    host the same way without counting as an opening.
+    """
+
+    def __init__(self, host, failure_threshold=5, reset_timeout=30.0, metrics=None):
+        self.host = host
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.metrics = metrics
+        self.state = 'closed'
+        self.failures = 0
+        self.blocked_until = 0.0
+        self.probing = False
+        self.cond = threading.Condition()
+
+    def acquire(self):
+        """Block until a request may go out. Returns seconds waited."""
+        start = time.monotonic()
+        with self.cond:
+            while True:
+                now = time.monotonic()
+                if now < self.blocked_until:
+                    self.cond.wait(self.blocked_until - now)
+                elif self.state == 'closed':
+                    break
+                elif not self.probing:
+                    # Cool-down over - this caller is the half-open probe
+                    self.state = 'half_open'
+                    self.probing = True
+                    break
+                else:
+                    self.cond.wait(self.reset_timeout)
+        return time.monotonic() - start
+
+    def record_success(self):
+        with self.cond:
+            self.failures = 0
+            self.probing = False
+            if self.state != 'closed':
+                self.state = 'closed'
+                logger.info("circuit closed", extra={'host': self.host})
+            self.cond.notify_all()
+
+    def record_failure(self, retry_after=None):
+        with self.cond:
+            self.failures += 1
+            now = time.monotonic()
+            if self.state == 'half_open' or (self.state == 'closed' and self.failures >= self.failure_threshold):
+                self.state = 'open'
+                self.blocked_until = max(self.blocked_until, now + self.reset_timeout)
+                logger.warning("circuit opened", extra={'host': self.host, 'failures': self.failures,
+                                                        'reset_seconds': self.reset_timeout})
+                if self.metrics is not None:
+                    self.metrics.record_circuit_open(self.host)
+            if retry_after:
+                self.blocked_until = max(self.blocked_until, now + retry_after)
+            self.probing = False
+            self.cond.notify_all()
+
+    def release(self):
+        """Request ended without a verdict on the host (e.g. a local error) - free the probe slot"""
+        with self.cond:
+            if self.probing:
+                self.probing = False
+                self.state = 'open'
+                self.cond.notify_all()
+
+
+class AdaptiveConcurrency:
+    """
+    AIMD limit on one host's requests in flight, between min_limit and max_limit.
+    A fast clean response adds 1/limit (about +1 per round of requests); a response
+    slower than latency_target scales the limit by 0.9 and a 429/5xx/timeout halves
+    it - each decrease at most once per cooldown seconds, so one burst counts once.
+    """
+
+    def __init__(self, max_limit, min_limit=1, initial=None, latency_target=2.0, cooldown=1.0):
+        self.max_limit = max(1, max_limit)
+        self.min_limit = max(1, min(min_limit, self.max_limit))
+        self.limit = float(initial if initial is not None else max(self.min_limit, self.max_limit // 2))
+        self.latency_target = latency_target
+        self.cooldown = cooldown
+        self.in_flight = 0
+        self.last_decrease = 0.0
+        self.cond = threading.Condition()
+
+    def acquire(self):
+        with self.cond:
+            while self.in_flight >= int(self.limit):
+                self.cond.wait()
+            self.in_flight += 1
+
+    def release(self, latency=None, ok=True):
+        """Free the slot and adapt: ok=False for a retryable failure, latency in seconds for a response"""
+        with self.cond:
+            self.in_flight -= 1
+            now = time.monotonic()
+            if not ok or (latency is not None and latency > self.latency_target):
+                if now - self.last_decrease >= self.cooldown:
+                    self.limit = max(self.min_limit, self.limit * (0.9 if ok else 0.5))
+                    self.last_decrease = now
+            elif latency is not None:
+                self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+            self.cond.notify_all()
+
+
+class HostGuard:
+    """Circuit breaker and adaptive concurrency limit for one host"""
+
+    def __init__(self, host, max_in_flight, failure_threshold=5, reset_timeout=30.0, latency_target=2.0,
+                 metrics=None):
+        self.breaker = CircuitBreaker(host, failure_threshold, reset_timeout, metrics=metrics)
+        self.concurrency = AdaptiveConcurrency(max_in_flight, latency_target=latency_target)
+
+
+class FetchEngine:
+    """
+    Thread-pool fetcher shared by all scraper stages.
+    Each worker thread gets its own requests.Session (sessions are not thread-safe);
+    every GET first passes the host's circuit breaker and concurrency limit, then
+    takes a token from the host's bucket, so wall-clock time is bounded by the
+    politeness budget rather than by serial latency. Retryable failures are retried
+    per retry_policy; the last failed response is returned (or its error raised)
+    for the caller's raise_for_status.
+    """
+
+    def __init__(self, headers=None, max_in_flight=4, rate_limiter=None, timeout=15, cache=None, metrics=None,
+                 retry_policy=None, failure_threshold=5, reset_timeout=30.0, latency_target=2.0):
+        self.headers = dict(headers or {})
+        self.max_in_flight = max(1, int(max_in_flight))
+        self.rate_limiter = rate_limiter or HostRateLimiter()
+        self.timeout = timeout
+        self.cache = cache  # optional HttpCache - cache hits skip the rate limiter
+        self.metrics = metrics  # optional ScraperMetrics - latency, bytes, rate-limit waits and retries
+        self.retry_policy = retry_policy or RetryPolicy()
+        self.guard_settings = {'failure_threshold': failure_threshold, 'reset_timeout': reset_timeout,
+                               'latency_target': latency_target}
+        self.guards = {}
+        self._guards_lock = threading.Lock()
+        self._local = threading.local()
+
+    def guard_for(self, url):
+        host = urlsplit(url).netloc
+        with self._guards_lock:
+            if host not in self.guards:
+                self.guards[host] = HostGuard(host, self.max_in_flight, metrics=self.metrics, **self.guard_settings)
+            return self.guards[host]
+
+    def _session(self):
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = requests.Session()
+            session.headers.update(self.headers)
+            self._local.session = session
+        return session
+
+    def get(self, url, timeout=None):
+        """Rate-limited GET on the calling thread's session, through the cache if one is set"""
+        if self.cache is None:
+            return self._network_get(url, timeout)
+        start = time.perf_counter()
+        response = self.cache.fetch(url, lambda headers: self._network_get(url, timeout, headers))
+        if self.metrics is not None and getattr(response, 'from_cache', False):
+            self.metrics.record_request(time.perf_counter() - start, response.status_code,
+                                        len(response.content), from_cache=True)
+        return response
+
+    def _network_get(self, url, timeout=None, headers=None):
+        guard = self.guard_for(url)
+        policy = self.retry_policy
+        for attempt in range(policy.max_attempts):
+            waited = guard.breaker.acquire()
+            guard.concurrency.acquire()
+            response = error = None
+            try:
+                waited += self.rate_limiter.wait(url)
+                start = time.perf_counter()
+                response = self._session().get(url, timeout=timeout or self.timeout, headers=headers)
+            except Exception as e:
+                error = e
+            elapsed = time.perf_counter() - start if error is None else None
+
+            retryable = policy.should_retry(response, error)
+            guard.concurrency.release(latency=elapsed, ok=not retryable)
+            if retryable:
+                guard.breaker.record_failure(retry_after_seconds(response))
+            elif error is not None:
+                guard.breaker.release()
+            else:
+                guard.breaker.record_success()
+
+            if self.metrics is not None:
+                # Latency excludes the breaker and token waits, which are reported separately as throttling
+                self.metrics.record_throttle(waited)
+                if response is not None:
+                    self.metrics.record_request(elapsed, response.status_code, len(response.content))
+
+            if not retryable or attempt == policy.max_attempts - 1:
+                if error is not None:
+                    raise error
+                return response
+
+            delay = policy.delay(attempt, retry_after_seconds(response))
+            reason = type(error).__name__ if error is not None else str(response.status_code)
+            if self.metrics is not None:
+                self.metrics.record_retry(reason, delay)
+            logger.debug("retrying request", extra={'url': url, 'attempt': attempt + 1, 'reason': reason,
+                                                    'delay': round(delay, 3)})
+            time.sleep(delay)
+
+    def map(self, fn, items):
+        """
+        Run fn over items with up to max_in_flight workers, results in input order.
+        items may be a generator - each item is submitted as soon as it is produced.
+        """
+        if self.max_in_flight == 1:
+            return [fn(item) for item in items]
+        with ThreadPoolExecutor(max_workers=self.max_in_flight) as pool:
+            futures = [pool.submit(fn, item) for item in items]
+            return [future.result() for future in futures]
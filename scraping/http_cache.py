@@ -0,0 +1,224 @@
+"""
+On-disk HTTP cache for the scraper's fetch engine
+- bodies stored content-addressed (sha256) under objects/, so identical pages share one file
+- SQLite index of url -> body digest, validators and timestamps
+- fresh entries (younger than ttl) are served without touching the network
+- stale entries are revalidated with If-None-Match / If-Modified-Since
+- least-recently-used entries are evicted once the cache exceeds max_bytes
+- replay mode serves everything from the cache and never goes to the network
+
+
+Project: Trustpilot Analytics Pipeline
+"""
+
+import hashlib
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+SCHEMA = """
+create table if not exists entries (
+    url text primary key,
+    digest text not null,
+    etag text,
+    last_modified text,
+    content_type text,
+    encoding text,
+    fetched_at real not null,
+    accessed_at real not null
+);
+create table if not exists objects (
+    digest text primary key,
+    size integer not null
+);
+create index if not exists entries_accessed on entries (accessed_at);
+"""
+
+
+class CacheMiss(requests.RequestException):
+    """Raised in replay mode when a URL was never cached"""
+
+
+class HttpCache:
+    """
+    path: cache directory (index.db + objects/)
+    ttl: seconds an entry is served without revalidation (None = never stale)
+    max_bytes: total body size kept before LRU eviction
+    replay: serve only from the cache, raising CacheMiss for unknown URLs
+    """
+
+    def __init__(self, path="Trustpilot_data/http_cache", ttl=24 * 3600, max_bytes=512 * 1024 * 1024, replay=False):
+        self.path = path
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.replay = replay
+        self.objects_dir = os.path.join(path, 'objects')
+        os.makedirs(self.objects_dir, exist_ok=True)
+
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(os.path.join(path, 'index.db'), check_same_thread=False)
+        self.conn.executescript(SCHEMA)
+        self.conn.commit()
+
+        self.hits = 0
+        self.revalidated = 0
+        self.misses = 0
+
+    def _object_path(self, digest):
+        return os.path.join(self.objects_dir, digest[:2], digest)
+
+    def _lookup(self, url):
+        """
+        (entry, body) for a cached URL, or (None, None).
+        The body is read under the lock so eviction cannot delete it mid-lookup; an entry
+        whose body file has gone missing anyway is dropped and counts as a miss.
+        """
+        with self.lock:
+            row = self.conn.execute(
+                "select digest, etag, last_modified, content_type, encoding, fetched_at from entries where url = ?",
+                (url,)
+            ).fetchone()
+            if row is None:
+                return None, None
+            entry = dict(zip(('digest', 'etag', 'last_modified', 'content_type', 'encoding', 'fetched_at'), row))
+            body = self._read_body(entry['digest'])
+            if body is None:
+                with self.conn:
+                    self.conn.execute("delete from entries where url = ?", (url,))
+                    self._drop_unreferenced(entry['digest'])
+                return None, None
+        return entry, body
+
+    def _read_body(self, digest):
+        try:
+            with open(self._object_path(digest), 'rb') as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def _write_body(self, body):
+        """Store a body under its sha256 digest (atomic, skipped if already present)"""
+        digest = hashlib.sha256(body).hexdigest()
+        target = self._object_path(digest)
+        if not os.path.exists(target):
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            fd, tmp = tempfile.mkstemp(dir=os.path.dirname(target))
+            with os.fdopen(fd, 'wb') as f:
+                f.write(body)
+            os.replace(tmp, target)
+        return digest
+
+    def _response(self, url, entry, body):
+        """Rebuild a requests.Response from a cache entry"""
+        response = requests.Response()
+        response.status_code = 200
+        response.reason = 'OK'
+        response.url = url
+        response._content = body
+        response.encoding = entry['encoding']
+        response.headers = CaseInsensitiveDict({
+            k: v for k, v in (
+                ('Content-Type', entry['content_type']),
+                ('ETag', entry['etag']),
+                ('Last-Modified', entry['last_modified']),
+            ) if v
+        })
+        response.from_cache = True
+        return response
+
+    def _touch(self, url, fetched_at=None):
+        with self.lock, self.conn:
+            if fetched_at is None:
+                self.conn.execute("update entries set accessed_at = ? where url = ?", (time.time(), url))
+            else:
+                self.conn.execute("update entries set accessed_at = ?, fetched_at = ? where url = ?",
+                                  (time.time(), fetched_at, url))
+
+    def store(self, url, response):
+        """Cache a 200 response and evict down to max_bytes"""
+        body = response.content
+        now = time.time()
+        # Body and index row under one lock - eviction cannot remove the body in between
+        with self.lock, self.conn:
+            digest = self._write_body(body)
+            self.conn.execute("insert or ignore into objects (digest, size) values (?, ?)", (digest, len(body)))
+            self.conn.execute(
+                "insert or replace into entries "
+                "(url, digest, etag, last_modified, content_type, encoding, fetched_at, accessed_at) "
+                "values (?, ?, ?, ?, ?, ?, ?, ?)",
+                (url, digest, response.headers.get('ETag'), response.headers.get('Last-Modified'),
+                 response.headers.get('Content-Type'), response.encoding, now, now)
+            )
+        self.evict()
+
+    def evict(self):
+        """Drop least-recently-used entries (and unreferenced bodies) until under max_bytes"""
+        if self.max_bytes is None:
+            return
+        with self.lock, self.conn:
+            total = self.conn.execute("select coalesce(sum(size), 0) from objects").fetchone()[0]
+            while total > self.max_bytes:
+                row = self.conn.execute("select url, digest from entries order by accessed_at limit 1").fetchone()
+                if row is None:
+                    break
+                url, digest = row
+                self.conn.execute("delete from entries where url = ?", (url,))
+                total -= self._drop_unreferenced(digest)
+
+    def _drop_unreferenced(self, digest):
+        """Delete a body no entry points to any more (caller holds the lock); returns bytes freed"""
+        if self.conn.execute("select 1 from entries where digest = ? limit 1", (digest,)).fetchone():
+            return 0
+        row = self.conn.execute("select size from objects where digest = ?", (digest,)).fetchone()
+        self.conn.execute("delete from objects where digest = ?", (digest,))
+        try:
+            os.remove(self._object_path(digest))
+        except FileNotFoundError:
+            pass
+        return row[0] if row else 0
+
+    def fetch(self, url, send):
+        """
+        Serve `url` through the cache.
+        send(extra_headers) performs the real request and returns a requests.Response.
+        """
+        entry, body = self._lookup(url)
+
+        if self.replay:
+            if entry is None:
+                raise CacheMiss(f"Not in cache (replay mode): {url}")
+            self.hits += 1
+            self._touch(url)
+            return self._response(url, entry, body)
+
+        if entry and (self.ttl is None or time.time() - entry['fetched_at'] < self.ttl):
+            self.hits += 1
+            self._touch(url)
+            return self._response(url, entry, body)
+
+        # Stale or unknown - conditional request when we have validators
+        headers = {}
+        if entry and entry['etag']:
+            headers['If-None-Match'] = entry['etag']
+        if entry and entry['last_modified']:
+            headers['If-Modified-Since'] = entry['last_modified']
+
+        response = send(headers)
+        if response.status_code == 304 and entry:
+            self.revalidated += 1
+            self._touch(url, fetched_at=time.time())
+            return self._response(url, entry, body)
+
+        self.misses += 1
+        if response.status_code == 200:
+            self.store(url, response)
+        return response
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
@@ -0,0 +1,320 @@
+"""
+Scraper instrumentation
+- ScraperMetrics: thread-safe counters and histograms filled in by the fetch
+  engine, parse stage and scraper (latency, bytes, parse / tagging time,
+  rate-limit waits, dropped duplicates, errors and retries by type,
+  circuit breaker openings, per-company throughput)
+- exported as a JSON run report or Prometheus text exposition format
+- configure_logging: structured (key=value or JSON lines) log output
+
+
+Project: Trustpilot Analytics Pipeline
+"""
+
+import bisect
+import json
+import logging
+import threading
+import time
+from datetime import datetime
+
+LATENCY_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+PARSE_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+
+
+def _bound(bound):
+    """Bucket bound as used in reports and the `le` label"""
+    return '+Inf' if bound == float('inf') else bound
+
+
+class Histogram:
+    """Cumulative-bucket histogram (Prometheus semantics), not thread-safe on its own"""
+
+    def __init__(self, buckets):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # last slot is +Inf
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q):
+        """Upper bound of the bucket holding the q-quantile (None when empty)"""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.buckets + (float('inf'),), self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return float('inf')
+
+    def cumulative(self):
+        """[(le, cumulative count)] including +Inf"""
+        total = 0
+        rows = []
+        for bound, count in zip(self.buckets + (float('inf'),), self.counts):
+            total += count
+            rows.append((bound, total))
+        return rows
+
+    def to_dict(self):
+        return {
+            'count': self.count,
+            'sum': round(self.sum, 6),
+            'mean': round(self.sum / self.count, 6) if self.count else None,
+            'p50': _bound(self.quantile(0.5)),
+            'p95': _bound(self.quantile(0.95)),
+            'buckets': {_bound(bound): total for bound, total in self.cumulative()},
+        }
+
+
+class ScraperMetrics:
+    """
+    Run metrics shared by every scraper thread.
+    All recording methods take the one lock briefly; nothing here does I/O.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.started_at = datetime.now().isoformat()
+        self._start = time.perf_counter()
+
+        self.request_latency = {}   # source ('network' / 'cache') -> Histogram
+        self.requests_by_status = {}
+        self.bytes_downloaded = 0
+        self.bytes_from_cache = 0
+        self.throttle_wait_seconds = 0.0
+        self.throttled_requests = 0
+
+        self.parse_time = {}        # page kind ('category' / 'profile' / 'reviews') -> Histogram
+        self.tagging_seconds = 0.0
+        self.reviews_tagged = 0
+
+        self.duplicates_dropped = 0  # reviews already collected by an earlier run
+        self.errors = {}            # (stage, exception type) -> count
+        self.retries = {}           # reason -> count
+        self.retry_wait_seconds = 0.0
+        self.circuit_opens = {}     # host -> count
+        self.companies = {}         # company name -> {'reviews', 'pages', 'seconds'}
+
+    def record_request(self, seconds, status, size, from_cache=False):
+        source = 'cache' if from_cache else 'network'
+        with self.lock:
+            self.request_latency.setdefault(source, Histogram(LATENCY_BUCKETS)).observe(seconds)
+            self.requests_by_status[status] = self.requests_by_status.get(status, 0) + 1
+            if from_cache:
+                self.bytes_from_cache += size
+            else:
+                self.bytes_downloaded += size
+
+    def record_throttle(self, seconds):
+        """Time a request spent waiting for a rate-limit token"""
+        if seconds <= 0:
+            return
+        with self.lock:
+            self.throttle_wait_seconds += seconds
+            self.throttled_requests += 1
+
+    def record_parse(self, kind, seconds):
+        with self.lock:
+            self.parse_time.setdefault(kind, Histogram(PARSE_BUCKETS)).observe(seconds)
+
+    def record_tagging(self, seconds, reviews):
+        with self.lock:
+            self.tagging_seconds += seconds
+            self.reviews_tagged += reviews
+
+    def record_duplicates(self, count):
+        """Reviews dropped by the seen-set before reaching the sink"""
+        with self.lock:
+            self.duplicates_dropped += count
+
+    def record_error(self, stage, error):
+        key = (stage, type(error).__name__)
+        with self.lock:
+            self.errors[key] = self.errors.get(key, 0) + 1
+
+    def record_retry(self, reason, wait=0.0):
+        """One retried request - reason is the HTTP status or exception type, wait the backoff slept"""
+        reason = str(reason)
+        with self.lock:
+            self.retries[reason] = self.retries.get(reason, 0) + 1
+            self.retry_wait_seconds += wait
+
+    def record_circuit_open(self, host):
+        with self.lock:
+            self.circuit_opens[host] = self.circuit_opens.get(host, 0) + 1
+
+    def record_company(self, company_name, reviews, pages, seconds):
+        with self.lock:
+            stats = self.companies.setdefault(company_name, {'reviews': 0, 'pages': 0, 'seconds': 0.0})
+            stats['reviews'] += reviews
+            stats['pages'] += pages
+            stats['seconds'] += seconds
+
+    def report(self):
+        """JSON-serialisable snapshot of everything recorded so far"""
+        with self.lock:
+            elapsed = time.perf_counter() - self._start
+            return {
+                'started_at': self.started_at,
+                'elapsed_seconds': round(elapsed, 3),
+                'requests': {
+                    'total': sum(self.requests_by_status.values()),
+                    'by_status': {str(k): v for k, v in sorted(self.requests_by_status.items())},
+                    'latency_seconds': {k: h.to_dict() for k, h in self.request_latency.items()},
+                    'bytes_downloaded': self.bytes_downloaded,
+                    'bytes_from_cache': self.bytes_from_cache,
+                },
+                'throttling': {
+                    'wait_seconds': round(self.throttle_wait_seconds, 3),
+                    'throttled_requests': self.throttled_requests,
+                },
+                'parse_seconds': {k: h.to_dict() for k, h in self.parse_time.items()},
+                'topic_tagging': {
+                    'seconds': round(self.tagging_seconds, 6),
+                    'reviews': self.reviews_tagged,
+                },
+                'duplicates_dropped': self.duplicates_dropped,
+                'errors': [{'stage': stage, 'type': kind, 'count': count}
+                           for (stage, kind), count in sorted(self.errors.items())],
+                'retries': dict(sorted(self.retries.items())),
+                'retry_wait_seconds': round(self.retry_wait_seconds, 3),
+                'circuit_opens': dict(sorted(self.circuit_opens.items())),
+                'companies': {
+                    name: {**stats, 'seconds': round(stats['seconds'], 3),
+                           'reviews_per_sec': round(stats['reviews'] / stats['seconds'], 2) if stats['seconds'] else None}
+                    for name, stats in self.companies.items()
+                },
+            }
+
+    def write_json(self, path):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.report(), f, indent=2)
+        return path
+
+    def to_prometheus(self, prefix='trustpilot_scraper'):
+        """Prometheus text exposition format (version 0.0.4)"""
+        lines = []
+
+        def metric(name, kind, help_text, samples):
+            lines.append(f"# HELP {prefix}_{name} {help_text}")
+            lines.append(f"# TYPE {prefix}_{name} {kind}")
+            for suffix, labels, value in samples:
+                lines.append(f"{prefix}_{name}{suffix}{_labels(labels)} {_number(value)}")
+
+        def histogram_samples(histograms, label):
+            samples = []
+            for key, hist in sorted(histograms.items()):
+                for bound, total in hist.cumulative():
+                    samples.append(('_bucket', {label: key, 'le': _bound(bound)}, total))
+                samples.append(('_sum', {label: key}, hist.sum))
+                samples.append(('_count', {label: key}, hist.count))
+            return samples
+
+        with self.lock:
+            metric('request_duration_seconds', 'histogram', 'Page request latency.',
+                   histogram_samples(self.request_latency, 'source'))
+            metric('requests_total', 'counter', 'Page requests by HTTP status.',
+                   [('', {'status': k}, v) for k, v in sorted(self.requests_by_status.items())])
+            metric('downloaded_bytes_total', 'counter', 'Response bytes received from the network.',
+                   [('', {}, self.bytes_downloaded)])
+            metric('cache_bytes_total', 'counter', 'Response bytes served from the HTTP cache.',
+                   [('', {}, self.bytes_from_cache)])
+            metric('throttle_wait_seconds_total', 'counter', 'Time spent waiting for rate-limit tokens.',
+                   [('', {}, self.throttle_wait_seconds)])
+            metric('parse_duration_seconds', 'histogram', 'Page parse time by page kind.',
+                   histogram_samples(self.parse_time, 'kind'))
+            metric('topic_tagging_seconds_total', 'counter', 'Time spent tagging review topics.',
+                   [('', {}, self.tagging_seconds)])
+            metric('reviews_tagged_total', 'counter', 'Reviews run through the topic tagger.',
+                   [('', {}, self.reviews_tagged)])
+            metric('duplicate_reviews_total', 'counter', 'Reviews dropped as already collected.',
+                   [('', {}, self.duplicates_dropped)])
+            metric('errors_total', 'counter', 'Handled errors by stage and exception type.',
+                   [('', {'stage': stage, 'type': kind}, count) for (stage, kind), count in sorted(self.errors.items())])
+            metric('retries_total', 'counter', 'Request retries by reason.',
+                   [('', {'reason': k}, v) for k, v in sorted(self.retries.items())])
+            metric('retry_wait_seconds_total', 'counter', 'Time spent backing off before retries.',
+                   [('', {}, self.retry_wait_seconds)])
+            metric('circuit_opens_total', 'counter', 'Circuit breaker openings by host.',
+                   [('', {'host': k}, v) for k, v in sorted(self.circuit_opens.items())])
+            metric('company_reviews_total', 'counter', 'Reviews collected per company.',
+                   [('', {'company': k}, v['reviews']) for k, v in sorted(self.companies.items())])
+            metric('company_reviews_per_second', 'gauge', 'Review collection throughput per company.',
+                   [('', {'company': k}, v['reviews'] / v['seconds'] if v['seconds'] else 0)
+                    for k, v in sorted(self.companies.items())])
+        return '\n'.join(lines) + '\n'
+
+    def write_prometheus(self, path):
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(self.to_prometheus())
+        return path
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{k}="{_escape(v)}"' for k, v in labels.items()) + '}'
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+# LogRecord attributes that are not user-supplied `extra` fields
+_RESERVED = set(vars(logging.makeLogRecord({}))) | {'message', 'asctime'}
+
+
+class StructuredFormatter(logging.Formatter):
+    """
+    'text': timestamp level logger message key=value ...
+    'json': one JSON object per line
+    Fields come from logging's extra={...}. A dict field groups keys that could clash
+    with LogRecord attributes (e.g. user-defined topic names): it is nested in JSON
+    and written as field.key=value in text.
+    """
+
+    def __init__(self, style='text'):
+        super().__init__(datefmt='%Y-%m-%dT%H:%M:%S')
+        self.style = style
+
+    def format(self, record):
+        fields = {k: v for k, v in vars(record).items() if k not in _RESERVED}
+        message = record.getMessage()
+        if self.style == 'json':
+            entry = {'ts': self.formatTime(record, self.datefmt), 'level': record.levelname,
+                     'logger': record.name, 'msg': message, **fields}
+            if record.exc_info:
+                entry['exc'] = self.formatException(record.exc_info)
+            return json.dumps(entry, default=str)
+        line = f"{self.formatTime(record, self.datefmt)} {record.levelname:<7} {record.name} {message}"
+        if fields:
+            line += ' ' + ' '.join(
+                f"{k}.{key}={value}" if isinstance(v, dict) else f"{k}={v}"
+                for k, v in fields.items()
+                for key, value in (v.items() if isinstance(v, dict) else [(None, None)])
+            )
+        if record.exc_info:
+            line += '\n' + self.formatException(record.exc_info)
+        return line
+
+
+def configure_logging(level='INFO', style='text'):
+    """Route scraper logs to stderr at `level` ('DEBUG', 'INFO', ...) in 'text' or 'json' style"""
+    handler = logging.StreamHandler()
+    handler.setFormatter(StructuredFormatter(style))
+    root = logging.getLogger()
+    for existing in list(root.handlers):
+        root.removeHandler(existing)
+    root.addHandler(handler)
+    root.setLevel(level.upper() if isinstance(level, str) else level)
@@ -0,0 +1,122 @@
+"""
+Parse stage of the scraper pipeline
+Fetch threads hand raw page bytes to a parse stage that turns them into records.
+- InlineParser: parses on the calling fetch thread (default, no extra processes)
+- ParsePool: ProcessPoolExecutor workers, so parsing and topic tagging scale past
+  the GIL; a bounded number of pending pages gives backpressure to the fetchers
+
+submit_reviews returns a future. With a pool (read_ahead), a company's fetch thread
+requests the next review page while the current one parses, then waits for the
+records - paging depends on them (since, target, empty page). Fetch and parse overlap
+per company at the cost of one extra page request where a company's paging stops.
+Profiles are a single page and are parsed synchronously.
+
+
+Project: Trustpilot Analytics Pipeline
+"""
+
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+
+from profile_parser import get_profile_parser
+from review_batch import batch_records, review_batch_columns
+from review_parsers import get_review_parser
+from topic_tagger import TopicTagger
+
+
+def decode_page(raw, encoding):
+    return raw.decode(encoding or 'utf-8', errors='replace')
+
+
+class InlineParser:
+    """
+    Parse on the calling thread.
+    Both parse methods return (result, timings) - seconds spent in 'parse' and,
+    for review pages, in 'tagging' (batch normalization, topic tagging and record assembly).
+    """
+
+    read_ahead = False  # submit_reviews has already parsed the page - nothing to overlap
+
+    def __init__(self, parse_review_cards, tagger, extract_profile):
+        self.parse_review_cards = parse_review_cards
+        self.tagger = tagger
+        self.extract_profile = extract_profile
+
+    def parse_reviews(self, raw, encoding, company_name, page):
+        start = time.perf_counter()
+        cards = self.parse_review_cards(decode_page(raw, encoding))
+        parsed = time.perf_counter()
+        records = batch_records(review_batch_columns(cards, company_name, page, self.tagger))
+        return records, {'parse': parsed - start, 'tagging': time.perf_counter() - parsed}
+
+    def submit_reviews(self, raw, encoding, company_name, page):
+        """parse_reviews as an already completed future"""
+        future = Future()
+        try:
+            future.set_result(self.parse_reviews(raw, encoding, company_name, page))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+
+    def parse_profile(self, raw, encoding, company_name):
+        start = time.perf_counter()
+        profile = self.extract_profile(decode_page(raw, encoding), company_name)
+        return profile, {'parse': time.perf_counter() - start}
+
+    def close(self):
+        pass
+
+
+# Per-process state, built once by the pool initializer
+_worker = {}
+
+
+def _init_worker(parser, topics_config):
+    _worker['parser'] = InlineParser(get_review_parser(parser), TopicTagger.from_config(topics_config),
+                                     get_profile_parser(parser))
+
+
+def _parse_reviews_task(raw, encoding, company_name, page):
+    return _worker['parser'].parse_reviews(raw, encoding, company_name, page)
+
+
+def _parse_profile_task(raw, encoding, company_name):
+    return _worker['parser'].parse_profile(raw, encoding, company_name)
+
+
+class ParsePool:
+    """
+    Process-pool parse stage with the same interface as InlineParser.
+    At most max_pending pages are queued or parsing at once; a fetch thread
+    submitting beyond that blocks until a worker frees a slot.
+    """
+
+    read_ahead = True
+
+    def __init__(self, workers, parser='lxml', topics_config=None, max_pending=None):
+        self.executor = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                            initargs=(parser, topics_config))
+        self.slots = threading.BoundedSemaphore(max_pending or workers * 2)
+
+    def submit(self, fn, *args):
+        self.slots.acquire()
+        try:
+            future = self.executor.submit(fn, *args)
+        except Exception:
+            self.slots.release()
+            raise
+        future.add_done_callback(lambda _: self.slots.release())
+        return future
+
+    def submit_reviews(self, raw, encoding, company_name, page):
+        return self.submit(_parse_reviews_task, raw, encoding, company_name, page)
+
+    def parse_reviews(self, raw, encoding, company_name, page):
+        return self.submit_reviews(raw, encoding, company_name, page).result()
+
+    def parse_profile(self, raw, encoding, company_name):
+        return self.submit(_parse_profile_task, raw, encoding, company_name).result()
+
+    def close(self):
+        self.executor.shutdown()
@@ -0,0 +1,256 @@
+"""
+Company profile page extraction
+Pure functions of the page HTML, so they can run in a parse worker process.
+Structured fields (rating, review count, contact details, address) come from the
+business JSON-LD entity, the rest from module-level compiled patterns over the
+page's text segments. The backends only differ in how the page is parsed:
+- lxml: one libxml2 parse with precompiled XPath (fast path)
+- bs4:  BeautifulSoup html.parser, for environments without lxml
+Both feed the same field rules, so they return identical profiles.
+
+
+Project: Trustpilot Analytics Pipeline
+"""
+
+from bs4 import BeautifulSoup
+from functools import lru_cache
+import re
+import json
+
+try:
+    from lxml import etree, html as lxml_html
+except ImportError:  # lxml is optional, bs4 backend still works
+    etree = lxml_html = None
+
+
+if etree is not None:
+    # Compiled once at import - the lxml path never walks every <a> or re-parses JSON-LD
+    _LD_JSON = etree.XPath('//script[@type="application/ld+json"]/text()')
+    _CATEGORY_LINKS = etree.XPath('//a[contains(@href, "/categories/")]')
+    _WEBSITE_LINKS = etree.XPath('//a[contains(., "Visit website")]')
+    _ABOUT_SECTIONS = etree.XPath('//section[.//text()[contains(., "Written by the company")]]')
+
+_RATING_TEXT = re.compile(r'Reviews\s+[\d,]+\s*[•·]\s*(\d\.\d)')
+_TRUST = re.compile(r'(Excellent|Great|Good|Average|Poor|Bad)\s*\n?\s*[\d,]+K?\s+reviews', re.I)
+_REVIEW_COUNT = re.compile(r'Reviews\s+([\d,]+)')
+_LOCATIONS = re.compile(r'(\d+)\s+Locations?', re.I)
+_REPLIED = re.compile(r'Replied to\s+(\d+%)', re.I)
+_REPLY_TIME = re.compile(r'Typically replies within\s+(\d+\s*\w+)', re.I)
+_FOUNDED = re.compile(r'[Ff]ounded\s+(?:in\s+)?(\d{4})')
+_YEAR = re.compile(r'\d{4}')
+
+# Contact patterns run on one text segment at a time, so a match cannot run
+# across element boundaries ("United States615-259-2031trustpilot@...")
+_PHONE = re.compile(r'(\d{3}[-.\s]?\d{3}[-.\s]?\d{4})')
+_EMAIL = re.compile(r'([a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,})')
+_ADDRESS = re.compile(r'(\d+[^,\n]+,\s*\d{5},?\s*[^,\n]+,\s*United States)')
+_ADDRESS_NO_ZIP = re.compile(r'(\d+[^,\n]+,\s*[^,\n]+,\s*United States)')
+
+# Linear replacement for the lazy About ... Written by the company ... (?=...) scan
+_WRITTEN_BY = re.compile(r'Written by the company\s*', re.I)
+_ABOUT_END = re.compile(r'Contact info|Categories', re.I)
+
+_COUNTRY_NAMES = {'US': 'United States'}
+
+
+@lru_cache(maxsize=256)
+def _about_heading(company_name):
+    return re.compile(r'About\s+' + r'\s+'.join(map(re.escape, company_name.split())), re.I)
+
+
+def _ld_nodes(obj):
+    """JSON-LD dicts in document order (@graph and nested values included)"""
+    if isinstance(obj, dict):
+        yield obj
+        for value in obj.values():
+            yield from _ld_nodes(value)
+    elif isinstance(obj, list):
+        for item in obj:
+            yield from _ld_nodes(item)
+
+
+def _business_entity(scripts):
+    """
+    Parse every JSON-LD block once.
+    Returns (business, rating_value): the first node with an aggregateRating, and
+    the first ratingValue anywhere as a fallback when no such node exists.
+    """
+    rating_value = None
+    for raw in scripts:
+        try:
+            data = json.loads(raw)
+        except ValueError:
+            continue
+        for node in _ld_nodes(data):
+            if isinstance(node.get('aggregateRating'), dict):
+                return node, node['aggregateRating'].get('ratingValue')
+            if rating_value is None and node.get('ratingValue'):
+                rating_value = node['ratingValue']
+    return {}, rating_value
+
+
+def _to_number(value, cast):
+    try:
+        return cast(str(value).replace(',', ''))
+    except (TypeError, ValueError):
+        return None
+
+
+def _format_address(address):
+    """PostalAddress -> 'street, zip, city, country' as shown on the profile page"""
+    if isinstance(address, str):
+        return address.strip() or None
+    if not isinstance(address, dict):
+        return None
+    country = address.get('addressCountry')
+    if isinstance(country, dict):
+        country = country.get('name')
+    parts = (address.get('streetAddress'), address.get('postalCode'),
+             address.get('addressLocality'), _COUNTRY_NAMES.get(country, country))
+    return ', '.join(str(part).strip() for part in parts if part) or None
+
+
+def _first_match(pattern, segments):
+    for segment in segments:
+        match = pattern.search(segment)
+        if match:
+            return match.group(1)
+    return None
+
+
+def _text_segments(el):
+    return [text for text in (t.strip() for t in el.itertext()) if text]
+
+
+def _company_description(about_segments, page_text, company_name):
+    """
+    'Written by the company' text, bounded by its own <section> when there is one.
+    about_segments: text segments of the last such section, None if the page has none.
+    """
+    text = '\n'.join(about_segments) if about_segments is not None else page_text
+    heading = _about_heading(company_name)
+    about = heading.search(text)
+    if about is None and (about_segments is None or not heading.search(page_text)):
+        return None
+    written = _WRITTEN_BY.search(text, about.end() if about else 0)
+    if not written:
+        return None
+    end = _ABOUT_END.search(text, written.end())
+    return text[written.end():end.start() if end else len(text)].strip()[:500]
+
+
+def _build_profile(scripts, segments, category_texts, website_hrefs, about_segments, company_name):
+    """
+    Profile fields from what a backend pulled out of the page:
+    scripts: JSON-LD script bodies; segments: visible text, one stripped segment per
+    text node; category_texts / website_hrefs: text of /categories/ links and hrefs of
+    "Visit website" links in document order; about_segments: see _company_description.
+    """
+    business, rating_value = _business_entity(scripts)
+    aggregate = business.get('aggregateRating') or {}
+    page_text = '\n'.join(segments)
+
+    profile = {}
+
+    profile['overall_rating'] = _to_number(rating_value, float) if rating_value else None
+    if not profile['overall_rating']:
+        match = _RATING_TEXT.search(page_text)
+        profile['overall_rating'] = float(match.group(1)) if match else None
+
+    trust = _TRUST.search(page_text)
+    profile['trust_category'] = trust.group(1) if trust else 'Unknown'
+
+    total = _to_number(aggregate.get('reviewCount'), int) if aggregate.get('reviewCount') else None
+    if total is None:
+        reviews = _REVIEW_COUNT.search(page_text)
+        total = int(reviews.group(1).replace(',', '')) if reviews else 0
+    profile['total_reviews'] = total
+
+    profile['claimed_profile'] = 'Claimed profile' in page_text
+
+    loc = _LOCATIONS.search(page_text)
+    profile['num_locations'] = int(loc.group(1)) if loc else 1
+
+    profile['business_type'] = next((txt for txt in category_texts if 'Store' in txt or 'Shop' in txt), 'Unknown')
+
+    profile['website_url'] = next((href for href in website_hrefs
+                                   if 'utm_source=trustpilot' in href or 'trustpilot.com' not in href), None)
+
+    resp = _REPLIED.search(page_text)
+    profile['negative_response_rate'] = resp.group(1) if resp else 'Unknown'
+
+    time_match = _REPLY_TIME.search(page_text)
+    profile['response_time'] = ' '.join(time_match.group(1).split()) if time_match else 'Unknown'
+
+    profile['verified_company'] = 'Verified company' in page_text
+
+    profile['phone'] = business.get('telephone') or _first_match(_PHONE, segments)
+    profile['email'] = business.get('email') or _first_match(_EMAIL, segments)
+    profile['address'] = (_format_address(business.get('address'))
+                          or _first_match(_ADDRESS, segments)
+                          or _first_match(_ADDRESS_NO_ZIP, segments))
+
+    founded = _YEAR.search(str(business.get('foundingDate') or ''))
+    if founded:
+        profile['founded_year'] = int(founded.group(0))
+    else:
+        founded = _FOUNDED.search(page_text)
+        profile['founded_year'] = int(founded.group(1)) if founded else None
+
+    profile['has_active_subscription'] = 'Active Trustpilot subscription' in page_text
+
+    description = business.get('description')
+    profile['company_description'] = (description.strip()[:500] if isinstance(description, str) and description.strip()
+                                      else _company_description(about_segments, page_text, company_name))
+
+    return profile
+
+
+def extract_profile_lxml(page_html, company_name):
+    """Fast path - one libxml2 parse, precompiled XPath"""
+    if etree is None:
+        raise ImportError("lxml is required for the 'lxml' parser backend")
+    root = lxml_html.document_fromstring(page_html)
+    scripts = _LD_JSON(root)
+    category_texts = [''.join(t.strip() for t in link.itertext()) for link in _CATEGORY_LINKS(root)]
+    website_hrefs = [link.get('href', '') for link in _WEBSITE_LINKS(root)]
+
+    # Same visible text as BeautifulSoup get_text(), one segment per text node
+    etree.strip_elements(root, 'script', 'style', 'template', with_tail=False)
+    sections = _ABOUT_SECTIONS(root)
+    about_segments = _text_segments(sections[-1]) if sections else None
+    return _build_profile(scripts, _text_segments(root), category_texts, website_hrefs, about_segments,
+                          company_name)
+
+
+def extract_profile_bs4(page_html, company_name):
+    """BeautifulSoup backend - same inputs as the lxml path, gathered from a soup"""
+    soup = BeautifulSoup(page_html, 'html.parser')
+    scripts = [script.string for script in soup.select('script[type="application/ld+json"]') if script.string]
+    category_texts = [link.get_text(strip=True) for link in soup.select('a[href*="/categories/"]')]
+    website_hrefs = [link.get('href', '') for link in soup.select('a') if 'Visit website' in link.get_text()]
+
+    for tag in soup(['script', 'style', 'template']):
+        tag.decompose()
+    sections = [section for section in soup.find_all('section')
+                if section.find(string=lambda text: 'Written by the company' in text)]
+    about_segments = list(sections[-1].stripped_strings) if sections else None
+    profile = _build_profile(scripts, list(soup.stripped_strings), category_texts, website_hrefs, about_segments,
+                             company_name)
+    soup.decompose()
+    return profile
+
+
+PROFILE_PARSERS = {
+    'bs4': extract_profile_bs4,
+    'lxml': extract_profile_lxml,
+}
+
+
+def get_profile_parser(name):
+    """Look up a profile extraction backend by name"""
+    if name not in PROFILE_PARSERS:
+        raise ValueError(f"Unknown parser backend '{name}' - choose from {', '.join(PROFILE_PARSERS)}")
+    if name == 'lxml' and etree is None:
+        raise ImportError("lxml is required for the 'lxml' parser backend")
+    return PROFILE_PARSERS[name]
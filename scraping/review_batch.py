@@ -0,0 +1,112 @@
+"""
+Batch post-processing of extracted review cards
+A page's (or a whole company's) raw card fields are normalized as columns instead
+of record by record:
+- review_length as an int32 array
+- star_rating parsed from the "Rated N out of 5 stars" alt text, once per distinct value
+- review_date normalized to Trustpilot's ISO form (2024-03-01T09:15:00.000Z); the few
+  dates not already in that form are parsed together in one pandas call
+- topic_tags and mentions_* flags from TopicTagger.tag_columns
+- one scraped_at for the whole batch
+- review_key via seen_reviews.review_keys
+review_batch_columns returns plain columns (cheap enough for a single page);
+normalize_review_batch wraps them in a typed DataFrame, and batch_records turns
+either into the review records the sinks and checkpoint store take.
+
+
+Project: Trustpilot Analytics Pipeline
+"""
+
+import re
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from seen_reviews import review_keys
+
+CARD_FIELDS = ['reviewer_name', 'reviewer_location', 'rating', 'review_date', 'review_title',
+               'review_text', 'verified_review', 'has_company_reply']
+
+MISSING_DATE = 'Unknown'
+
+# Dates already in this form are kept verbatim, so their review_key never changes
+_CANONICAL_DATE = re.compile(r'\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d{2}\.\d{3}Z')
+_STAR_RATING = re.compile(r'Rated (\d) out of 5')
+
+
+def review_columns(flag_names):
+    """Review record fields in output order; flag_names are the mentions_* topic columns"""
+    return (['review_key', 'company_name', 'reviewer_name', 'reviewer_location', 'rating', 'star_rating',
+             'review_date', 'review_title', 'review_text', 'review_length', 'verified_review',
+             'has_company_reply', 'topic_tags']
+            + list(flag_names)
+            + ['page_number', 'scraped_at'])
+
+
+def star_ratings(ratings):
+    """Star rating (1-5) per alt text, None where there is no rating"""
+    parsed = {}
+    for rating in set(ratings):
+        match = _STAR_RATING.search(rating) if isinstance(rating, str) else None
+        parsed[rating] = int(match.group(1)) if match else None
+    return [parsed[rating] for rating in ratings]
+
+
+def normalize_dates(dates):
+    """ISO 8601 UTC text with milliseconds, or 'Unknown' where a date is missing or unreadable"""
+    fixed = {}
+    odd = []
+    for date in set(dates):
+        if not isinstance(date, str) or date in ('', MISSING_DATE):
+            fixed[date] = MISSING_DATE
+        elif not _CANONICAL_DATE.fullmatch(date):
+            odd.append(date)
+    if odd:
+        parsed = pd.to_datetime(pd.Series(odd, dtype=object), utc=True, errors='coerce', format='mixed')
+        formatted = parsed.dt.strftime('%Y-%m-%dT%H:%M:%S.%f').str[:-3] + 'Z'
+        fixed.update(zip(odd, formatted.where(parsed.notna(), MISSING_DATE)))
+    return [fixed.get(date, date) for date in dates] if fixed else list(dates)
+
+
+def review_batch_columns(cards, company_name, page, tagger, scraped_at=None):
+    """
+    Normalized review columns (name -> list or NumPy array) in review_columns order.
+    cards is a list of card dicts or a DataFrame with the CARD_FIELDS columns;
+    page is one page number or a per-card sequence; scraped_at defaults to now.
+    """
+    if isinstance(cards, pd.DataFrame):
+        raw = {field: cards[field].tolist() for field in CARD_FIELDS}
+    else:
+        raw = {field: [card[field] for card in cards] for field in CARD_FIELDS}
+    rows = len(raw['review_text'])
+
+    columns = dict(raw)
+    columns['company_name'] = [company_name] * rows
+    columns['star_rating'] = star_ratings(raw['rating'])
+    columns['review_date'] = normalize_dates(raw['review_date'])
+    columns['review_length'] = np.fromiter(map(len, raw['review_text']), dtype=np.int32, count=rows)
+    columns['verified_review'] = np.array(raw['verified_review'], dtype=bool)
+    columns['has_company_reply'] = np.array(raw['has_company_reply'], dtype=bool)
+    columns.update(tagger.tag_columns(raw['review_title'], raw['review_text']))
+    columns['page_number'] = np.broadcast_to(np.asarray(page, dtype=np.int32), (rows,))
+    columns['scraped_at'] = [scraped_at or datetime.now().isoformat()] * rows
+    # Same value as review_id in stg_reviews
+    columns['review_key'] = review_keys(columns)
+    return {name: columns[name] for name in review_columns(tagger.flag_names)}
+
+
+def normalize_review_batch(cards, company_name, page, tagger, scraped_at=None):
+    """Review records for a batch of cards as a typed DataFrame (star_rating is nullable Int8)"""
+    columns = review_batch_columns(cards, company_name, page, tagger, scraped_at)
+    columns['star_rating'] = pd.array(columns['star_rating'], dtype='Int8')
+    return pd.DataFrame(columns)
+
+
+def batch_records(batch):
+    """Review records (dicts of plain Python values) from batch columns or a normalized DataFrame"""
+    if isinstance(batch, pd.DataFrame):
+        batch = {name: batch[name].astype(object).where(batch[name].notna(), None) for name in batch.columns}
+    names = list(batch)
+    values = [column.tolist() if hasattr(column, 'tolist') else column for column in batch.values()]
+    return [dict(zip(names, row)) for row in zip(*values)]
@@ -0,0 +1,84 @@
+"""
+Reader for partitioned review datasets (reviews_<ts>/ written by PartitionedReviewSink)
+- partition pruning: company and date filters are turned into the
+  company_id=<md5>/review_month=<YYYY-MM> directories to open, so other
+  companies' and months' files are never listed or read
+- filter pushdown: the review_date range is applied while scanning, using the
+  Parquet row-group statistics of the (date-sorted) files
+- one dataset directory or several (e.g. every run in Trustpilot_data)
+
+    from review_dataset import read_reviews
+    last_month = read_reviews('Trustpilot_data/reviews_20251224_160111',
+                              companies=['Appliances Direct'], since='2025-11-24').to_pandas()
+
+
+Project: Trustpilot Analytics Pipeline
+"""
+
+import glob
+import os
+
+import pyarrow.dataset as ds
+
+from review_sinks import PARTITION_COLUMNS, UNKNOWN_MONTH, company_id, dataset_schema, review_month
+from topic_tagger import TopicTagger
+
+
+def partition_files(paths, companies=None, since=None, until=None):
+    """
+    Parquet files of the partitions that can hold matching reviews.
+    paths: dataset directory or list of them; companies: company names (None = all);
+    since / until: ISO dates or timestamps, since inclusive and until exclusive.
+    Reviews without a date sit in review_month=unknown and only match when no date bound is given.
+    """
+    roots = [paths] if isinstance(paths, str) else list(paths)
+    first_month = review_month(since) if since else None
+    last_month = review_month(until) if until else None
+    files = []
+    for root in roots:
+        if companies is None:
+            company_dirs = sorted(glob.glob(os.path.join(root, f"{PARTITION_COLUMNS[0]}=*")))
+        else:
+            company_dirs = [os.path.join(root, f"{PARTITION_COLUMNS[0]}={company_id(name)}") for name in companies]
+        for company_dir in company_dirs:
+            if not os.path.isdir(company_dir):
+                continue
+            for month_dir in sorted(os.listdir(company_dir)):
+                month = month_dir.partition('=')[2]
+                if month == UNKNOWN_MONTH:
+                    if since or until:
+                        continue
+                elif (first_month and month < first_month) or (last_month and month > last_month):
+                    continue
+                month_path = os.path.join(company_dir, month_dir)
+                files.extend(os.path.join(month_path, name) for name in sorted(os.listdir(month_path))
+                             if name.endswith('.parquet'))
+    return files
+
+
+def read_reviews(paths, companies=None, since=None, until=None, columns=None, filter=None, flag_names=None):
+    """
+    Matching reviews as an Arrow table (categorical columns stay dictionary-encoded;
+    .to_pandas() turns them into pandas categoricals).
+    columns: subset of stored columns to read; filter: extra pyarrow.dataset expression.
+    When no partition matches, the result is an empty table with the stored schema
+    (mentions_* columns from flag_names, default: the configured topics).
+    """
+    files = partition_files(paths, companies, since, until)
+    if not files:
+        if flag_names is None:
+            flag_names = TopicTagger.from_config().flag_names
+        empty = dataset_schema(flag_names).empty_table()
+        return empty.select(columns) if columns is not None else empty
+
+    dataset = ds.dataset(files, format='parquet')
+    predicate = filter
+    if since:
+        predicate = _and(predicate, ds.field('review_date') >= since)
+    if until:
+        predicate = _and(predicate, ds.field('review_date') < until)
+    return dataset.to_table(columns=columns, filter=predicate)
+
+
+def _and(left, right):
+    return right if left is None else left & right
@@ -0,0 +1,115 @@
+"""
+Review card parser backends
+Both backends turn one review page into a list of raw card fields:
+- bs4:  the original BeautifulSoup/html.parser + CSS select_one path
+- lxml: libxml2 parse with module-level precompiled XPath expressions
+
+
+Project: Trustpilot Analytics Pipeline
+"""
+
+from bs4 import BeautifulSoup
+
+try:
+    from lxml import etree, html as lxml_html
+except ImportError:  # lxml is optional, bs4 backend still works
+    etree = lxml_html = None
+
+
+def parse_review_cards_bs4(page_html):
+    """Original extraction path - one select_one per field"""
+    soup = BeautifulSoup(page_html, 'html.parser')
+    cards = []
+    for container in soup.select('article[data-service-review-card-paper]'):
+        try:
+            name_el = container.select_one('span[data-consumer-name-typography]')
+            rating_el = container.select_one('img[alt*="star"]')
+            text_el = container.select_one('p')
+            date_el = container.select_one('time')
+            title_el = container.select_one('h2')
+            loc_el = container.select_one('span[data-consumer-country-typography]')
+            card_text = container.get_text()
+
+            cards.append({
+                'reviewer_name': name_el.get_text(strip=True) if name_el else "Anonymous",
+                'reviewer_location': loc_el.get_text(strip=True) if loc_el else "Unknown",
+                'rating': rating_el.get('alt', 'No rating') if rating_el else "No rating",
+                'review_date': date_el.get('datetime', 'Unknown') if date_el else "Unknown",
+                'review_title': title_el.get_text(strip=True) if title_el else "No title",
+                'review_text': text_el.get_text(strip=True) if text_el else "",
+                'verified_review': bool(container.select_one('[data-service-review-verified-review]')),
+                'has_company_reply': 'Company replied' in card_text or 'Reply from' in card_text
+            })
+        except Exception:
+            continue
+    return cards
+
+
+if etree is not None:
+    # Compiled once at import - each card then costs a handful of C-level XPath calls
+    _CARDS = etree.XPath('//article[@data-service-review-card-paper]')
+    _NAME = etree.XPath('(.//span[@data-consumer-name-typography])[1]')
+    _LOCATION = etree.XPath('(.//span[@data-consumer-country-typography])[1]')
+    _RATING = etree.XPath('(.//img[contains(@alt, "star")])[1]')
+    _TEXT = etree.XPath('(.//p)[1]')
+    _DATE = etree.XPath('(.//time)[1]')
+    _TITLE = etree.XPath('(.//h2)[1]')
+    _VERIFIED = etree.XPath('boolean(.//*[@data-service-review-verified-review])')
+    _REPLY = etree.XPath('contains(string(.), "Company replied") or contains(string(.), "Reply from")')
+
+
+def _first(xpath, node):
+    found = xpath(node)
+    return found[0] if found else None
+
+
+def _stripped_text(el):
+    """Same result as BeautifulSoup get_text(strip=True)"""
+    return ''.join(t.strip() for t in el.itertext())
+
+
+def parse_review_cards_lxml(page_html):
+    """Fast path - precompiled XPath over an lxml tree"""
+    if etree is None:
+        raise ImportError("lxml is required for the 'lxml' parser backend")
+    if not page_html.strip():
+        return []
+    root = lxml_html.document_fromstring(page_html)
+    cards = []
+    for container in _CARDS(root):
+        try:
+            name_el = _first(_NAME, container)
+            loc_el = _first(_LOCATION, container)
+            rating_el = _first(_RATING, container)
+            date_el = _first(_DATE, container)
+            title_el = _first(_TITLE, container)
+            text_el = _first(_TEXT, container)
+
+            cards.append({
+                'reviewer_name': _stripped_text(name_el) if name_el is not None else "Anonymous",
+                'reviewer_location': _stripped_text(loc_el) if loc_el is not None else "Unknown",
+                'rating': rating_el.get('alt', 'No rating') if rating_el is not None else "No rating",
+                'review_date': date_el.get('datetime', 'Unknown') if date_el is not None else "Unknown",
+                'review_title': _stripped_text(title_el) if title_el is not None else "No title",
+                'review_text': _stripped_text(text_el) if text_el is not None else "",
+                'verified_review': _VERIFIED(container),
+                'has_company_reply': _REPLY(container)
+            })
+        except Exception:
+            continue
+    return cards
+
+
+REVIEW_PARSERS = {
+    'bs4': parse_review_cards_bs4,
+    'lxml': parse_review_cards_lxml,
+}
+
+
+def get_review_parser(name):
+    """Look up a parser backend by name"""
+    if name not in REVIEW_PARSERS:
+        raise ValueError(f"Unknown parser backend '{name}' - choose from {', '.join(REVIEW_PARSERS)}")
+    if name == 'lxml' and etree is None:
+        raise ImportError("lxml is required for the 'lxml' parser backend")
+    return REVIEW_PARSERS[name]
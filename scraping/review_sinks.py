@@ -0,0 +1,262 @@
+"""
+Streaming review sinks
+Each page of review records is written as soon as it is produced, and run
+statistics are kept as running counters - no run-sized list or DataFrame.
+Besides one CSV or Parquet file per run, reviews can go to a partitioned
+dataset (see PartitionedReviewSink, read back with review_dataset.read_reviews).
+
+
+Project: Trustpilot Analytics Pipeline
+"""
+
+import csv
+import hashlib
+import threading
+
+try:
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    import pyarrow.parquet as pq
+except ImportError:  # Parquet output is optional
+    pa = ds = pq = None
+
+# Partitioned dataset layout: <dataset>/company_id=<md5>/review_month=<YYYY-MM>/part-*.parquet
+PARTITION_COLUMNS = ('company_id', 'review_month')
+UNKNOWN_MONTH = 'unknown'
+
+# Low-cardinality text stored dictionary-encoded (values once per file, int32 codes per row)
+DICTIONARY_COLUMNS = ('company_name', 'reviewer_location', 'topic_tags', 'scraped_at')
+
+
+def company_id(company_name):
+    """Partition key for a company - the same hash as company_id in stg_reviews"""
+    return hashlib.md5(company_name.strip(' ').encode('utf-8')).hexdigest()
+
+
+def review_month(review_date):
+    """Partition key for a review date ('YYYY-MM'), 'unknown' where the date is missing"""
+    return review_date[:7] if review_date and review_date[:4].isdigit() else UNKNOWN_MONTH
+
+
+def dataset_schema(flag_names, categorical=True):
+    """
+    Stored column types of review output; flag_names are the mentions_* topic columns.
+    categorical: dictionary-encode the low-cardinality text (DICTIONARY_COLUMNS) as the
+    partitioned dataset does; otherwise they are plain strings.
+    """
+    text = pa.string()
+    codes = pa.dictionary(pa.int32(), pa.string()) if categorical else text
+    return pa.schema(
+        [
+            ('review_key', text),
+            ('company_name', codes),
+            ('reviewer_name', text),
+            ('reviewer_location', codes),
+            ('rating', text),
+            ('star_rating', pa.int8()),
+            ('review_date', text),
+            ('review_title', text),
+            ('review_text', text),
+            ('review_length', pa.int32()),
+            ('verified_review', pa.bool_()),
+            ('has_company_reply', pa.bool_()),
+            ('topic_tags', codes),
+        ]
+        + [(name, pa.bool_()) for name in flag_names]  # bit-packed in Arrow and Parquet alike
+        + [
+            ('page_number', pa.int32()),
+            ('scraped_at', codes),
+        ]
+    )
+
+
+class RunSummary:
+    """Running totals behind the end-of-run topic distribution and reply rate"""
+
+    def __init__(self, flag_names):
+        self.flag_names = list(flag_names)
+        self.total = 0
+        self.flag_counts = dict.fromkeys(self.flag_names, 0)
+        self.replies = 0
+
+    def update(self, records):
+        for record in records:
+            self.total += 1
+            self.replies += bool(record.get('has_company_reply'))
+            for name in self.flag_names:
+                self.flag_counts[name] += bool(record.get(name))
+
+    def topic_percentages(self):
+        return {name: self.flag_counts[name] / self.total * 100 for name in self.flag_names} if self.total else {}
+
+    def reply_rate(self):
+        return self.replies / self.total * 100 if self.total else 0.0
+
+
+class ReviewSink:
+    """
+    Base sink - thread-safe write() shared by concurrent company workers.
+    The file is only created on the first non-empty write, so a run with no
+    reviews leaves nothing behind.
+    """
+
+    extension = None
+
+    def __init__(self, base_path, flag_names):
+        self.path = f"{base_path}.{self.extension}"
+        self.summary = RunSummary(flag_names)
+        self.lock = threading.Lock()
+
+    def write(self, records):
+        if not records:
+            return
+        with self.lock:
+            self.summary.update(records)
+            self._write(records)
+
+    def _write(self, records):
+        raise NotImplementedError
+
+    def close(self):
+        """Flush buffered rows; returns the file path, or None if nothing was written"""
+        with self.lock:
+            self._close()
+        return self.path if self.summary.total else None
+
+    def _close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class CsvReviewSink(ReviewSink):
+    """Appends rows to one CSV, header taken from the first record"""
+
+    extension = 'csv'
+
+    def __init__(self, base_path, flag_names):
+        super().__init__(base_path, flag_names)
+        self._file = None
+        self._writer = None
+
+    def _write(self, records):
+        if self._writer is None:
+            self._file = open(self.path, 'w', newline='', encoding='utf-8')
+            self._writer = csv.DictWriter(self._file, fieldnames=list(records[0]))
+            self._writer.writeheader()
+        self._writer.writerows(records)
+        self._file.flush()
+
+    def _close(self):
+        if self._file:
+            self._file.close()
+            self._file = None
+
+
+class ParquetReviewSink(ReviewSink):
+    """
+    Buffers rows and writes one Parquet row group per `row_group_size` records.
+    The schema is explicit, so a column that is null throughout the first row group
+    still gets its real type.
+    """
+
+    extension = 'parquet'
+
+    def __init__(self, base_path, flag_names, row_group_size=10000):
+        if pq is None:
+            raise ImportError("pyarrow is required for Parquet output")
+        super().__init__(base_path, flag_names)
+        self.schema = dataset_schema(flag_names, categorical=False)
+        self.row_group_size = row_group_size
+        self._buffer = []
+        self._writer = None
+
+    def _write(self, records):
+        self._buffer.extend(records)
+        if len(self._buffer) >= self.row_group_size:
+            self._flush()
+
+    def _flush(self):
+        if not self._buffer:
+            return
+        if self._writer is None:
+            self._writer = pq.ParquetWriter(self.path, self.schema)
+        table = pa.Table.from_pylist(self._buffer, schema=self.schema)
+        self._writer.write_table(table, row_group_size=self.row_group_size)
+        self._buffer = []
+
+    def _close(self):
+        self._flush()
+        if self._writer:
+            self._writer.close()
+            self._writer = None
+
+
+class PartitionedReviewSink(ReviewSink):
+    """
+    Writes a Hive-partitioned Parquet dataset (a directory at base_path) split by
+    company and review month, so readers can skip every other company and month.
+    Rows are buffered and written every `row_group_size` records; each flush adds
+    at most one file per partition, sorted by review_date so row-group statistics
+    narrow date filters further inside a file.
+    """
+
+    extension = None
+
+    def __init__(self, base_path, flag_names, row_group_size=50000):
+        if pq is None:
+            raise ImportError("pyarrow is required for partitioned dataset output")
+        super().__init__(base_path, flag_names)
+        self.path = base_path
+        self.schema = dataset_schema(flag_names)
+        self.row_group_size = row_group_size
+        self._buffer = []
+        self._flushes = 0
+
+    def _write(self, records):
+        self._buffer.extend(records)
+        if len(self._buffer) >= self.row_group_size:
+            self._flush()
+
+    def _flush(self):
+        if not self._buffer:
+            return
+        table = pa.Table.from_pylist(self._buffer, schema=self.schema)
+        names = table.column('company_name').to_pylist()
+        dates = table.column('review_date').to_pylist()
+        ids = {name: company_id(name) for name in set(names)}
+        table = table.append_column('company_id', pa.array([ids[name] for name in names], pa.string()))
+        table = table.append_column('review_month', pa.array([review_month(date) for date in dates], pa.string()))
+        ds.write_dataset(
+            table.sort_by([('company_id', 'ascending'), ('review_date', 'ascending')]),
+            self.path,
+            format='parquet',
+            partitioning=list(PARTITION_COLUMNS),
+            partitioning_flavor='hive',
+            basename_template=f"part-{self._flushes:05d}-{{i}}.parquet",
+            existing_data_behavior='overwrite_or_ignore',
+            max_rows_per_group=self.row_group_size,
+        )
+        self._flushes += 1
+        self._buffer = []
+
+    def _close(self):
+        self._flush()
+
+
+REVIEW_SINKS = {
+    'csv': CsvReviewSink,
+    'parquet': ParquetReviewSink,
+    'dataset': PartitionedReviewSink,
+}
+
+
+def open_review_sink(output_format, base_path, flag_names):
+    """Create the sink for an output format ('csv', 'parquet' or 'dataset')"""
+    if output_format not in REVIEW_SINKS:
+        raise ValueError(f"Unknown output format '{output_format}' - choose from {', '.join(REVIEW_SINKS)}")
+    return REVIEW_SINKS[output_format](base_path, flag_names)
@@ -0,0 +1,496 @@
+"""
+Sharded scrape coordinator
+Spreads a scrape over several worker processes through a durable SQLite work queue
+(no broker):
+- plan: start a run - clear the previous run's units, then discover companies and
+  queue (company_url, page range) units sized from the listed review counts; the unit
+  starting at page 1 also takes the profile. Refused while a run is still in progress
+- worker: lease a unit, scrape its pages with TrustpilotApplianceScraper, write a JSON
+  lines shard, mark the unit done. A heartbeat renews the lease; a worker that dies
+  lets its lease expire and the unit is leased again (up to max_attempts)
+- merge: combine the shards of done units into the usual company_profiles_<ts>.csv and
+  reviews_<ts>.<csv|parquet> datasets, dropping reviews already merged or, with a seen
+  index, collected by earlier runs
+Workers on other hosts need the queue and shard directory on storage with working
+SQLite file locking. `run` resumes an unfinished run instead of planning a new one.
+
+    python scrape_coordinator.py run --workers 4
+    python scrape_coordinator.py plan --queue Trustpilot_data/work_queue.db
+    python scrape_coordinator.py worker --queue Trustpilot_data/work_queue.db
+    python scrape_coordinator.py merge --queue Trustpilot_data/work_queue.db
+    python scrape_coordinator.py status --queue Trustpilot_data/work_queue.db
+
+
+Project: Trustpilot Analytics Pipeline
+"""
+
+import argparse
+import json
+import logging
+import math
+import multiprocessing
+import os
+import socket
+import sqlite3
+import threading
+import time
+from datetime import datetime
+
+import pandas as pd
+
+from instrumentation import configure_logging
+from review_sinks import open_review_sink
+from seen_reviews import SeenReviews
+from topic_tagger import TopicTagger
+from trustpilot_scraper import TrustpilotApplianceScraper
+
+logger = logging.getLogger(__name__)
+
+REVIEWS_PER_PAGE = 20  # Trustpilot review page size
+
+SCHEMA = """
+create table if not exists work_units (
+    unit_id integer primary key,
+    company_url text not null,
+    company_name text not null,
+    first_page integer not null,
+    last_page integer not null,
+    target_reviews integer not null,
+    with_profile integer not null default 0,
+    status text not null default 'pending',
+    worker text,
+    lease_expires real,
+    attempts integer not null default 0,
+    reviews integer,
+    reviews_shard text,
+    profile_shard text,
+    error text,
+    unique (company_url, first_page)
+);
+create table if not exists queue_meta (
+    name text primary key,
+    value text not null
+);
+"""
+
+
+class WorkQueue:
+    """
+    SQLite work queue shared by the coordinator and worker processes.
+    Every state change is one short transaction (lease takes the write lock up
+    front), so concurrent workers never lease the same unit. Completing or
+    failing a unit only counts while the caller still holds its lease.
+    """
+
+    def __init__(self, path="Trustpilot_data/work_queue.db", max_attempts=3):
+        self.path = path
+        self.max_attempts = max_attempts
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, timeout=60, isolation_level=None, check_same_thread=False)
+        self.conn.execute("pragma journal_mode=wal")
+        self.conn.executescript(SCHEMA)
+
+    def _write(self, sql, params=()):
+        with self.lock:
+            cursor = self.conn.execute(sql, params)
+            return cursor.rowcount
+
+    def meta(self):
+        with self.lock:
+            rows = self.conn.execute("select name, value from queue_meta").fetchall()
+        return {name: json.loads(value) for name, value in rows}
+
+    def start_run(self, **meta):
+        """Drop the previous run's units and settings and record the new run's; refused while units are in progress"""
+        now = time.time()
+        with self.lock:
+            self.conn.execute("begin immediate")
+            try:
+                active = self.conn.execute(
+                    "select count(*) from work_units where status = 'pending' "
+                    "or (status = 'leased' and not (lease_expires < ? and attempts >= ?))",
+                    (now, self.max_attempts)
+                ).fetchone()[0]
+                if active:
+                    raise RuntimeError(f"work queue still has {active} units in progress - "
+                                       "finish the run (worker, merge) before planning another")
+                self.conn.execute("delete from work_units")
+                self.conn.execute("delete from queue_meta")
+                self.conn.executemany("insert into queue_meta (name, value) values (?, ?)",
+                                      [(name, json.dumps(value)) for name, value in meta.items()])
+                self.conn.execute("commit")
+            except Exception:
+                self.conn.execute("rollback")
+                raise
+
+    def enqueue(self, units):
+        """Add units (dicts of the work_units columns); a unit already queued is left as is. Returns units added."""
+        with self.lock:
+            before = self.conn.total_changes
+            self.conn.execute("begin immediate")
+            try:
+                self.conn.executemany(
+                    "insert or ignore into work_units "
+                    "(company_url, company_name, first_page, last_page, target_reviews, with_profile) "
+                    "values (:company_url, :company_name, :first_page, :last_page, :target_reviews, :with_profile)",
+                    units
+                )
+                self.conn.execute("commit")
+            except Exception:
+                self.conn.execute("rollback")
+                raise
+            return self.conn.total_changes - before
+
+    def lease(self, worker, lease_seconds):
+        """Claim the next pending or expired unit for worker; None when nothing is leasable"""
+        now = time.time()
+        with self.lock:
+            self.conn.execute("begin immediate")
+            try:
+                row = self.conn.execute(
+                    "select unit_id from work_units "
+                    "where (status = 'pending' or (status = 'leased' and lease_expires < ?)) and attempts < ? "
+                    "order by unit_id limit 1",
+                    (now, self.max_attempts)
+                ).fetchone()
+                if row is None:
+                    self.conn.execute("commit")
+                    return None
+                self.conn.execute(
+                    "update work_units set status = 'leased', worker = ?, lease_expires = ?, "
+                    "attempts = attempts + 1, error = null where unit_id = ?",
+                    (worker, now + lease_seconds, row[0])
+                )
+                cursor = self.conn.execute("select * from work_units where unit_id = ?", row)
+                unit = dict(zip([d[0] for d in cursor.description], cursor.fetchone()))
+                self.conn.execute("commit")
+            except Exception:
+                self.conn.execute("rollback")
+                raise
+        return unit
+
+    def renew(self, unit_id, worker, lease_seconds):
+        """Extend a held lease; False if it expired and was taken over"""
+        return self._write(
+            "update work_units set lease_expires = ? where unit_id = ? and worker = ? and status = 'leased'",
+            (time.time() + lease_seconds, unit_id, worker)
+        ) == 1
+
+    def complete(self, unit_id, worker, reviews, reviews_shard, profile_shard=None):
+        return self._write(
+            "update work_units set status = 'done', reviews = ?, reviews_shard = ?, profile_shard = ?, "
+            "lease_expires = null where unit_id = ? and worker = ? and status = 'leased'",
+            (reviews, reviews_shard, profile_shard, unit_id, worker)
+        ) == 1
+
+    def fail(self, unit_id, worker, error):
+        """Give a unit back for retry, or park it as failed once max_attempts are used"""
+        return self._write(
+            "update work_units set status = case when attempts < ? then 'pending' else 'failed' end, "
+            "lease_expires = null, error = ? where unit_id = ? and worker = ? and status = 'leased'",
+            (self.max_attempts, error, unit_id, worker)
+        ) == 1
+
+    def counts(self):
+        """Units per status, with leased units whose lease ran out and attempts are used up shown as failed"""
+        with self.lock:
+            rows = self.conn.execute(
+                "select case when status = 'leased' and lease_expires < ? and attempts >= ? then 'failed' "
+                "else status end, count(*) from work_units group by 1",
+                (time.time(), self.max_attempts)
+            ).fetchall()
+        return dict(rows)
+
+    def finished(self):
+        """True once no unit is pending or can still be (re)leased"""
+        counts = self.counts()
+        return not counts.get('pending') and not counts.get('leased')
+
+    def done_units(self):
+        with self.lock:
+            cursor = self.conn.execute("select * from work_units where status = 'done' order by unit_id")
+            columns = [d[0] for d in cursor.description]
+            return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+
+def plan_units(company, reviews_per_company, pages_per_unit):
+    """Page-range units covering min(listed reviews, reviews_per_company) for one discovered company"""
+    wanted = min(company['review_count'] or reviews_per_company, reviews_per_company)
+    pages = max(1, math.ceil(wanted / REVIEWS_PER_PAGE))
+    units = []
+    for first in range(1, pages + 1, pages_per_unit):
+        last = min(pages, first + pages_per_unit - 1)
+        units.append({
+            'company_url': company['company_url'],
+            'company_name': company['company_name'],
+            'first_page': first,
+            'last_page': last,
+            'target_reviews': min(wanted - (first - 1) * REVIEWS_PER_PAGE, (last - first + 1) * REVIEWS_PER_PAGE),
+            'with_profile': int(first == 1),
+        })
+    return units
+
+
+def plan(queue, scraper, min_reviews=1000, reviews_per_company=500, pages_per_unit=5, categories=None,
+         output_format='csv'):
+    """Start a new run on the queue, discover companies and queue their units; returns the number of units added"""
+    queue.start_run(output_format=output_format, reviews_per_company=reviews_per_company,
+                    planned_at=datetime.now().isoformat())
+    added = companies = 0
+    for company in scraper.discover_companies(min_reviews=min_reviews, categories=categories):
+        companies += 1
+        added += queue.enqueue(plan_units(company, reviews_per_company, pages_per_unit))
+    logger.info("work planned", extra={'companies': companies, 'units': added})
+    return added
+
+
+class JsonLinesSink:
+    """ReviewSink-compatible shard writer - one JSON record per line, types preserved"""
+
+    def __init__(self, path):
+        self.path = path
+        self.total = 0
+        self._file = open(path, 'w', encoding='utf-8')
+
+    def write(self, records):
+        for record in records:
+            self._file.write(json.dumps(record, ensure_ascii=False))
+            self._file.write('\n')
+        self._file.flush()
+        self.total += len(records)
+
+    def close(self):
+        self._file.close()
+        return self.path
+
+
+def _read_jsonl(path):
+    with open(path, encoding='utf-8') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def run_worker(queue_path, shard_dir="Trustpilot_data/shards", worker_id=None, lease_seconds=120,
+               idle_wait=2.0, max_units=None, **scraper_options):
+    """
+    Lease and scrape units until the queue has nothing left to lease.
+    scraper_options go to TrustpilotApplianceScraper (base_url, requests_per_second, parser, ...).
+    Returns the number of units completed.
+    """
+    worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}"
+    os.makedirs(shard_dir, exist_ok=True)
+    queue = WorkQueue(queue_path)
+    scraper = TrustpilotApplianceScraper(**scraper_options)
+    completed = 0
+    try:
+        while max_units is None or completed < max_units:
+            unit = queue.lease(worker_id, lease_seconds)
+            if unit is None:
+                if queue.finished():
+                    break
+                time.sleep(idle_wait)  # other workers hold the rest - wait for them to finish or expire
+                continue
+            if _scrape_unit(queue, scraper, unit, worker_id, shard_dir, lease_seconds):
+                completed += 1
+    finally:
+        scraper.close()
+        queue.close()
+    logger.info("worker finished", extra={'worker': worker_id, 'units': completed})
+    return completed
+
+
+def _scrape_unit(queue, scraper, unit, worker_id, shard_dir, lease_seconds):
+    """Scrape one leased unit into attempt-specific shard files; True if it was recorded as done"""
+    unit_id = unit['unit_id']
+    prefix = os.path.join(shard_dir, f"unit{unit_id:06d}_a{unit['attempts']}")
+    stop = threading.Event()
+
+    def heartbeat():
+        while not stop.wait(lease_seconds / 3):
+            if not queue.renew(unit_id, worker_id, lease_seconds):
+                logger.warning("lease lost", extra={'unit': unit_id, 'worker': worker_id})
+                return
+
+    beat = threading.Thread(target=heartbeat, daemon=True)
+    beat.start()
+    sink = JsonLinesSink(f"{prefix}_reviews.jsonl")
+    profile_shard = None
+    try:
+        if unit['with_profile']:
+            profile = scraper.scrape_company_profile(unit['company_url'], unit['company_name'])
+            profile_shard = f"{prefix}_profile.json"
+            with open(profile_shard, 'w', encoding='utf-8') as f:
+                json.dump(profile, f)
+        scraper.scrape_company_reviews(unit['company_url'], unit['company_name'],
+                                       target_reviews=unit['target_reviews'], sink=sink,
+                                       first_page=unit['first_page'], last_page=unit['last_page'],
+                                       raise_errors=True)
+        reviews_shard = sink.close()
+        stop.set()
+        done = queue.complete(unit_id, worker_id, sink.total, reviews_shard, profile_shard)
+    except Exception as e:
+        sink.close()
+        stop.set()
+        queue.fail(unit_id, worker_id, repr(e))
+        logger.warning("unit failed", extra={'unit': unit_id, 'company': unit['company_name'],
+                                             'attempt': unit['attempts'], 'error': repr(e)})
+        done = False
+    beat.join()
+    if not done:
+        # Lease expired or the unit failed - this attempt's shards are never merged
+        for path in (sink.path, profile_shard):
+            if path and os.path.exists(path):
+                os.remove(path)
+        return False
+    logger.info("unit done", extra={'unit': unit_id, 'company': unit['company_name'],
+                                    'pages': f"{unit['first_page']}-{unit['last_page']}", 'reviews': sink.total})
+    return True
+
+
+def merge(queue, out_dir="Trustpilot_data", output_format=None, seen_path=None, timestamp=None):
+    """
+    Combine done units' shards into the run datasets, in plan order.
+    Reviews are de-duplicated by review_key (pages can shift while a company is
+    scraped); with seen_path, reviews collected by earlier runs are dropped too and
+    this run's keys are committed once the files are written.
+    Returns (profiles_file, reviews_file).
+    """
+    counts = queue.counts()
+    if counts.get('pending') or counts.get('leased'):
+        raise RuntimeError(f"work queue still has units in progress: {counts}")
+    if counts.get('failed'):
+        logger.warning("merging without failed units", extra={'failed': counts['failed']})
+
+    output_format = output_format or queue.meta().get('output_format', 'csv')
+    timestamp = timestamp or datetime.now().strftime("%Y%m%d_%H%M%S")
+    flag_names = TopicTagger.from_config().flag_names
+    seen = SeenReviews(seen_path) if seen_path else None
+    merged_keys = set()
+    profiles = []
+    duplicates = 0
+    try:
+        sink = open_review_sink(output_format, os.path.join(out_dir, f"reviews_{timestamp}"), flag_names)
+        for unit in queue.done_units():
+            if unit['profile_shard']:
+                with open(unit['profile_shard'], encoding='utf-8') as f:
+                    profiles.append(json.load(f))
+            records = _read_jsonl(unit['reviews_shard'])
+            fresh = [r for r in records if r['review_key'] not in merged_keys]
+            merged_keys.update(r['review_key'] for r in fresh)
+            if seen:
+                fresh = seen.filter_new(fresh)
+                seen.mark(fresh)
+            duplicates += len(records) - len(fresh)
+            sink.write(fresh)
+        reviews_file = sink.close()
+
+        profiles_file = None
+        if profiles:
+            profiles_file = os.path.join(out_dir, f"company_profiles_{timestamp}.csv")
+            pd.DataFrame(profiles).to_csv(profiles_file, index=False)
+        if seen:
+            seen.commit()
+    finally:
+        if seen:
+            seen.close()
+
+    logger.info("shards merged", extra={'profiles': len(profiles), 'reviews': sink.summary.total,
+                                         'duplicates_dropped': duplicates, 'profiles_file': profiles_file,
+                                         'reviews_file': reviews_file})
+    return profiles_file, reviews_file
+
+
+def _worker_process(queue_path, shard_dir, worker_id, lease_seconds, log_level, scraper_options):
+    configure_logging(log_level)
+    run_worker(queue_path, shard_dir, worker_id=worker_id, lease_seconds=lease_seconds, **scraper_options)
+
+
+def run_local(queue_path, workers=4, shard_dir="Trustpilot_data/shards", lease_seconds=120, log_level='INFO',
+              **scraper_options):
+    """Start workers local worker processes on the queue and wait for all of them"""
+    context = multiprocessing.get_context('spawn')
+    processes = [
+        context.Process(target=_worker_process,
+                        args=(queue_path, shard_dir, f"{socket.gethostname()}-w{i}", lease_seconds, log_level,
+                              scraper_options))
+        for i in range(workers)
+    ]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+    return [process.exitcode for process in processes]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    def common(command):
+        command.add_argument('--queue', default='Trustpilot_data/work_queue.db', help='SQLite work queue file')
+        command.add_argument('--base-url', help='override for trustpilot.com (e.g. a local stub server)')
+        command.add_argument('--log-level', default='INFO')
+        return command
+
+    def planning(command):
+        command.add_argument('--min-reviews', type=int, default=1000)
+        command.add_argument('--reviews-per-company', type=int, default=500)
+        command.add_argument('--pages-per-unit', type=int, default=5)
+        command.add_argument('--categories', type=lambda s: s.split(','), help='comma-separated category slugs')
+        command.add_argument('--format', choices=['csv', 'parquet', 'dataset'], default='csv')
+
+    def working(command):
+        command.add_argument('--shard-dir', default='Trustpilot_data/shards')
+        command.add_argument('--lease-seconds', type=float, default=120)
+        command.add_argument('--rate', type=float, default=1.0, help='requests/sec per host and worker')
+
+    def merging(command):
+        command.add_argument('--out-dir', default='Trustpilot_data')
+        command.add_argument('--seen', help='seen-review index - drop reviews collected by earlier runs')
+
+    planning(common(sub.add_parser('plan', help='discover companies and queue page-range units')))
+    worker = common(sub.add_parser('worker', help='lease and scrape units until the queue is drained'))
+    working(worker)
+    worker.add_argument('--worker-id')
+    merging(common(sub.add_parser('merge', help='combine done shards into the run datasets')))
+    common(sub.add_parser('status', help='units per status'))
+    run = common(sub.add_parser('run', help='plan, scrape with local worker processes, merge'))
+    planning(run)
+    working(run)
+    merging(run)
+    run.add_argument('--workers', type=int, default=4)
+
+    args = parser.parse_args(argv)
+    configure_logging(args.log_level)
+    scraper_options = {'base_url': args.base_url}
+    if hasattr(args, 'rate'):
+        scraper_options.update(requests_per_second=args.rate, burst=1)
+
+    queue = WorkQueue(args.queue)
+    try:
+        if args.command == 'run' and not queue.finished():
+            logger.info("resuming unfinished run", extra={'units': queue.counts()})
+        elif args.command in ('plan', 'run'):
+            scraper = TrustpilotApplianceScraper(base_url=args.base_url)
+            try:
+                plan(queue, scraper, args.min_reviews, args.reviews_per_company, args.pages_per_unit,
+                     args.categories, args.format)
+            finally:
+                scraper.close()
+        if args.command == 'worker':
+            run_worker(args.queue, args.shard_dir, worker_id=args.worker_id, lease_seconds=args.lease_seconds,
+                       **scraper_options)
+        if args.command == 'run':
+            run_local(args.queue, args.workers, args.shard_dir, args.lease_seconds, args.log_level, **scraper_options)
+        if args.command in ('merge', 'run'):
+            merge(queue, args.out_dir, seen_path=args.seen)
+        print(json.dumps(queue.counts()))
+    finally:
+        queue.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,229 @@
+"""
+Stable review keys and a persistent seen-set for scraper-side dedupe
+- review_key: the same md5 surrogate key stg_reviews builds as review_id
+  (dbt_utils.generate_surrogate_key over trimmed company_name, reviewer_name,
+  review_date, review_title, review_text), computed at extraction time;
+  review_keys does the same for a column-oriented batch
+- SeenReviews: bloom filter in memory, exact key index in SQLite on disk.
+  Most new reviews are rejected by the bloom filter alone; only probable hits
+  (already-seen reviews and ~1% false positives) touch the index, so lookups
+  stay fast at tens of millions of keys
+
+
+Project: Trustpilot Analytics Pipeline
+"""
+
+import hashlib
+import logging
+import math
+import os
+import sqlite3
+import struct
+import threading
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+KEY_COLUMNS = ('company_name', 'reviewer_name', 'review_date', 'review_title', 'review_text')
+
+# dbt_utils.generate_surrogate_key renders NULL as this literal and joins fields with '-'
+_NULL = '_dbt_utils_surrogate_key_null_'
+
+# Values that arrive in RAW as NULL (see warehouse_loader.conform)
+_RAW_NULLS = {'review_date': {'', 'Unknown'}}
+
+
+def _raw_value(column, value):
+    """Field as the warehouse stores it - empty text and placeholders load as NULL"""
+    if value is None or value == '' or value in _RAW_NULLS.get(column, ()):
+        return None
+    value = str(value)
+    return value.strip(' ') if column == 'company_name' else value  # SQL TRIM strips spaces only
+
+
+def review_key(record):
+    """md5 hex digest equal to stg_reviews.review_id for the same raw row"""
+    fields = (_raw_value(column, record.get(column)) for column in KEY_COLUMNS)
+    joined = '-'.join(_NULL if value is None else value for value in fields)
+    return hashlib.md5(joined.encode('utf-8')).hexdigest()
+
+
+def review_keys(columns):
+    """review_key for every row of a batch held as columns (dict of sequences or DataFrame)"""
+    fields = []
+    for column in KEY_COLUMNS:
+        nulls = {''} | _RAW_NULLS.get(column, set())
+        values = [_NULL if value is None or value in nulls else str(value) for value in columns[column]]
+        if column == 'company_name':
+            values = [_NULL if value is _NULL else value.strip(' ') for value in values]
+        fields.append(values)
+    return [hashlib.md5('-'.join(row).encode('utf-8')).hexdigest() for row in zip(*fields)]
+
+
+class BloomFilter:
+    """
+    Fixed-size bloom filter over md5 review keys.
+    Bit positions come from double hashing the two 64-bit halves of the digest,
+    so no further hashing is needed; all operations are vectorized over a batch.
+    """
+
+    _HEADER = struct.Struct('<4sQdQ')  # magic, capacity, error rate, keys covered
+    _MAGIC = b'TPBF'
+
+    def __init__(self, capacity, error_rate=0.01):
+        self.capacity = max(1, int(capacity))
+        self.error_rate = error_rate
+        self.num_bits = max(64, int(-self.capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.num_hashes = max(1, round(self.num_bits / self.capacity * math.log(2)))
+        self.bits = np.zeros((self.num_bits + 7) // 8, dtype=np.uint8)
+        self.count = 0
+
+    def _positions(self, digests):
+        """(n, num_hashes) bit positions for an (n, 16) uint8 array of digests"""
+        halves = digests.view('<u8')
+        h1, h2 = halves[:, :1], halves[:, 1:] | np.uint64(1)
+        rounds = np.arange(self.num_hashes, dtype=np.uint64)
+        return (h1 + rounds * h2) % np.uint64(self.num_bits)
+
+    def add(self, digests):
+        positions = self._positions(digests).ravel()
+        np.bitwise_or.at(self.bits, positions >> np.uint64(3),
+                         np.left_shift(1, positions & np.uint64(7)).astype(np.uint8))
+        self.count += len(digests)
+
+    def might_contain(self, digests):
+        """Boolean array - False means definitely not added"""
+        positions = self._positions(digests)
+        hits = (self.bits[positions >> np.uint64(3)] >> (positions & np.uint64(7)).astype(np.uint8)) & 1
+        return hits.all(axis=1)
+
+    def save(self, path):
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(self._HEADER.pack(self._MAGIC, self.capacity, self.error_rate, self.count))
+            f.write(self.bits.tobytes())
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        """Filter saved at path, or None if missing or unreadable"""
+        try:
+            with open(path, 'rb') as f:
+                magic, capacity, error_rate, count = cls._HEADER.unpack(f.read(cls._HEADER.size))
+                if magic != cls._MAGIC:
+                    return None
+                bits = np.fromfile(f, dtype=np.uint8)
+        except (OSError, struct.error):
+            return None
+        bloom = cls(capacity, error_rate)
+        if len(bits) != len(bloom.bits):
+            return None
+        bloom.bits, bloom.count = bits, count
+        return bloom
+
+
+def _digests(keys):
+    return np.frombuffer(b''.join(bytes.fromhex(key) for key in keys), dtype=np.uint8).reshape(-1, 16)
+
+
+class SeenReviews:
+    """
+    Persistent set of review keys from earlier runs.
+    filter_new() drops records whose key is already stored or was marked earlier
+    in this run. mark() keeps the keys of collected records pending until
+    commit(), which the scraper calls only once the run's datasets are on disk -
+    an interrupted run never hides reviews that were not saved.
+    The bloom filter is rebuilt from the index when its sidecar file is missing
+    or stale, and doubled in size whenever the index outgrows it.
+    """
+
+    def __init__(self, path="Trustpilot_data/seen_reviews.db", capacity=10_000_000, error_rate=0.01):
+        self.path = path
+        self.bloom_path = f"{path}.bloom"
+        self.error_rate = error_rate
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.executescript("""
+            create table if not exists seen_reviews (review_key blob primary key) without rowid;
+            create table if not exists seen_meta (name text primary key, value integer not null);
+            insert or ignore into seen_meta (name, value) values ('count', 0);
+        """)
+        self.conn.commit()
+        self.pending = set()
+
+        self.count = self.conn.execute("select value from seen_meta where name = 'count'").fetchone()[0]
+        self.bloom = BloomFilter.load(self.bloom_path)
+        if self.bloom is None or self.bloom.count != self.count or self.bloom.capacity < self.count:
+            self._rebuild(max(capacity, self.count * 2))
+
+    def _rebuild(self, capacity):
+        """Refill a fresh bloom filter from the exact index"""
+        logger.info("rebuilding seen-review bloom filter", extra={'keys': self.count, 'capacity': capacity})
+        self.bloom = BloomFilter(capacity, self.error_rate)
+        cursor = self.conn.execute("select review_key from seen_reviews")
+        while True:
+            rows = cursor.fetchmany(100_000)
+            if not rows:
+                break
+            self.bloom.add(np.frombuffer(b''.join(row[0] for row in rows), dtype=np.uint8).reshape(-1, 16))
+        self.bloom.count = self.count
+        self.bloom.save(self.bloom_path)
+
+    def _known(self, keys):
+        """Subset of keys present in the index - the bloom filter screens out most of them first"""
+        maybe = [key for key, hit in zip(keys, self.bloom.might_contain(_digests(keys))) if hit]
+        found = set()
+        for i in range(0, len(maybe), 500):
+            chunk = [bytes.fromhex(key) for key in maybe[i:i + 500]]
+            rows = self.conn.execute(
+                f"select review_key from seen_reviews where review_key in ({','.join('?' * len(chunk))})", chunk
+            ).fetchall()
+            found.update(row[0].hex() for row in rows)
+        return found
+
+    def filter_new(self, records):
+        """Records whose review_key is neither stored nor pending, in order, without duplicates"""
+        if not records:
+            return []
+        keys = [record.get('review_key') or review_key(record) for record in records]
+        fresh = []
+        with self.lock:
+            known = self._known(keys)
+            for key, record in zip(keys, records):
+                if key not in known and key not in self.pending:
+                    known.add(key)
+                    fresh.append(record)
+        return fresh
+
+    def mark(self, records):
+        """Register records as collected this run - stored for good by the next commit()"""
+        with self.lock:
+            self.pending.update(record.get('review_key') or review_key(record) for record in records)
+
+    def commit(self):
+        """Persist keys marked since the last commit; returns how many were added"""
+        with self.lock:
+            if not self.pending:
+                return 0
+            keys = sorted(self.pending)
+            with self.conn:
+                before = self.conn.total_changes
+                self.conn.executemany("insert or ignore into seen_reviews (review_key) values (?)",
+                                      ((bytes.fromhex(key),) for key in keys))
+                added = self.conn.total_changes - before
+                self.conn.execute("update seen_meta set value = value + ? where name = 'count'", (added,))
+            self.count += added
+            self.pending.clear()
+
+            if self.count > self.bloom.capacity:
+                self._rebuild(max(self.bloom.capacity, self.count) * 2)
+            else:
+                self.bloom.add(_digests(keys))
+                self.bloom.count = self.count
+                self.bloom.save(self.bloom_path)
+            return added
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
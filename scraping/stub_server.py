@@ -0,0 +1,277 @@
+"""
+Local stub of the Trustpilot pages the scraper touches
+Serves synthetic category, profile and review pages with optional latency,
+so fetch throughput can be measured without hitting trustpilot.com.
+Faults can be injected to exercise the fetch engine's retry, circuit breaker and
+adaptive concurrency: random 503s, 429s with Retry-After, dropped connections,
+and 429s for every request beyond a concurrency limit.
+Review pages honour Trustpilot's filter parameters (stars=N repeated,
+verified=true, sort=recency), so filtered paging can be exercised too.
+
+
+Project: Trustpilot Analytics Pipeline
+"""
+
+import hashlib
+import random
+import threading
+import time
+from html import escape
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs
+
+TITLES = ['Fast delivery', 'Great price', 'Rude staff', 'Broken on arrival', 'Easy checkout', 'Refund took weeks']
+TEXTS = [
+    'The fridge was delivered on time and the installers were professional.',
+    'Good value for money, cheaper than the big box store.',
+    'Customer service never answered, I had to cancel the order.',
+    'Washer arrived damaged and the replacement is still in transit.',
+    'Picked it up at the store, the manager was friendly and helpful.',
+    'Returned the dryer under warranty and waited weeks for my money back.',
+]
+COUNTRIES = ['US', 'GB', 'CA', 'DE', 'AU']
+
+
+def stub_companies(count):
+    """Deterministic list of (name, domain, review_count), sorted by review count like the real listing"""
+    return [(f"Stub Appliances {i}", f"stub{i}.example.com", 20000 // i) for i in range(1, count + 1)]
+
+
+def render_category_page(companies):
+    cards = []
+    for name, domain, review_count in companies:
+        cards.append(f"""
+<div class="styles_card__WMwue">
+  <a href="/review/{domain}" class="link_internal__7XN06">
+    <div class="styles_businessUnitMain__wRgqU">
+      <p class="typography_heading-s__RxXm8">{escape(name)}</p>
+      <p class="typography_body-m__k2UI7 styles_websiteUrlDisplayed__lSw1A">{domain}</p>
+      <div class="styles_rating__lOWGj"><span>4.2</span></div>
+      <p class="typography_body-m__k2UI7 styles_ratingText__yQ5S7"><span>4.2</span>{review_count:,} reviews</p>
+    </div>
+  </a>
+  <div class="styles_businessLocation__PIJjr">United States</div>
+</div>""")
+    return f"<html><body><main>{''.join(cards)}</main></body></html>"
+
+
+def render_profile_page(name, domain, review_count):
+    return f"""<html><head>
+<script type="application/ld+json">{{"@context":"https://schema.org","@graph":[{{"@type":"LocalBusiness","name":"{escape(name)}","aggregateRating":{{"@type":"AggregateRating","ratingValue":"4.2","reviewCount":"{review_count}"}}}}]}}</script>
+</head><body>
+<section>
+  <span>Claimed profile</span>
+  <h1>{escape(name)}</h1>
+  <p>Reviews {review_count:,}</p>
+  <p>Great
+{review_count:,} reviews</p>
+  <a href="/categories/appliance_store">Appliance Store</a>
+  <a href="https://{domain}/?utm_source=trustpilot">Visit website</a>
+  <p>12 Locations</p>
+  <p>Replied to 87% of negative reviews</p>
+  <p>Typically replies within 1 week</p>
+  <span>Verified company</span>
+  <span>Active Trustpilot subscription</span>
+</section>
+<section>
+  <h2>About {escape(name)}</h2>
+  <p>Written by the company</p>
+  <p>Founded in 1983, we are a family-owned appliance retailer.</p>
+  <h3>Contact info</h3>
+  <p>615-259-2031</p>
+  <p>support@{domain}</p>
+  <p>418 Harding Industrial Dr, 37211, Nashville, United States</p>
+</section>
+
+
+</body></html>"""
+
+
+def review_date(n):
+    """Date of the stub's review n - unordered across pages, like Trustpilot's default sort"""
+    return f"2025-{12 - n % 12:02d}-{n % 28 + 1:02d}T10:{n % 60:02d}:00.000Z"
+
+
+def review_numbers(total, stars=None, verified=False, sort=None):
+    """Review numbers in page order for a company with total reviews, after Trustpilot-style filters"""
+    numbers = [n for n in range(total)
+               if (not stars or n % 5 + 1 in stars) and (not verified or n % 3 == 0)]
+    if sort == 'recency':
+        numbers.sort(key=review_date, reverse=True)
+    return numbers
+
+
+def render_review_page(name, page, per_page=20, numbers=None):
+    """One page of review cards; numbers is the (filtered) review order, default 0, 1, 2, ..."""
+    cards = []
+    for i in range(per_page):
+        n = (page - 1) * per_page + i
+        if numbers is not None:
+            if n >= len(numbers):
+                break
+            n = numbers[n]
+        rating = n % 5 + 1
+        verified = '<div data-service-review-verified-review="true">Verified</div>' if n % 3 == 0 else ''
+        reply = f'<div><p>Reply from {escape(name)}</p><p>Thanks for your feedback.</p></div>' if n % 4 == 0 else ''
+        cards.append(f"""
+<article data-service-review-card-paper="true" class="paper_paper__1PY90">
+  <aside><a href="/users/{n}"><span data-consumer-name-typography="true">Reviewer {n}</span></a>
+  <div><span data-consumer-country-typography="true">{COUNTRIES[n % len(COUNTRIES)]}</span></div></aside>
+  <section>
+    <div><img alt="Rated {rating} out of 5 stars" src="/stars-{rating}.svg"></div>
+    <div><time datetime="{review_date(n)}">date</time></div>
+    {verified}
+    <a href="/reviews/{n}"><h2>{TITLES[n % len(TITLES)]}</h2></a>
+    <p data-service-review-text-typography="true">{TEXTS[n % len(TEXTS)]}</p>
+  </section>
+  {reply}
+</article>""")
+    return f"<html><body><main>{''.join(cards)}</main></body></html>"
+
+
+class StubTrustpilotServer:
+    """
+    Threaded HTTP server mimicking trustpilot.com page structure.
+    latency: seconds slept per request to simulate network round-trips
+    pages_per_company: review pages served before returning an empty page
+    category_page_size: companies per category listing page (every category lists the same companies)
+    error_rate / throttle_rate / drop_rate: fraction of requests answered 503, answered 429
+    with a Retry-After of retry_after seconds, or dropped without any response
+    max_concurrent: requests arriving while this many are in flight get a 429
+    seed: fault RNG seed, so a fault run can be repeated
+    """
+
+    def __init__(self, companies=5, pages_per_company=5, reviews_per_page=20, latency=0.0, port=0,
+                 category_page_size=20, error_rate=0.0, throttle_rate=0.0, drop_rate=0.0, retry_after=1,
+                 max_concurrent=None, seed=0):
+        self.companies = stub_companies(companies)
+        self.pages_per_company = pages_per_company
+        self.category_page_size = category_page_size
+        self.reviews_per_page = reviews_per_page
+        self.latency = latency
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.drop_rate = drop_rate
+        self.retry_after = retry_after
+        self.max_concurrent = max_concurrent
+        self.request_count = 0
+        self.faults = {}  # fault kind -> count
+        self.in_flight = 0
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', port), self._handler())
+        self.httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def render(self, path, query):
+        """Return (status, html) for a request path"""
+        if path.startswith('/categories/'):
+            page = int(query.get('page', ['1'])[0])
+            start = (page - 1) * self.category_page_size
+            return 200, render_category_page(self.companies[start:start + self.category_page_size])
+        if path.startswith('/review/'):
+            domain = path[len('/review/'):]
+            for name, company_domain, review_count in self.companies:
+                if company_domain == domain:
+                    if 'page' not in query:
+                        return 200, render_profile_page(name, domain, review_count)
+                    page = int(query['page'][0])
+                    if page > self.pages_per_company:
+                        return 200, "<html><body><main></main></body></html>"
+                    numbers = None
+                    if {'stars', 'verified', 'sort'} & set(query):
+                        numbers = review_numbers(self.pages_per_company * self.reviews_per_page,
+                                                 stars={int(star) for star in query.get('stars', [])},
+                                                 verified=query.get('verified') == ['true'],
+                                                 sort=query.get('sort', [None])[0])
+                    return 200, render_review_page(name, page, self.reviews_per_page, numbers)
+        return 404, "<html><body>Not found</body></html>"
+
+    def fault(self):
+        """Fault to inject for a request that just arrived ('drop', 503, 429 or None)"""
+        with self._lock:
+            roll = self._rng.random()
+            if self.max_concurrent is not None and self.in_flight > self.max_concurrent:
+                kind = 'overload'
+            elif roll < self.drop_rate:
+                kind = 'drop'
+            elif roll < self.drop_rate + self.error_rate:
+                kind = 503
+            elif roll < self.drop_rate + self.error_rate + self.throttle_rate:
+                kind = 429
+            else:
+                return None
+            self.faults[kind] = self.faults.get(kind, 0) + 1
+        return 429 if kind == 'overload' else kind
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                with server._lock:
+                    server.request_count += 1
+                    server.in_flight += 1
+                try:
+                    self.respond()
+                finally:
+                    with server._lock:
+                        server.in_flight -= 1
+
+            def respond(self):
+                fault = server.fault()
+                if fault == 'drop':
+                    self.close_connection = True
+                    return
+                if server.latency:
+                    time.sleep(server.latency)
+                if fault is not None:
+                    body = b"<html><body>Service unavailable</body></html>"
+                    self.send_response(fault)
+                    if fault == 429:
+                        self.send_header('Retry-After', str(server.retry_after))
+                    self.send_header('Content-Type', 'text/html; charset=utf-8')
+                    self.send_header('Content-Length', str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+                    return
+                parts = urlsplit(self.path)
+                status, html = server.render(parts.path, parse_qs(parts.query))
+                body = html.encode('utf-8')
+                etag = '"%s"' % hashlib.md5(body).hexdigest()
+                if status == 200 and self.headers.get('If-None-Match') == etag:
+                    self.send_response(304)
+                    self.send_header('ETag', etag)
+                    self.end_headers()
+                    return
+                self.send_response(status)
+                self.send_header('Content-Type', 'text/html; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.send_header('ETag', etag)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
@@ -0,0 +1,191 @@
+"""
+Single-pass topic tagger
+All topic keywords are compiled into one trie-shaped regex, so a review is scanned
+once instead of once per keyword. Large batches are tagged column-wise instead:
+one Arrow-backed pandas str.contains per topic. Keyword sets live in topics.json
+and can be extended without code changes.
+
+
+Project: Trustpilot Analytics Pipeline
+"""
+
+import json
+import os
+import re
+from functools import reduce
+from operator import or_
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow  # noqa: F401 - backs the vectorized string column
+except ImportError:  # column-wise tagging is optional
+    pyarrow = None
+
+DEFAULT_TOPICS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'topics.json')
+
+
+def _trie_regex(words):
+    """Regex matching any of `words`, factored by common prefix and preferring the longest"""
+    trie = {}
+    for word in words:
+        node = trie
+        for ch in word:
+            node = node.setdefault(ch, {})
+        node[''] = {}  # end of word marker
+
+    def build(node):
+        branches = [re.escape(ch) + build(child) for ch, child in sorted(node.items()) if ch]
+        if not branches:
+            return ''
+        if '' in node:
+            return '(?:' + '|'.join(branches) + ')?'
+        if len(branches) == 1:
+            return branches[0]
+        return '(?:' + '|'.join(branches) + ')'
+
+    return build(trie)
+
+
+# Below this many rows the per-review scan beats the per-topic column passes (pandas call overhead)
+VECTORIZE_MIN_ROWS = 500
+
+
+class TopicTagger:
+    """
+    Precompiled multi-keyword matcher producing the `topic_tags` string and `mentions_*` flags.
+
+    Output matches the old `any(kw in text ...)` loops exactly. The regex takes the longest
+    keyword at each position and skips past it, so each keyword's mask also carries the
+    topics of every keyword contained in it (e.g. 'money back' -> refund + price). The only
+    hits a skip can hide are keywords that start inside a match and run past its end; those
+    few candidates are listed per keyword and confirmed with a plain substring check.
+    """
+
+    def __init__(self, topics):
+        self.topics = list(topics)
+        self.flag_names = [f'mentions_{topic}' for topic in self.topics]
+
+        # Keywords are used exactly as configured against lowercased text, like the old
+        # loops: one with capitals never matches, an empty one matches every review
+        keyword_bits = {}
+        self.always = 0
+        for bit, keywords in enumerate(topics.values()):
+            for kw in keywords:
+                if kw:
+                    keyword_bits[kw] = keyword_bits.get(kw, 0) | (1 << bit)
+                else:
+                    self.always |= 1 << bit
+
+        self.keyword_masks = {}
+        self.overlaps = {}
+        for kw in keyword_bits:
+            mask = 0
+            straddling = []
+            for other, bits in keyword_bits.items():
+                if other in kw:
+                    mask |= bits
+                elif any(other.startswith(kw[i:]) for i in range(1, len(kw))):
+                    straddling.append(other)
+            self.keyword_masks[kw] = mask
+            if straddling:
+                self.overlaps[kw] = (straddling, reduce(or_, (keyword_bits[o] for o in straddling)))
+
+        self.pattern = re.compile(_trie_regex(keyword_bits)) if keyword_bits else None
+
+        # Column-wise path: one alternation per topic - a search hit is exactly any(kw in text)
+        self.topic_patterns = [
+            '|'.join(re.escape(kw) for kw in sorted(keywords, key=len, reverse=True) if kw)
+            for keywords in topics.values()
+        ]
+
+        # At most 2^n distinct results - build each (tags, flags) pair once and reuse it
+        self._results = {}
+
+    @classmethod
+    def from_config(cls, path=None):
+        """Load topics from a JSON file of {"topic": ["keyword", ...]} (defaults to topics.json)"""
+        with open(path or DEFAULT_TOPICS_FILE, encoding='utf-8') as f:
+            return cls(json.load(f))
+
+    def mask(self, combined):
+        """Bitmask of topics found in already-lowercased text"""
+        if self.pattern is None:
+            return self.always
+        masks = self.keyword_masks
+        found = self.always
+        hits = self.pattern.findall(combined)
+        for kw in hits:
+            found |= masks[kw]
+        overlaps = self.overlaps
+        for kw in hits:
+            if kw in overlaps and overlaps[kw][1] & ~found:
+                for other in overlaps[kw][0]:
+                    if masks[other] & ~found and other in combined:
+                        found |= masks[other]
+        return found
+
+    def result(self, mask):
+        """(topic_tags, flags) for a topic bitmask"""
+        cached = self._results.get(mask)
+        if cached is None:
+            detected = [topic for bit, topic in enumerate(self.topics) if mask >> bit & 1]
+            flags = {name: bool(mask >> bit & 1) for bit, name in enumerate(self.flag_names)}
+            cached = (', '.join(detected) if detected else 'general', flags)
+            self._results[mask] = cached
+        return cached
+
+    def tag(self, title, text):
+        """Tag one review - same output as the old detect_topic_tags"""
+        tags, flags = self.result(self.mask(f"{title} {text}".lower()))
+        return tags, dict(flags)
+
+    def tag_columns(self, titles, texts):
+        """
+        Tag many (title, text) pairs at once as columns: `topic_tags` (list of str)
+        plus one boolean NumPy array per `mentions_*` flag.
+        From VECTORIZE_MIN_ROWS rows on (and with pyarrow installed) each topic is one
+        vectorized regex pass over the whole column; smaller batches such as a single
+        review page are scanned review by review.
+        """
+        if pyarrow is not None and len(titles) >= VECTORIZE_MIN_ROWS and len(self.topics) < 63:
+            return self._tag_columns_vectorized(titles, texts)
+        combined = (f"{title} {text}".lower() for title, text in zip(titles, texts))
+        masks = [self.mask(c) for c in combined]
+        bits = np.array(masks, dtype=np.int64 if len(self.topics) < 63 else object)
+        columns = {'topic_tags': self._tags(masks)}
+        for bit, name in enumerate(self.flag_names):
+            columns[name] = ((bits >> bit) & 1).astype(bool)
+        return columns
+
+    def _tag_columns_vectorized(self, titles, texts):
+        """tag_columns as one Arrow-backed str.contains per topic"""
+        combined = (pd.Series(list(titles), dtype='string[pyarrow]') + ' '
+                    + pd.Series(list(texts), dtype='string[pyarrow]')).str.lower()
+        columns = {}
+        bits = np.zeros(len(combined), dtype=np.int64)
+        for bit, (name, pattern) in enumerate(zip(self.flag_names, self.topic_patterns)):
+            if self.always >> bit & 1:
+                flags = np.ones(len(combined), dtype=bool)
+            elif pattern:
+                flags = combined.str.contains(pattern, regex=True).to_numpy(dtype=bool, na_value=False)
+            else:
+                flags = np.zeros(len(combined), dtype=bool)
+            columns[name] = flags
+            bits |= flags.astype(np.int64) << bit
+        return {'topic_tags': self._tags(bits.tolist()), **columns}
+
+    def _tags(self, masks):
+        # Expand each distinct mask once, then map - cheap because masks repeat heavily
+        unique = {m: self.result(m)[0] for m in set(masks)}
+        return [unique[m] for m in masks]
+
+    def tag_batch(self, titles, texts):
+        """
+        Tag many (title, text) pairs at once.
+        Accepts lists or pandas Series and returns a DataFrame with `topic_tags`
+        plus one boolean `mentions_*` column per topic (index kept from a Series input).
+        """
+        index = titles.index if isinstance(titles, pd.Series) else None
+        return pd.DataFrame(self.tag_columns(titles, texts), index=index)
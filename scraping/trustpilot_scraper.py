@@ -7,20 +7,82 @@ Fixed selectors - Last verified: December 2025
 Project: Trustpilot Analytics Pipeline
 """
 
-from bs4 import BeautifulSoup
 import requests
 import pandas as pd
-import time
 from datetime import datetime
+import logging
 import os
-import random
-import re
-import json
+import time
+from concurrent.futures import Future
+from urllib.parse import urlencode
+
+from checkpoint_store import CheckpointStore
+from company_discovery import CompanyDiscovery, get_category_parser
+from fetch_engine import FetchEngine, HostRateLimiter, RetryPolicy
+from http_cache import HttpCache
+from instrumentation import ScraperMetrics, configure_logging
+from parse_pipeline import InlineParser, ParsePool
+from review_batch import MISSING_DATE
+from profile_parser import get_profile_parser
+from review_parsers import get_review_parser
+from review_sinks import open_review_sink
+from seen_reviews import SeenReviews
+from topic_tagger import TopicTagger
+
+logger = logging.getLogger(__name__)
+
+
+def review_page_url(company_url, page, stars=None, verified_only=False, newest_first=False):
+    """Review page URL with Trustpilot's filter parameters (stars=N per rating, verified=true, sort=recency)"""
+    params = [('page', page)] + [('stars', star) for star in sorted(stars or ())]
+    if verified_only:
+        params.append(('verified', 'true'))
+    if newest_first:
+        params.append(('sort', 'recency'))
+    return f"{company_url}?{urlencode(params)}"
+
+
+def _in_range(review_date, date_range):
+    return review_date != MISSING_DATE and date_range[0] <= review_date <= date_range[1]
+
 
 class TrustpilotApplianceScraper:
     """Production scraper with comprehensive field extraction and fixed selectors"""
     
-    def __init__(self):
+    BASE_URL = "https://www.trustpilot.com"
+    
+    def __init__(self, max_in_flight=4, requests_per_second=1.0, burst=2, base_url=None, parser='lxml',
+                 topics_config=None, checkpoint_path=None, cache_dir=None, replay=False, parse_workers=0,
+                 metrics=None, log_level=None, seen_path=None, max_retries=4):
+        """
+        max_in_flight: page requests kept in flight across companies
+        requests_per_second / burst: per-host token bucket replacing the fixed sleeps
+        base_url: override for trustpilot.com (e.g. a local stub server)
+        parser: category card / review card / profile backend - 'lxml' (precompiled XPath + JSON-LD) or 'bs4' (original)
+        topics_config: JSON file of topic keywords (defaults to topics.json)
+        checkpoint_path: SQLite checkpoint file for resumable / incremental runs (disabled if None)
+        cache_dir: on-disk HTTP cache directory (disabled if None)
+        replay: serve every page from cache_dir without touching the network
+        parse_workers: processes for the parse stage (0 = parse on the fetch threads)
+        metrics: ScraperMetrics to record into (a fresh one by default)
+        log_level: configure structured logging at this level ('DEBUG', 'INFO', ...); None leaves logging alone
+        seen_path: SQLite seen-review index - reviews collected by earlier runs are dropped (disabled if None)
+        max_retries: retries per page request on 429/5xx, timeouts and connection errors (0 disables);
+            the engine also adapts concurrency per host up to max_in_flight and opens a circuit on repeated failures
+        """
+        if log_level:
+            configure_logging(log_level)
+        self.metrics = metrics or ScraperMetrics()
+        self.base_url = (base_url or self.BASE_URL).rstrip('/')
+        self.parse_review_cards = get_review_parser(parser)
+        self.extract_profile = get_profile_parser(parser)
+        self.topic_tagger = TopicTagger.from_config(topics_config)
+        
+        # Parse stage - page bytes in, records out
+        if parse_workers:
+            self.page_parser = ParsePool(parse_workers, parser=parser, topics_config=topics_config)
+        else:
+            self.page_parser = InlineParser(self.parse_review_cards, self.topic_tagger, self.extract_profile)
         self.session = requests.Session()
         self.session.headers.update({
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
@@ -31,151 +93,47 @@ class TrustpilotApplianceScraper:
         
         if not os.path.exists("Trustpilot_data"):
             os.makedirs("Trustpilot_data")
-    
-    def detect_topic_tags(self, title, text):
-        """Detect topic mentions in review content"""
-        combined = f"{title} {text}".lower()
         
-        patterns = {
-            'delivery': ['deliver', 'shipping', 'ship', 'arrived', 'transit', 'fedex', 'ups', 'usps', 'fast', 'slow', 'late', 'on time'],
-            'price': ['price', 'cost', 'expensive', 'cheap', 'value', 'deal', 'money', 'affordable', 'worth', 'overpriced', 'budget'],
-            'service': ['service', 'support', 'help', 'assist', 'representative', 'customer service', 'helpful', 'responsive'],
-            'product': ['product', 'item', 'quality', 'condition', 'broken', 'defective', 'working', 'perfect', 'damaged', 'excellent'],
-            'staff': ['staff', 'employee', 'manager', 'associate', 'friendly', 'rude', 'polite', 'professional', 'knowledgeable'],
-            'order': ['order', 'purchase', 'buy', 'bought', 'ordered', 'shopping', 'checkout', 'transaction'],
-            'location': ['store', 'location', 'branch', 'visit', 'pickup', 'pick up', 'warehouse', 'showroom', 'in-store'],
-            'refund': ['refund', 'return', 'exchange', 'money back', 'replacement', 'warranty', 'cancel']
-        }
+        if replay and not cache_dir:
+            raise ValueError("replay mode needs a cache_dir to replay from")
         
-        detected = []
-        flags = {}
-        for topic, keywords in patterns.items():
-            has_topic = any(kw in combined for kw in keywords)
-            flags[f'mentions_{topic}'] = has_topic
-            if has_topic:
-                detected.append(topic)
+        # All page requests go through the shared engine so the politeness budget is global
+        self.fetcher = FetchEngine(
+            headers=self.session.headers,
+            max_in_flight=max_in_flight,
+            rate_limiter=HostRateLimiter(rate=requests_per_second, capacity=burst),
+            cache=HttpCache(cache_dir, replay=replay) if cache_dir else None,
+            metrics=self.metrics,
+            retry_policy=RetryPolicy(max_attempts=max_retries + 1)
+        )
+        self.discovery = CompanyDiscovery(self.fetcher, self.base_url, get_category_parser(parser), metrics=self.metrics)
         
-        return ', '.join(detected) if detected else 'general', flags
+        self.checkpoint = CheckpointStore(checkpoint_path) if checkpoint_path else None
+        self.seen = SeenReviews(seen_path) if seen_path else None
+    
+    def detect_topic_tags(self, title, text):
+        """Detect topic mentions in review content"""
+        return self.topic_tagger.tag(title, text)
     
-    def get_appliance_companies(self, min_reviews=1000):
+    def discover_companies(self, min_reviews=1000, categories=None):
+        """
+        Generator over companies with min_reviews+ reviews in the given categories
+        (default: appliance_store). Listing pages are fetched concurrently.
+        """
+        return self.discovery.discover(categories, min_reviews=min_reviews)
+
+    def get_appliance_companies(self, min_reviews=1000, categories=None):
         """
-        Discover appliance companies with minimum review threshold.
+        Discover companies with minimum review threshold.
         Uses fixed selectors for 2024 Trustpilot layout.
         """
-        companies = []
-        
-        urls = [
-            "https://www.trustpilot.com/categories/appliance_store?sort=reviews_count",
-            "https://www.trustpilot.com/categories/appliance_store?page=2&sort=reviews_count",
-            "https://www.trustpilot.com/categories/appliance_store?page=3&sort=reviews_count"
-        ]
-        
-        for url in urls:
-            print(f"Scanning: {url}")
-            try:
-                response = self.session.get(url, timeout=15)
-                response.raise_for_status()
-                soup = BeautifulSoup(response.text, 'html.parser')
-                
-                # Fixed: Correct card selector for 2024
-                company_cards = soup.select('div.styles_card__WMwue')
-                print(f"Found {len(company_cards)} company cards")
-                
-                for card in company_cards:
-                    try:
-                        # Fixed: Get main content div
-                        main_div = card.select_one('div.styles_businessUnitMain__wRgqU')
-                        if not main_div:
-                            continue
-                        
-                        # Company name has class containing "heading-s"
-                        name_el = main_div.select_one('p[class*="heading-s"]')
-                        company_name = name_el.get_text(strip=True) if name_el else None
-                        
-                        # Domain has class "styles_websiteUrlDisplayed"
-                        domain_el = main_div.select_one('p[class*="websiteUrlDisplayed"]')
-                        domain = domain_el.get_text(strip=True) if domain_el else None
-                        
-                        # Skip if no company name found
-                        if not company_name:
-                            continue
-                        
-                        # Get rating from rating div
-                        rating_div = card.select_one('div.styles_rating__lOWGj')
-                        rating = None
-                        if rating_div:
-                            rating_span = rating_div.select_one('span')
-                            rating = rating_span.get_text(strip=True) if rating_span else None
-                        
-                        # Get review count - account for rating prefix
-                        # Page format is "4.216,726 reviews" where 4.2 is rating and 16,726 is review count
-                        review_count = 0
-                        rating_text_el = main_div.select_one('p[class*="ratingText"]')
-                        if rating_text_el:
-                            text = rating_text_el.get_text(strip=True)
-                            # Pattern: skip rating (X.X) and capture actual review count
-                            match = re.search(r'\d\.\d([\d,]+)\s*reviews', text)
-                            if match:
-                                review_count = int(match.group(1).replace(',', ''))
-                        else:
-                            # Fallback: look in spans
-                            for span in card.select('span'):
-                                if 'reviews' in span.get_text().lower():
-                                    text = span.get_text()
-                                    match = re.search(r'\d\.\d([\d,]+)', text)
-                                    if match:
-                                        review_count = int(match.group(1).replace(',', ''))
-                                    break
-                        
-                        # Filter by minimum reviews
-                        if review_count < min_reviews:
-                            continue
-                        
-                        # Get URL
-                        link = card.select_one('a[href*="/review/"]')
-                        if not link:
-                            continue
-                        
-                        company_url = f"https://www.trustpilot.com{link['href']}"
-                        
-                        # Get location
-                        loc_div = card.select_one('div.styles_businessLocation__PIJjr')
-                        location = loc_div.get_text(strip=True) if loc_div else 'Unknown'
-                        
-                        companies.append({
-                            'company_name': company_name,
-                            'domain': domain,
-                            'rating': rating,
-                            'review_count': review_count,
-                            'location': location,
-                            'company_url': company_url
-                        })
-                        
-                        print(f"Found: {company_name} | {review_count:,} reviews")
-                        
-                    except Exception as e:
-                        continue
-                
-                time.sleep(random.uniform(2, 4))
-                
-            except Exception as e:
-                print(f"Error: {e}")
-        
-        # Remove duplicates
-        seen = set()
-        unique = []
-        for c in companies:
-            key = c['company_name'].lower()
-            if key not in seen:
-                seen.add(key)
-                unique.append(c)
-        
-        print(f"\nDiscovered {len(unique)} companies with {min_reviews}+ reviews")
-        return unique
+        companies = list(self.discover_companies(min_reviews=min_reviews, categories=categories))
+        logger.info("discovery finished", extra={'companies': len(companies), 'min_reviews': min_reviews})
+        return companies
     
     def scrape_company_profile(self, company_url, company_name):
         """Scrape comprehensive company profile - 17 fields"""
-        print(f"Scraping profile: {company_name}")
+        logger.debug("scraping profile", extra={'company': company_name})
         
         profile = {
             'company_name': company_name,
@@ -184,118 +142,20 @@ class TrustpilotApplianceScraper:
         }
         
         try:
-            response = self.session.get(company_url, timeout=15)
+            response = self.fetcher.get(company_url, timeout=15)
             response.raise_for_status()
-            soup = BeautifulSoup(response.text, 'html.parser')
-            page_text = soup.get_text()
-            
-            # Rating extraction - multiple methods for reliability
-            profile['overall_rating'] = None
-            
-            # Method A: Regex on raw JSON-LD (most reliable)
-            for script in soup.select('script[type="application/ld+json"]'):
-                if script.string:
-                    match = re.search(r'"ratingValue"\s*:\s*"?(\d\.?\d?)"?', script.string)
-                    if match:
-                        profile['overall_rating'] = float(match.group(1))
-                        break
-            
-            # Method B: Deep parse JSON-LD
-            if not profile['overall_rating']:
-                for script in soup.select('script[type="application/ld+json"]'):
-                    try:
-                        data = json.loads(script.string)
-                        def find_rating(obj):
-                            if isinstance(obj, dict):
-                                if 'ratingValue' in obj:
-                                    return obj['ratingValue']
-                                for v in obj.values():
-                                    r = find_rating(v)
-                                    if r: return r
-                            elif isinstance(obj, list):
-                                for i in obj:
-                                    r = find_rating(i)
-                                    if r: return r
-                            return None
-                        found = find_rating(data)
-                        if found:
-                            profile['overall_rating'] = float(found)
-                            break
-                    except:
-                        pass
-            
-            # Method C: Page text fallback
-            if not profile['overall_rating']:
-                match = re.search(r'Reviews\s+[\d,]+\s*[•·]\s*(\d\.\d)', page_text)
-                if match:
-                    profile['overall_rating'] = float(match.group(1))
-            
-            # Extract other profile fields
-            trust = re.search(r'(Excellent|Great|Good|Average|Poor|Bad)\s*\n?\s*[\d,]+K?\s+reviews', page_text, re.I)
-            profile['trust_category'] = trust.group(1) if trust else 'Unknown'
-            
-            reviews = re.search(r'Reviews\s+([\d,]+)', page_text)
-            profile['total_reviews'] = int(reviews.group(1).replace(',', '')) if reviews else 0
-            
-            profile['claimed_profile'] = 'Claimed profile' in page_text
-            
-            loc = re.search(r'(\d+)\s+Locations?', page_text, re.I)
-            profile['num_locations'] = int(loc.group(1)) if loc else 1
-            
-            # Business type
-            profile['business_type'] = 'Unknown'
-            for link in soup.select('a[href*="/categories/"]'):
-                txt = link.get_text(strip=True)
-                if 'Store' in txt or 'Shop' in txt:
-                    profile['business_type'] = txt
-                    break
-            
-            # Website URL
-            profile['website_url'] = None
-            for link in soup.select('a'):
-                if 'Visit website' in link.get_text():
-                    href = link.get('href', '')
-                    if 'utm_source=trustpilot' in href or 'trustpilot.com' not in href:
-                        profile['website_url'] = href
-                        break
-            
-            # Response metrics
-            resp = re.search(r'Replied to\s+(\d+%)', page_text, re.I)
-            profile['negative_response_rate'] = resp.group(1) if resp else 'Unknown'
-            
-            time_match = re.search(r'Typically replies within\s+(\d+\s*\w+)', page_text, re.I)
-            profile['response_time'] = time_match.group(1) if time_match else 'Unknown'
-            
-            profile['verified_company'] = 'Verified company' in page_text
+            fields, timings = self.page_parser.parse_profile(response.content, response.encoding, company_name)
+            self.metrics.record_parse('profile', timings['parse'])
+            profile.update(fields)
             
-            # Contact information
-            phone = re.search(r'(\d{3}[-.\s]?\d{3}[-.\s]?\d{4})', page_text)
-            profile['phone'] = phone.group(1) if phone else None
-            
-            email = re.search(r'([a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,})', page_text)
-            profile['email'] = email.group(1) if email else None
-            
-            # Address
-            addr = re.search(r'(\d+[^,\n]+,\s*\d{5},?\s*[^,\n]+,\s*United States)', page_text)
-            if not addr:
-                addr = re.search(r'(\d+[^,\n]+,\s*[^,\n]+,\s*United States)', page_text)
-            profile['address'] = addr.group(1) if addr else None
-            
-            # Founded year
-            founded = re.search(r'[Ff]ounded\s+(?:in\s+)?(\d{4})', page_text)
-            profile['founded_year'] = int(founded.group(1)) if founded else None
-            
-            # Active subscription
-            profile['has_active_subscription'] = 'Active Trustpilot subscription' in page_text
-            
-            # Company description
-            about = re.search(r'About\s+' + re.escape(company_name) + r'[\s\S]*?Written by the company\s*([\s\S]*?)(?=Contact info|Categories|\n\n\n)', page_text, re.I)
-            profile['company_description'] = about.group(1).strip()[:500] if about else None
-            
-            print(f"Profile extracted: {profile['overall_rating']} stars | {profile['trust_category']} | {profile['num_locations']} locations")
+            logger.info("profile extracted", extra={
+                'company': company_name, 'rating': profile['overall_rating'],
+                'trust_category': profile['trust_category'], 'locations': profile['num_locations']
+            })
             
         except Exception as e:
-            print(f"Error extracting profile: {e}")
+            self.metrics.record_error('profile', e)
+            logger.warning("profile extraction failed", extra={'company': company_name, 'error': repr(e)})
             # Set default values for failed extraction
             profile.update({
                 'overall_rating': None, 'trust_category': 'Unknown', 'total_reviews': 0,
@@ -308,205 +168,335 @@ class TrustpilotApplianceScraper:
         
         return profile
     
-    def scrape_company_reviews(self, company_url, company_name, target_reviews=500):
-        """Scrape reviews with topic detection - 21 fields"""
+    def scrape_company_reviews(self, company_url, company_name, target_reviews=500, since=None, sink=None,
+                               first_page=1, last_page=None, raise_errors=False, collected=None):
+        """
+        Scrape reviews with topic detection - 23 fields
+        since: stop paging at the first review dated at or before this ISO timestamp
+        collected: (oldest, newest) review_date range an earlier run stopped by target_reviews
+        already collected - skipped, so this run fills the gap below it
+        sink: ReviewSink that receives each page's records as soon as they are extracted
+        first_page / last_page: page range to scrape (a work-queue unit); last_page defaults to 100.
+        Not combined with a checkpoint store, which tracks whole companies
+        raise_errors: re-raise a failed page instead of stopping quietly, so the caller can retry the range
+        """
+        if self.checkpoint and (first_page != 1 or last_page is not None):
+            raise ValueError("a page range cannot be scraped with a checkpoint store - "
+                             "checkpoints resume and complete whole companies")
         reviews_data = []
-        page = 1
-        max_pages = 100  # 500 reviews / ~20 per page
+        page = first_page
+        max_pages = last_page or 100  # 500 reviews / ~20 per page
+        start = time.perf_counter()
+        pages_fetched = 0
+        
+        # Resume mid-company if a previous run was interrupted
+        if self.checkpoint:
+            reviews_data = self.checkpoint.load_reviews(company_url)
+            page = self.checkpoint.last_page(company_url) + 1
+            if reviews_data:
+                logger.info("resuming from checkpoint",
+                            extra={'company': company_name, 'page': page, 'reviews': len(reviews_data)})
+                if self.seen:
+                    self.seen.mark(reviews_data)
+                if sink:
+                    sink.write(reviews_data)
         
-        print(f"Scraping {target_reviews} reviews...")
+        logger.debug("scraping reviews", extra={'company': company_name, 'target': target_reviews})
+        resumed = len(reviews_data)
         
-        while len(reviews_data) < target_reviews and page <= max_pages:
+        # Incremental and checkpointed runs page newest first, so everything after `since`
+        # comes before it and a run stopped by target_reviews has collected one date range
+        newest_first = bool(since) or self.checkpoint is not None
+        reached_since = False
+        exhausted = False
+        failed = False
+        ahead = None
+        while not reached_since and len(reviews_data) < target_reviews and page <= max_pages:
             try:
-                response = self.session.get(f"{company_url}?page={page}", timeout=15)
-                response.raise_for_status()
-                soup = BeautifulSoup(response.text, 'html.parser')
-                
-                containers = soup.select('article[data-service-review-card-paper]')
-                if not containers:
+                current = ahead or self._request_review_page(
+                    review_page_url(company_url, page, newest_first=newest_first), company_name, page)
+                # With a parse pool, fetch the next page while this one parses
+                ahead = None
+                if self.page_parser.read_ahead and page < max_pages:
+                    ahead = self._request_review_page(
+                        review_page_url(company_url, page + 1, newest_first=newest_first), company_name, page + 1)
+                parsed = self._review_page_records(current)
+                pages_fetched += 1
+                if not parsed:
+                    exhausted = True
                     break
                 
-                page_count = 0
-                for container in containers:
-                    if len(reviews_data) >= target_reviews:
+                # A page the earlier capped run already collected is passed over, not taken as the end
+                known_page = collected is not None and all(_in_range(r['review_date'], collected) for r in parsed)
+                
+                # Reviews collected by an earlier run never reach the sink; a page of
+                # nothing but known reviews ends the company like an empty page
+                if self.seen:
+                    fresh = self.seen.filter_new(parsed)
+                    self.metrics.record_duplicates(len(parsed) - len(fresh))
+                    parsed = fresh
+                
+                page_records = []
+                for record in parsed:
+                    if len(reviews_data) + len(page_records) >= target_reviews:
                         break
-                    try:
-                        # Reviewer name
-                        name_el = container.select_one('span[data-consumer-name-typography]')
-                        name = name_el.get_text(strip=True) if name_el else "Anonymous"
-                        
-                        # Rating
-                        rating_el = container.select_one('img[alt*="star"]')
-                        rating = rating_el.get('alt', 'No rating') if rating_el else "No rating"
-                        
-                        # Review text
-                        text_el = container.select_one('p')
-                        review_text = text_el.get_text(strip=True) if text_el else ""
-                        
-                        # Date
-                        date_el = container.select_one('time')
-                        review_date = date_el.get('datetime', 'Unknown') if date_el else "Unknown"
-                        
-                        # Title
-                        title_el = container.select_one('h2')
-                        review_title = title_el.get_text(strip=True) if title_el else "No title"
-                        
-                        # Verified
-                        verified = bool(container.select_one('[data-service-review-verified-review]'))
-                        
-                        # Location
-                        loc_el = container.select_one('span[data-consumer-country-typography]')
-                        location = loc_el.get_text(strip=True) if loc_el else "Unknown"
-                        
-                        # Company reply
-                        card_text = container.get_text()
-                        has_reply = 'Company replied' in card_text or 'Reply from' in card_text
-                        
-                        # Topic detection
-                        topic_tags, topic_flags = self.detect_topic_tags(review_title, review_text)
-                        
-                        reviews_data.append({
-                            'company_name': company_name,
-                            'reviewer_name': name,
-                            'reviewer_location': location,
-                            'rating': rating,
-                            'review_date': review_date,
-                            'review_title': review_title,
-                            'review_text': review_text,
-                            'review_length': len(review_text),
-                            'verified_review': verified,
-                            'has_company_reply': has_reply,
-                            'topic_tags': topic_tags,
-                            **topic_flags,
-                            'page_number': page,
-                            'scraped_at': datetime.now().isoformat()
-                        })
-                        page_count += 1
-                        
-                    except:
+                    
+                    # Incremental mode: everything from here on was collected by an earlier run
+                    if since and record['review_date'] != MISSING_DATE and record['review_date'] <= since:
+                        reached_since = True
+                        break
+                    
+                    if collected and _in_range(record['review_date'], collected):
                         continue
+                    
+                    page_records.append(record)
+                
+                reviews_data.extend(page_records)
+                if self.seen:
+                    self.seen.mark(page_records)
+                if self.checkpoint:
+                    self.checkpoint.save_page(company_url, page, page_records)
+                if sink:
+                    sink.write(page_records)
                 
-                if page % 10 == 0:
-                    print(f"Page {page}: {len(reviews_data)} reviews collected")
+                logger.debug("page scraped", extra={'company': company_name, 'page': page,
+                                                     'page_reviews': len(page_records), 'reviews': len(reviews_data)})
                 
-                if page_count == 0:
+                if not page_records and not known_page:
                     break
                 
-                time.sleep(random.uniform(1, 2))
                 page += 1
                 
             except Exception as e:
-                print(f"Page {page} error: {e}")
+                self.metrics.record_error('reviews', e)
+                logger.warning("review page failed", extra={'company': company_name, 'page': page, 'error': repr(e)})
+                if raise_errors:
+                    raise
+                failed = True
                 break
         
-        print(f"Collected {len(reviews_data)} reviews")
+        # Only a clean finish counts as done - a failed company is retried on restart
+        if self.checkpoint and not failed:
+            dates = [r['review_date'] for r in reviews_data if r['review_date'] != MISSING_DATE]
+            if reached_since or exhausted or page > max_pages:
+                # Everything newer than the old mark is in - raise it
+                newest = max(dates + ([collected[1]] if collected else []), default=None)
+                self.checkpoint.mark_done(company_url, company_name, newest)
+            else:
+                # Stopped by target_reviews: older reviews are still missing, so the mark stays
+                # and the range collected from the top is kept for the next run to skip
+                if dates:
+                    oldest, newest = min(dates), max(dates)
+                    if collected and oldest < collected[0]:
+                        # Paged through the earlier range into the gap below it - one range again
+                        newest = max(newest, collected[1])
+                    collected = (oldest, newest)
+                self.checkpoint.mark_done(company_url, company_name, collected=collected)
+        
+        elapsed = time.perf_counter() - start
+        self.metrics.record_company(company_name, len(reviews_data) - resumed, pages_fetched, elapsed)
+        logger.info("reviews collected", extra={
+            'company': company_name, 'reviews': len(reviews_data), 'pages': pages_fetched,
+            'reviews_per_sec': round((len(reviews_data) - resumed) / elapsed, 1) if elapsed else None
+        })
         return reviews_data
     
-    def save_datasets(self, all_profiles, all_reviews):
+    def _fetch_review_page(self, url, company_name, page):
+        """Fetch and parse one review page - the full page of records, topic tagging included"""
+        return self._review_page_records(self._request_review_page(url, company_name, page))
+    
+    def _request_review_page(self, url, company_name, page):
+        """Fetch one review page and hand it to the parse stage - a future of (records, timings)"""
+        try:
+            response = self.fetcher.get(url, timeout=15)
+            response.raise_for_status()
+        except Exception as e:
+            # Surfaces when the page's records are needed, like a parse error
+            failed = Future()
+            failed.set_exception(e)
+            return failed
+        return self.page_parser.submit_reviews(response.content, response.encoding, company_name, page)
+    
+    def _review_page_records(self, future):
+        parsed, timings = future.result()
+        self.metrics.record_parse('reviews', timings['parse'])
+        self.metrics.record_tagging(timings['tagging'], len(parsed))
+        return parsed
+    
+    def iter_reviews(self, company_url, company_name, since=None, stars=None, verified_only=False, max_pages=100):
+        """
+        Lazy generator over a company's reviews - a page is only fetched once the previous one is consumed,
+        so stopping early (break, itertools.islice) stops the downloads too.
+        since: only reviews dated after this ISO date or timestamp; pages are requested newest first and
+               paging ends at the first older review
+        stars: star ratings to keep, e.g. {4, 5}; verified_only: only verified reviews
+        The filters go into the page URLs and are checked again on the parsed records.
+        No checkpoint, seen-review or sink handling - records are yielded as parsed.
+        """
+        pages = 0
+        try:
+            for page in range(1, max_pages + 1):
+                url = review_page_url(company_url, page, stars, verified_only, newest_first=bool(since))
+                parsed = self._fetch_review_page(url, company_name, page)
+                pages += 1
+                if not parsed:
+                    return
+                for record in parsed:
+                    if since and record['review_date'] != MISSING_DATE and record['review_date'] <= since:
+                        logger.debug("date window exhausted", extra={'company': company_name, 'page': page})
+                        return
+                    if stars and record['star_rating'] not in stars:
+                        continue
+                    if verified_only and not record['verified_review']:
+                        continue
+                    yield record
+        except Exception as e:
+            self.metrics.record_error('reviews', e)
+            logger.warning("review page failed", extra={'company': company_name, 'page': pages + 1, 'error': repr(e)})
+            raise
+        finally:
+            logger.debug("review paging stopped", extra={'company': company_name, 'pages': pages})
+    
+    def save_datasets(self, all_profiles, all_reviews, timestamp=None):
         """Save profiles and reviews to CSV"""
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        timestamp = timestamp or datetime.now().strftime("%Y%m%d_%H%M%S")
         
         profiles_file = None
         if all_profiles:
             profiles_file = f"Trustpilot_data/company_profiles_{timestamp}.csv"
             pd.DataFrame(all_profiles).to_csv(profiles_file, index=False)
-            print(f"Profiles saved: {profiles_file}")
+            logger.info("profiles saved", extra={'path': profiles_file, 'rows': len(all_profiles)})
         
         reviews_file = None
         if all_reviews:
             reviews_file = f"Trustpilot_data/reviews_{timestamp}.csv"
             pd.DataFrame(all_reviews).to_csv(reviews_file, index=False)
-            print(f"Reviews saved: {reviews_file}")
+            logger.info("reviews saved", extra={'path': reviews_file, 'rows': len(all_reviews)})
         
         return profiles_file, reviews_file
     
-    def run_full_scrape(self, min_reviews=1000, reviews_per_company=500):
-        """Execute complete scraping pipeline"""
-        print("=" * 70)
-        print("TRUSTPILOT APPLIANCE SCRAPER v2.0")
-        print("=" * 70)
-        print(f"Configuration: Companies with {min_reviews}+ reviews, {reviews_per_company} reviews each")
-        print()
-        
-        # Step 1: Discover companies
-        print("STEP 1: Discovering companies")
-        print("-" * 50)
-        companies = self.get_appliance_companies(min_reviews=min_reviews)
-        
-        if not companies:
-            print("No companies found!")
-            return None, None
+    def run_full_scrape(self, min_reviews=1000, reviews_per_company=500, incremental=False, output_format='csv',
+                        categories=None):
+        """
+        Execute complete scraping pipeline
+        categories: Trustpilot category slugs to discover companies in (default: appliance_store)
+        incremental: with a checkpoint store, only fetch reviews newer than each company's high-water mark
+                     (and, after a run cut short by reviews_per_company, the older ones it did not reach)
+        output_format: 'csv', 'parquet' or 'dataset' (partitioned by company and review month, see review_dataset)
+                       - reviews are streamed to disk page by page
+        """
+        logger.info("scrape started", extra={'min_reviews': min_reviews, 'reviews_per_company': reviews_per_company,
+                                             'categories': ','.join(categories or []) or 'default',
+                                             'incremental': incremental, 'output_format': output_format})
         
-        # Step 2: Scrape profiles and reviews
-        print("\nSTEP 2: Scraping profiles & reviews")
-        print("-" * 50)
+        # Discovery and scraping overlap: each company is scraped as soon as discovery yields it
+        companies = self.discover_companies(min_reviews=min_reviews, categories=categories)
         
-        all_profiles = []
-        all_reviews = []
+        # Reviews stream straight to disk; only profiles (one per company) are kept in memory
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        reviews_sink = open_review_sink(output_format, f"Trustpilot_data/reviews_{timestamp}", self.topic_tagger.flag_names)
         
-        for i, company in enumerate(companies, 1):
-            print(f"\n[{i}/{len(companies)}] {company['company_name']} ({company['review_count']:,} reviews)")
+        def scrape_company(indexed):
+            i, company = indexed
+            company_url = company['company_url']
+            logger.info("company started", extra={'index': i, 'company': company['company_name'],
+                                                  'listed_reviews': company['review_count']})
+            
+            # Already finished before a restart - reuse the checkpointed records
+            if self.checkpoint and self.checkpoint.is_done(company_url):
+                logger.info("company loaded from checkpoint", extra={'company': company['company_name']})
+                records = self.checkpoint.load_reviews(company_url)
+                if self.seen:
+                    self.seen.mark(records)
+                reviews_sink.write(records)
+                return self.checkpoint.load_profile(company_url)
             
             # Scrape profile
-            profile = self.scrape_company_profile(company['company_url'], company['company_name'])
-            all_profiles.append(profile)
+            profile = self.checkpoint.load_profile(company_url) if self.checkpoint else None
+            if profile is None:
+                profile = self.scrape_company_profile(company_url, company['company_name'])
+                if self.checkpoint:
+                    self.checkpoint.save_profile(company_url, profile)
             
             # Scrape reviews
-            reviews = self.scrape_company_reviews(
-                company['company_url'], 
+            since = self.checkpoint.high_water_mark(company_url) if self.checkpoint and incremental else None
+            collected = self.checkpoint.collected_range(company_url) if self.checkpoint and incremental else None
+            self.scrape_company_reviews(
+                company_url, 
                 company['company_name'], 
-                target_reviews=reviews_per_company
+                target_reviews=reviews_per_company,
+                since=since,
+                sink=reviews_sink,
+                collected=collected
             )
-            all_reviews.extend(reviews)
-            
-            # Rest between companies
-            if i < len(companies):
-                print("Resting 10 seconds...")
-                time.sleep(10)
+            return profile
+        
+        # Companies run concurrently; the per-host rate limiter replaces the 10 second rest.
+        # Profiles come back in discovery order; review rows are written as pages complete.
+        all_profiles = self.fetcher.map(scrape_company, enumerate(companies, 1))
         
-        # Step 3: Save
-        print("\nSTEP 3: Saving datasets")
-        print("-" * 50)
-        profiles_file, reviews_file = self.save_datasets(all_profiles, all_reviews)
+        if not all_profiles:
+            reviews_sink.close()
+            logger.warning("no companies found", extra={'min_reviews': min_reviews})
+            return None, None
         
-        # Summary
-        print("\n" + "=" * 70)
-        print("SCRAPING COMPLETE")
-        print("=" * 70)
-        print(f"Companies: {len(all_profiles)}")
-        print(f"Reviews: {len(all_reviews):,}")
-        print(f"Profiles file: {profiles_file}")
-        print(f"Reviews file: {reviews_file}")
+        profiles_file, _ = self.save_datasets(all_profiles, [], timestamp=timestamp)
+        reviews_file = reviews_sink.close()
+        if reviews_file:
+            logger.info("reviews saved", extra={'path': reviews_file, 'rows': reviews_sink.summary.total})
+        summary = reviews_sink.summary
         
-        # Topic analysis
-        if all_reviews:
-            df = pd.DataFrame(all_reviews)
-            print("\nTOPIC DISTRIBUTION:")
-            for col in ['mentions_delivery', 'mentions_price', 'mentions_service', 'mentions_product',
-                       'mentions_staff', 'mentions_order', 'mentions_location', 'mentions_refund']:
-                if col in df.columns:
-                    pct = (df[col].sum() / len(df)) * 100
-                    print(f"   {col.replace('mentions_', '').title():12} {pct:.1f}%")
-            
-            if 'has_company_reply' in df.columns:
-                reply_pct = (df['has_company_reply'].sum() / len(df)) * 100
-                print(f"\nCompany Reply Rate: {reply_pct:.1f}%")
+        # Datasets are on disk - remember this run's reviews, then let the next run start fresh
+        if self.seen:
+            added = self.seen.commit()
+            logger.info("seen reviews updated", extra={'added': added, 'known': self.seen.count})
+        if self.checkpoint:
+            self.checkpoint.finish_run()
+        
+        # Run metrics - JSON report for humans, Prometheus text for a node_exporter textfile collector
+        report_file = self.metrics.write_json(f"Trustpilot_data/run_report_{timestamp}.json")
+        metrics_file = self.metrics.write_prometheus(f"Trustpilot_data/metrics_{timestamp}.prom")
+        
+        logger.info("scrape complete", extra={
+            'companies': len(all_profiles), 'reviews': summary.total,
+            'profiles_file': profiles_file, 'reviews_file': reviews_file,
+            'run_report': report_file, 'metrics_file': metrics_file
+        })
+        
+        # Topic analysis - from the sink's running counters
+        if summary.total:
+            # Nested - topic names come from topics.json and may clash with LogRecord attributes
+            logger.info("topic distribution", extra={'topics': {
+                col.replace('mentions_', ''): round(pct, 1) for col, pct in summary.topic_percentages().items()
+            }})
+            logger.info("company reply rate", extra={'reply_rate': round(summary.reply_rate(), 1)})
         
-        print("\nDatasets ready for dbt transformation!")
         return profiles_file, reviews_file
+    
+    def close(self):
+        """Stop parse workers and release the HTTP cache, checkpoint and seen-review databases"""
+        self.page_parser.close()
+        if self.fetcher.cache:
+            self.fetcher.cache.close()
+        if self.checkpoint:
+            self.checkpoint.close()
+        if self.seen:
+            self.seen.close()
 
 
 if __name__ == "__main__":
-    scraper = TrustpilotApplianceScraper()
+    scraper = TrustpilotApplianceScraper(
+        checkpoint_path="Trustpilot_data/checkpoint.db",  # Resume here if a run is interrupted
+        seen_path="Trustpilot_data/seen_reviews.db",      # Skip reviews collected by earlier runs
+        log_level="INFO"                                  # DEBUG adds per-page progress
+    )
     
     profiles_file, reviews_file = scraper.run_full_scrape(
-        min_reviews=1000,        # Only companies with 1000+ reviews
-        reviews_per_company=500  # Scrape 500 reviews per company
+        min_reviews=1000,         # Only companies with 1000+ reviews
+        reviews_per_company=500,  # Scrape 500 reviews per company
+        incremental=False         # True: only reviews newer than the last run
     )
     
     if profiles_file and reviews_file:
-        print("\n" + "=" * 70)
-        print("SUCCESS!")
-        print(f"Profiles: {profiles_file}")
-        print(f"Reviews: {reviews_file}")
-        print("=" * 70)
\ No newline at end of file
+        logger.info("success - datasets ready for dbt transformation",
+                    extra={'profiles_file': profiles_file, 'reviews_file': reviews_file})
@@ -0,0 +1,384 @@
+"""
+Bulk loader from scraper output into the RAW warehouse tables
+- each scrape batch (the <ts> in reviews_<ts>.csv / company_profiles_<ts>.csv,
+  or a partitioned reviews_<ts>/ dataset) is rewritten as Parquet with an explicit schema, so founded_year stays an
+  integer, phone numbers stay text and flags stay booleans
+- the Parquet files are bulk-loaded through a pluggable warehouse adapter
+  (DuckDB locally, Snowflake for TRUSTPILOT_REVIEWS.RAW)
+- loads are idempotent per batch: a batch's rows are replaced in one
+  transaction, so rerunning a load never duplicates reviews
+
+Usage:
+    python warehouse_loader.py                      # every batch in Trustpilot_data
+    python warehouse_loader.py 20251224_160111      # one batch
+    python warehouse_loader.py --target snowflake   # credentials from SNOWFLAKE_* env vars
+
+
+Project: Trustpilot Analytics Pipeline
+"""
+
+import argparse
+import csv
+import logging
+import os
+import re
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pa_csv
+import pyarrow.parquet as pq
+
+from instrumentation import configure_logging
+from review_dataset import read_reviews
+
+try:
+    import duckdb
+except ImportError:  # DuckDB target is optional
+    duckdb = None
+
+try:
+    import snowflake.connector as snowflake_connector
+except ImportError:  # Snowflake target is optional
+    snowflake_connector = None
+
+logger = logging.getLogger(__name__)
+
+BATCH_COLUMN = 'scrape_batch'
+
+# Scraper dataset -> RAW table (see dbt_project/trustpilot/models/source.yml)
+RAW_TABLES = {
+    'reviews': 'REVIEWS',
+    'company_profiles': 'COMPANY_PROFILES',
+}
+
+_BATCH_FILE = re.compile(r'^(reviews|company_profiles)_(\d{8}_\d{6})(?:\.(csv|parquet))?$')
+
+# Scraper placeholders that mean "no value" in typed columns
+_MISSING = 'Unknown'
+
+DEFAULT_DUCKDB_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'dbt_project', 'trustpilot',
+                                   'local', 'trustpilot_reviews.duckdb')
+
+
+def review_schema(flag_names):
+    """RAW.REVIEWS columns in scraper order; flag_names are the mentions_* topic columns"""
+    return pa.schema(
+        [
+            ('review_key', pa.string()),   # scraper-side review_id (seen_reviews.review_key)
+            ('company_name', pa.string()),
+            ('reviewer_name', pa.string()),
+            ('reviewer_location', pa.string()),
+            ('rating', pa.string()),       # "Rated 4 out of 5 stars" - parsed in stg_reviews
+            ('star_rating', pa.int64()),   # the same rating parsed by the scraper (null in older batches)
+            ('review_date', pa.string()),  # ISO text as scraped - hashed into review_id, cast in stg_reviews
+            ('review_title', pa.string()),
+            ('review_text', pa.string()),
+            ('review_length', pa.int64()),
+            ('verified_review', pa.bool_()),
+            ('has_company_reply', pa.bool_()),
+            ('topic_tags', pa.string()),
+        ]
+        + [(name, pa.bool_()) for name in flag_names]
+        + [
+            ('page_number', pa.int64()),
+            ('scraped_at', pa.timestamp('us')),
+            (BATCH_COLUMN, pa.string()),
+        ]
+    )
+
+
+def profile_schema():
+    """RAW.COMPANY_PROFILES columns in scraper order"""
+    return pa.schema([
+        ('company_name', pa.string()),
+        ('trustpilot_url', pa.string()),
+        ('scraped_at', pa.timestamp('us')),
+        ('overall_rating', pa.float64()),
+        ('trust_category', pa.string()),
+        ('total_reviews', pa.int64()),
+        ('claimed_profile', pa.bool_()),
+        ('num_locations', pa.int64()),
+        ('business_type', pa.string()),
+        ('website_url', pa.string()),
+        ('negative_response_rate', pa.string()),
+        ('response_time', pa.string()),
+        ('verified_company', pa.bool_()),
+        ('phone', pa.string()),
+        ('email', pa.string()),
+        ('address', pa.string()),
+        ('founded_year', pa.int64()),
+        ('has_active_subscription', pa.bool_()),
+        ('company_description', pa.string()),
+        (BATCH_COLUMN, pa.string()),
+    ])
+
+
+def schema_for(dataset, column_names):
+    if dataset == 'reviews':
+        return review_schema([name for name in column_names if name.startswith('mentions_')])
+    return profile_schema()
+
+
+def _conform_column(column, field):
+    """Cast one column to its declared type, undoing CSV round-trip damage"""
+    if pa.types.is_string(column.type):
+        # Empty text loads as NULL whether it came from CSV or Parquet
+        column = pc.if_else(pc.equal(column, ''), pa.scalar(None, pa.string()), column)
+        if field.name == 'review_date' or pa.types.is_timestamp(field.type):
+            column = pc.if_else(pc.equal(column, _MISSING), pa.scalar(None, pa.string()), column)
+    if column.type == field.type:
+        return column
+    if pa.types.is_integer(field.type) and (pa.types.is_string(column.type) or pa.types.is_floating(column.type)):
+        # pandas writes nullable ints as floats ("1983.0") - go through float64, rejecting real fractions
+        return pc.cast(pc.cast(column, pa.float64()), field.type)
+    return pc.cast(column, field.type)
+
+
+def conform(table, schema, batch_id):
+    """Select, order and cast table's columns to schema, stamping every row with batch_id"""
+    extra = [name for name in table.column_names if name not in schema.names]
+    if extra:
+        logger.warning("columns outside the load schema dropped", extra={'batch': batch_id, 'columns': ','.join(extra)})
+    columns = []
+    for field in schema:
+        if field.name == BATCH_COLUMN:
+            columns.append(pa.repeat(pa.scalar(batch_id), table.num_rows))
+        elif field.name in table.column_names:
+            columns.append(_conform_column(table.column(field.name), field))
+        else:
+            columns.append(pa.nulls(table.num_rows, field.type))
+    return pa.Table.from_arrays(columns, schema=schema)
+
+
+def read_scraper_file(path):
+    """
+    Scraper CSV, Parquet or partitioned dataset as an Arrow table.
+    CSV fields are read as text and typed by conform(); dataset categoricals are decoded.
+    """
+    if os.path.isdir(path):
+        table = read_reviews(path)
+        return pa.table({name: pc.cast(column, column.type.value_type) if pa.types.is_dictionary(column.type)
+                         else column for name, column in zip(table.column_names, table.columns)})
+    if path.endswith('.parquet'):
+        return pq.read_table(path)
+    with open(path, newline='', encoding='utf-8') as f:
+        names = next(csv.reader(f), [])
+    return pa_csv.read_csv(
+        path,
+        parse_options=pa_csv.ParseOptions(newlines_in_values=True),  # company_description spans lines
+        convert_options=pa_csv.ConvertOptions(
+            column_types={name: pa.string() for name in names},
+            strings_can_be_null=True,  # pandas writes None as an empty field
+        ),
+    )
+
+
+def write_batch_parquet(source_path, dataset, batch_id, out_dir):
+    """Typed Parquet copy of one scraper file; returns (path, schema, rows)"""
+    table = read_scraper_file(source_path)
+    schema = schema_for(dataset, table.column_names)
+    table = conform(table, schema, batch_id)
+    os.makedirs(out_dir, exist_ok=True)
+    path = os.path.join(out_dir, f"{dataset}_{batch_id}.parquet")
+    pq.write_table(table, path)
+    return path, schema, table.num_rows
+
+
+def find_batches(data_dir):
+    """{batch_id: {dataset: path}} in data_dir - a dataset directory wins over Parquet, Parquet over CSV"""
+    batches = {}
+    for name in sorted(os.listdir(data_dir)):
+        match = _BATCH_FILE.match(name)
+        if not match:
+            continue
+        dataset, batch_id, extension = match.groups()
+        path = os.path.join(data_dir, name)
+        if extension is None and not os.path.isdir(path):
+            continue
+        files = batches.setdefault(batch_id, {})
+        if dataset not in files or extension != 'csv' and not os.path.isdir(files[dataset]):
+            files[dataset] = path
+    return batches
+
+
+class WarehouseAdapter:
+    """
+    Loads typed Parquet files into RAW tables.
+    Subclasses map Arrow types to column types and implement replace_batch().
+    """
+
+    TYPES = {}
+
+    def column_type(self, arrow_type):
+        for predicate, sql_type in self.TYPES.items():
+            if predicate(arrow_type):
+                return sql_type
+        raise TypeError(f"No warehouse column type for {arrow_type}")
+
+    def replace_batch(self, table, schema, batch_id, parquet_path):
+        """Swap batch_id's rows in table for the Parquet file's rows in one transaction; returns rows loaded"""
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class DuckDBAdapter(WarehouseAdapter):
+    """
+    Local target - the database file the dbt 'duckdb' profile reads.
+    The file must be named trustpilot_reviews.duckdb so its catalog matches TRUSTPILOT_REVIEWS.
+    """
+
+    TYPES = {
+        pa.types.is_string: 'VARCHAR',
+        pa.types.is_integer: 'BIGINT',
+        pa.types.is_floating: 'DOUBLE',
+        pa.types.is_boolean: 'BOOLEAN',
+        pa.types.is_timestamp: 'TIMESTAMP',
+    }
+
+    def __init__(self, database=DEFAULT_DUCKDB_PATH, schema='RAW'):
+        if duckdb is None:
+            raise ImportError("duckdb is required for the 'duckdb' warehouse target")
+        os.makedirs(os.path.dirname(os.path.abspath(database)), exist_ok=True)
+        self.schema = schema
+        self.conn = duckdb.connect(database)
+        self.conn.execute(f"create schema if not exists {schema}")
+
+    def _ensure_table(self, table, schema):
+        columns = ', '.join(f"{field.name} {self.column_type(field.type)}" for field in schema)
+        self.conn.execute(f"create table if not exists {self.schema}.{table} ({columns})")
+        # New topic flags (or a table created before scrape_batch existed) become new columns
+        for field in schema:
+            self.conn.execute(f"alter table {self.schema}.{table} add column if not exists "
+                              f"{field.name} {self.column_type(field.type)}")
+
+    def replace_batch(self, table, schema, batch_id, parquet_path):
+        self._ensure_table(table, schema)
+        self.conn.execute("begin transaction")
+        try:
+            self.conn.execute(f"delete from {self.schema}.{table} where {BATCH_COLUMN} = ?", [batch_id])
+            self.conn.execute(f"insert into {self.schema}.{table} by name select * from read_parquet(?)",
+                              [parquet_path])
+            self.conn.execute("commit")
+        except Exception:
+            self.conn.execute("rollback")
+            raise
+        return self.conn.execute(f"select count(*) from {self.schema}.{table} where {BATCH_COLUMN} = ?",
+                                 [batch_id]).fetchone()[0]
+
+    def close(self):
+        self.conn.close()
+
+
+class SnowflakeAdapter(WarehouseAdapter):
+    """
+    TRUSTPILOT_REVIEWS.RAW - files are PUT to the table stage and COPYed by column name.
+    Connection settings default to SNOWFLAKE_ACCOUNT / _USER / _PASSWORD / _WAREHOUSE / _ROLE.
+    """
+
+    TYPES = {
+        pa.types.is_string: 'VARCHAR',
+        pa.types.is_integer: 'NUMBER(38,0)',
+        pa.types.is_floating: 'FLOAT',
+        pa.types.is_boolean: 'BOOLEAN',
+        pa.types.is_timestamp: 'TIMESTAMP_NTZ',
+    }
+
+    def __init__(self, database='TRUSTPILOT_REVIEWS', schema='RAW', **connect_args):
+        if snowflake_connector is None:
+            raise ImportError("snowflake-connector-python is required for the 'snowflake' warehouse target")
+        for key in ('account', 'user', 'password', 'warehouse', 'role'):
+            value = os.environ.get(f"SNOWFLAKE_{key.upper()}")
+            if value and key not in connect_args:
+                connect_args[key] = value
+        self.conn = snowflake_connector.connect(database=database, schema=schema, **connect_args)
+        self.conn.autocommit(False)
+        self.schema = schema
+
+    def _ensure_table(self, cursor, table, schema):
+        columns = ', '.join(f"{field.name} {self.column_type(field.type)}" for field in schema)
+        cursor.execute(f"create table if not exists {self.schema}.{table} ({columns})")
+        for field in schema:
+            cursor.execute(f"alter table {self.schema}.{table} add column if not exists "
+                           f"{field.name} {self.column_type(field.type)}")
+
+    def replace_batch(self, table, schema, batch_id, parquet_path):
+        cursor = self.conn.cursor()
+        try:
+            self._ensure_table(cursor, table, schema)
+            stage = f"@{self.schema}.%{table}/{batch_id}"
+            cursor.execute(f"put 'file://{os.path.abspath(parquet_path)}' {stage} overwrite = true")
+            cursor.execute("begin")
+            cursor.execute(f"delete from {self.schema}.{table} where {BATCH_COLUMN} = %s", (batch_id,))
+            cursor.execute(f"copy into {self.schema}.{table} from {stage} file_format = (type = parquet) "
+                           f"match_by_column_name = case_insensitive force = true purge = true")
+            columns = [column[0].lower() for column in cursor.description]
+            rows = sum(row[columns.index('rows_loaded')] for row in cursor.fetchall())
+            self.conn.commit()
+            return rows
+        except Exception:
+            self.conn.rollback()
+            raise
+        finally:
+            cursor.close()
+
+    def close(self):
+        self.conn.close()
+
+
+WAREHOUSE_ADAPTERS = {
+    'duckdb': DuckDBAdapter,
+    'snowflake': SnowflakeAdapter,
+}
+
+
+def get_warehouse_adapter(name, **options):
+    """Create the adapter for a warehouse target ('duckdb' or 'snowflake')"""
+    if name not in WAREHOUSE_ADAPTERS:
+        raise ValueError(f"Unknown warehouse target '{name}' - choose from {', '.join(WAREHOUSE_ADAPTERS)}")
+    return WAREHOUSE_ADAPTERS[name](**options)
+
+
+def load_batch(adapter, batch_id, files, staging_dir):
+    """Convert and load one scrape batch ({dataset: path}); returns {RAW table: rows loaded}"""
+    loaded = {}
+    for dataset, source_path in sorted(files.items()):
+        parquet_path, schema, rows = write_batch_parquet(source_path, dataset, batch_id, staging_dir)
+        table = RAW_TABLES[dataset]
+        loaded[table] = adapter.replace_batch(table, schema, batch_id, parquet_path)
+        logger.info("batch loaded", extra={'batch': batch_id, 'table': table, 'rows': loaded[table],
+                                           'source': source_path})
+    return loaded
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('batches', nargs='*', help='batch timestamps to load (default: every batch in --data-dir)')
+    parser.add_argument('--data-dir', default='Trustpilot_data')
+    parser.add_argument('--target', choices=list(WAREHOUSE_ADAPTERS), default='duckdb')
+    parser.add_argument('--database', help='DuckDB file (duckdb) or database name (snowflake)')
+    args = parser.parse_args(argv)
+    configure_logging('INFO')
+
+    available = find_batches(args.data_dir)
+    batch_ids = args.batches or sorted(available)
+    missing = [batch_id for batch_id in batch_ids if batch_id not in available]
+    if missing:
+        parser.error(f"no scraper output for batch {', '.join(missing)} in {args.data_dir}")
+
+    options = {'database': args.database} if args.database else {}
+    staging_dir = os.path.join(args.data_dir, 'load')
+    with get_warehouse_adapter(args.target, **options) as adapter:
+        for batch_id in batch_ids:
+            load_batch(adapter, batch_id, available[batch_id], staging_dir)
+
+
+if __name__ == "__main__":
+    main()